@@ -0,0 +1,78 @@
+import contextlib
+import gc
+import io
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_catalog
+from src.compact_graph import build_compact_graph
+from src.graph_builder import build_edge_tables, build_full_graph
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _measure(fn, *args, **kwargs):
+    """
+    Tempo de construção e memória retida pelo resultado (tracemalloc).
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def run(sizes=SIZES, include_people=False, max_cast=10):
+    """
+    Compara o nx.Graph de build_full_graph com o grafo compacto (tempo e memória).
+    Os labels são compartilhados com as tabelas de arestas, então a memória
+    do compacto também é reportada com os labels (memory_usage).
+    """
+    results = []
+
+    for n_rows in sizes:
+        df = generate_catalog(n_rows)
+        edges = build_edge_tables(df, include_people=include_people, max_cast=max_cast)
+
+        compact, t_compact, m_compact = _measure(
+            build_compact_graph, df, edges=edges, include_people=include_people
+        )
+        labels_mb = compact.memory_usage() / 2**20
+        del compact
+
+        G, t_nx, m_nx = _measure(build_full_graph, df, edges=edges, include_people=include_people)
+        edge_count = G.number_of_edges()
+        del G
+
+        results.append({
+            'rows': n_rows,
+            'edges': edge_count,
+            'nx_seconds': t_nx,
+            'nx_mb': m_nx / 2**20,
+            'compact_seconds': t_compact,
+            'compact_mb': m_compact / 2**20,
+            'compact_with_labels_mb': labels_mb,
+        })
+
+    print(f"\n{'linhas':>10} {'arestas':>10} {'nx':>9} {'compacto':>9} {'nx MB':>9} "
+          f"{'comp. MB':>9} {'c/ labels':>9} {'razão':>7}")
+    for r in results:
+        print(
+            f"{r['rows']:>10} {r['edges']:>10} {r['nx_seconds']:>8.2f}s {r['compact_seconds']:>8.2f}s "
+            f"{r['nx_mb']:>9.1f} {r['compact_mb']:>9.1f} {r['compact_with_labels_mb']:>9.1f} "
+            f"{r['nx_mb'] / r['compact_with_labels_mb']:>6.1f}×"
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    people = '--people' in args
+    sizes = [int(s) for s in args if s != '--people'] or SIZES
+    run(sizes, include_people=people)
@@ -0,0 +1,57 @@
+import sys
+import time
+
+from benchmarks.synthetic import generate_catalog
+from src.graph_builder import (
+    build_edge_tables,
+    build_full_graph,
+    build_country_genre_graph,
+    build_region_country_genre_graph
+)
+
+SIZES = [10_000, 100_000, 1_000_000]
+REGION = {"Country 0", "Country 1", "Country 2", "Country 3"}
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(sizes=SIZES):
+    """
+    Mede o tempo de ingestão e de construção de cada grafo por tamanho de catálogo.
+    """
+    results = []
+
+    for n_rows in sizes:
+        df = generate_catalog(n_rows)
+
+        edges, t_edges = _timed(build_edge_tables, df)
+        _, t_full = _timed(build_full_graph, df, edges=edges)
+        _, t_global = _timed(build_country_genre_graph, df, edges=edges)
+        _, t_region = _timed(build_region_country_genre_graph, df, REGION, edges=edges)
+
+        results.append({
+            'rows': n_rows,
+            'edge_tables': t_edges,
+            'full_graph': t_full,
+            'country_genre': t_global,
+            'region': t_region,
+            'total': t_edges + t_full + t_global + t_region,
+        })
+
+    print(f"\n{'linhas':>10} {'tabelas':>9} {'completo':>9} {'global':>9} {'região':>9} {'total':>9}")
+    for r in results:
+        print(
+            f"{r['rows']:>10} {r['edge_tables']:>8.2f}s {r['full_graph']:>8.2f}s "
+            f"{r['country_genre']:>8.2f}s {r['region']:>8.2f}s {r['total']:>8.2f}s"
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or SIZES
+    run(sizes)
@@ -0,0 +1,41 @@
+import contextlib
+import io
+import sys
+import time
+
+from benchmarks.synthetic import generate_catalog
+from src.graph_builder import build_full_graph
+from src.similarity_index import build_similarity_index, print_recall_report
+
+SIZES = [10_000, 50_000]
+
+
+def run(sizes=SIZES, k=20, sample=200, include_people=True):
+    """
+    Tempo de construção do índice top-K e recall@K contra o recommender exato.
+    """
+    results = []
+
+    for n_rows in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            G = build_full_graph(generate_catalog(n_rows), include_people=include_people, max_cast=10)
+
+        start = time.perf_counter()
+        index = build_similarity_index(G, k=k)
+        elapsed = time.perf_counter() - start
+
+        print(f"\n=== {n_rows} linhas: índice em {elapsed:.1f}s ===")
+        results.append({
+            'rows': n_rows,
+            'build_seconds': elapsed,
+            'recall': print_recall_report(index, G, sample=sample),
+        })
+
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    people = '--no-people' not in args
+    sizes = [int(s) for s in args if s != '--no-people'] or SIZES
+    run(sizes, include_people=people)
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+
+# Teste de carga do serviço HTTP (src.service): N conexões keep-alive
+# disparando consultas de recomendação (e, opcionalmente, de busca).
+# Os títulos são sorteados com popularidade Zipf, como no uso real
+# (poucos títulos muito procurados => cache e coalescing entram em ação).
+#
+#   python -m benchmarks.load_test --url 127.0.0.1:8000 --requests 5000
+#   python -m benchmarks.load_test --synthetic 50000 --workers 2
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+
+async def _request(reader, writer, host, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, body
+
+
+async def _get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await _request(reader, writer, host, path)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+async def _client(host, port, paths, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, path)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+def _build_paths(titles, n_requests, search_share, zipf, seed):
+    rng = random.Random(seed)
+    weights = 1.0 / np.arange(1, len(titles) + 1) ** zipf
+    picks = rng.choices(titles, weights=weights.tolist(), k=n_requests)
+
+    paths = []
+    for title in picks:
+        if rng.random() < search_share:
+            paths.append(f"/search?q={quote(title[:4])}&limit=10")
+        else:
+            paths.append(f"/recommend?title={quote(title)}&top_n=5")
+    return paths
+
+
+async def run_load(host, port, n_requests=2000, concurrency=32, search_share=0.1,
+                   zipf=1.1, n_titles=5000, seed=42):
+    titles = (await _get_json(host, port, f"/search?q=&limit={n_titles}"))['results']
+    random.Random(seed).shuffle(titles)
+    paths = _build_paths(titles, n_requests, search_share, zipf, seed)
+
+    latencies, statuses = [], Counter()
+    per_client = [paths[i::concurrency] for i in range(concurrency)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, chunk, latencies, statuses) for chunk in per_client if chunk
+    ))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    server_stats = await _get_json(host, port, "/stats")
+
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+        'status': {str(k): v for k, v in sorted(statuses.items())},
+        'server': server_stats,
+    }
+
+
+def _serve_synthetic(n_rows, port, workers, ready):
+    # Processo separado: catálogo sintético + serviço
+    from benchmarks.synthetic import generate_catalog
+    from src.graph_builder import build_full_graph
+    from src.service import run_service
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        G = build_full_graph(generate_catalog(n_rows), include_people=True, max_cast=10)
+    run_service(G, '127.0.0.1', port, ready=ready, workers=workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço de recomendação.")
+    parser.add_argument('--url', default=None, help="host:porta de um serviço já rodando")
+    parser.add_argument('--synthetic', type=int, default=None,
+                        help="sobe um serviço local com um catálogo sintético de N linhas")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--search-share', type=float, default=0.1)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=None, help="arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        host, _, port = args.url.rpartition(':')
+        port = int(port)
+    else:
+        host, port = '127.0.0.1', args.port
+        ready = mp.Event()
+        # Não-daemon: o serviço precisa criar o próprio pool de processos
+        server = mp.Process(
+            target=_serve_synthetic, args=(args.synthetic or 20_000, port, args.workers, ready)
+        )
+        server.start()
+        print("Subindo serviço sintético...")
+        while not ready.wait(timeout=0.5):
+            if not server.is_alive():
+                raise RuntimeError("Serviço sintético não subiu.")
+
+    try:
+        report = asyncio.run(run_load(
+            host, port, n_requests=args.requests, concurrency=args.concurrency,
+            search_share=args.search_share, zipf=args.zipf, seed=args.seed
+        ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    server_stats = report['server']
+    print(f"\n{report['requests']} requisições, {report['concurrency']} conexões, {report['seconds']}s")
+    print(f"  vazão: {report['throughput_rps']} req/s")
+    print(f"  latência: p50 {report['p50_ms']} ms | p95 {report['p95_ms']} ms | "
+          f"p99 {report['p99_ms']} ms | máx {report['max_ms']} ms")
+    print(f"  status: {report['status']}")
+    print(f"  servidor: calculadas {server_stats['computed']}, cache {server_stats['cache_hits']}, "
+          f"agrupadas {server_stats['coalesced']}, recusadas {server_stats['rejected']}")
+
+    report['timestamp'] = datetime.now().isoformat(timespec='seconds')
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados salvos em '{out}'")
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
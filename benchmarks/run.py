@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic import COUNTRIES, write_catalog_csv
+from src import instrumentation
+from src.analysis import analyze_centrality
+from src.centrality import compute_centrality
+from src.data_loader import load_data
+from src.graph_builder import (
+    build_edge_tables,
+    build_full_graph,
+    build_country_genre_graph,
+    build_region_country_genre_graph
+)
+from src.projection import project_country_genre
+from src.recommender import recommend_titles
+from src.region_graphs import build_region_graphs
+
+# Suíte de benchmark: gera catálogos sintéticos de vários tamanhos e mede
+# carga, construção dos grafos, projeção, recomendação e centralidade.
+#
+#   python -m benchmarks.run --sizes 10000 100000 1000000 --queries 200
+#   python -m benchmarks.run --sizes 100000 --instrument --profile bench.prof
+
+DEFAULT_SIZES = [10_000, 100_000]
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+REGION = set(COUNTRIES[:6])
+# Regiões sobrepostas (janelas deslizantes sobre a lista de países)
+REGIONS = {f'region_{i}': set(COUNTRIES[i:i + 6]) for i in range(0, 48, 2)}
+CENTRALITY_SAMPLES = 64   # origens da betweenness aproximada no grafo completo
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+class Stage:
+    """
+    Mede tempo (e, opcionalmente, pico de memória via tracemalloc) de um estágio.
+    """
+
+    def __init__(self, name, results, trace_memory=False, quiet=True):
+        self.name = name
+        self.results = results
+        self.trace_memory = trace_memory
+        self.quiet = quiet
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._stdout = contextlib.redirect_stdout(io.StringIO()) if self.quiet else None
+        if self._stdout:
+            self._stdout.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self._stdout:
+            self._stdout.__exit__(*exc)
+
+        entry = {'seconds': round(elapsed, 4), 'max_rss_mb': round(_max_rss_mb(), 1)}
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            entry['peak_traced_mb'] = round(peak / (1024 * 1024), 1)
+
+        self.results[self.name] = entry
+        return False
+
+
+def _query_latencies(titles, G, engine, top_n):
+    latencies = []
+    for title in titles:
+        start = time.perf_counter()
+        recommend_titles(title, G, top_n, engine=engine, use_cache=False)
+        latencies.append(time.perf_counter() - start)
+
+    ms = np.array(latencies) * 1000
+    return {
+        'queries': len(titles),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+    }
+
+
+def run_size(n_rows, workdir, queries=200, top_n=5, seed=42, trace_memory=False,
+             include_people=False, max_cast=None):
+    results = {}
+    instrumentation.reset()
+
+    def stage(name):
+        return Stage(name, results, trace_memory)
+
+    csv_path = os.path.join(workdir, f'catalog_{n_rows}.csv')
+    start = time.perf_counter()
+    write_catalog_csv(csv_path, n_rows, seed=seed)
+    generation = time.perf_counter() - start
+
+    with stage('load_data'):
+        df = load_data(csv_path)
+
+    with stage('build_edge_tables'):
+        edges = build_edge_tables(df, include_people=include_people, max_cast=max_cast)
+
+    with stage('build_full_graph'):
+        G_full = build_full_graph(df, edges=edges, include_people=include_people)
+
+    with stage('build_country_genre_graph'):
+        build_country_genre_graph(df, edges=edges)
+
+    with stage('build_region_country_genre_graph'):
+        build_region_country_genre_graph(df, REGION, edges=edges)
+
+    with stage(f'build_region_graphs_{len(REGIONS)}'):
+        build_region_graphs(df, REGIONS, edges=edges)
+
+    with stage('project_country_genre'):
+        project_country_genre(G_full)
+
+    titles = [d['label'] for _, d in G_full.nodes(data=True) if d.get('type') == 'title']
+    sample = random.Random(seed).sample(titles, min(queries, len(titles)))
+
+    recommend = {}
+    for engine in ('networkx', 'sparse'):
+        # Primeira consulta constrói as estruturas derivadas (feature store / matriz)
+        with stage(f'recommend_warmup_{engine}'):
+            recommend_titles(sample[0], G_full, top_n, engine=engine, use_cache=False)
+        recommend[engine] = _query_latencies(sample, G_full, engine, top_n)
+
+    with stage('analyze_centrality'):
+        analyze_centrality(G_full)
+
+    with stage('centrality_suite'):
+        compute_centrality(G_full, betweenness_k=CENTRALITY_SAMPLES)
+
+    os.remove(csv_path)
+
+    entry = {
+        'rows': n_rows,
+        'nodes': G_full.number_of_nodes(),
+        'edges': G_full.number_of_edges(),
+        'generation_seconds': round(generation, 3),
+        'stages': results,
+        'recommend': recommend,
+    }
+    if instrumentation.ENABLED:
+        entry['phases'] = instrumentation.snapshot()
+    return entry
+
+
+def print_summary(report):
+    for entry in report['runs']:
+        print(f"\n=== {entry['rows']} linhas ({entry['nodes']} nós, {entry['edges']} arestas) ===")
+        for name, stage in entry['stages'].items():
+            extra = f", pico {stage['peak_traced_mb']} MB" if 'peak_traced_mb' in stage else ''
+            print(f"  {name:<36} {stage['seconds']:>9.3f}s  (RSS máx {stage['max_rss_mb']} MB{extra})")
+        for engine, lat in entry['recommend'].items():
+            print(f"  recommend_titles[{engine}]".ljust(38) +
+                  f" p50 {lat['p50_ms']:.3f} ms  p99 {lat['p99_ms']:.3f} ms")
+        if 'phases' in entry:
+            print()
+            for name, h in entry['phases']['timers'].items():
+                print(f"  {name:<36} n={h['count']:<6} média {h['mean'] * 1000:.3f} ms  "
+                      f"p95 {h['p95'] * 1000:.3f} ms")
+            for name, h in entry['phases']['values'].items():
+                print(f"  {name:<36} n={h['count']:<6} média {h['mean']:.1f}  máx {h['max']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de grafos e recomendação.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="pico de memória por estágio via tracemalloc (mais lento)")
+    parser.add_argument('--people', action='store_true',
+                        help="inclui a camada de pessoas (diretores + elenco)")
+    parser.add_argument('--max-cast', type=int, default=None)
+    parser.add_argument('--instrument', action='store_true',
+                        help="tempos por fase e contadores (src.instrumentation) no relatório")
+    parser.add_argument('--profile', default=None, metavar='ARQUIVO',
+                        help="perfil completo (.prof do cProfile ou .html do pyinstrument)")
+    parser.add_argument('--out', default=None, help="arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    if args.instrument:
+        instrumentation.enable()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'people': args.people,
+        'runs': [],
+    }
+
+    if args.profile:
+        engine = 'pyinstrument' if args.profile.endswith('.html') else 'cprofile'
+        profiling = instrumentation.profile(args.profile, engine=engine)
+    else:
+        profiling = contextlib.nullcontext()
+
+    with profiling, tempfile.TemporaryDirectory() as workdir:
+        for n_rows in args.sizes:
+            print(f"Rodando benchmark com {n_rows} linhas...")
+            report['runs'].append(run_size(
+                n_rows, workdir, queries=args.queries, top_n=args.top_n,
+                seed=args.seed, trace_memory=args.trace_memory,
+                include_people=args.people, max_cast=args.max_cast
+            ))
+
+    print_summary(report)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados salvos em '{out}'")
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# Catálogo sintético com o mesmo esquema do netflix_titles.csv.
+# Popularidade de países, gêneros e pessoas segue uma lei de potência (Zipf),
+# como no catálogo real (poucos hubs como "United States" e "International Movies").
+
+N_COUNTRIES = 190
+N_GENRES = 42
+
+COUNTRIES = [f"Country {i}" for i in range(N_COUNTRIES)]
+GENRES = [f"Genre {i}" for i in range(N_GENRES)]
+
+ZIPF_EXPONENT = 1.1
+
+
+def _zipf_weights(n, exponent=ZIPF_EXPONENT):
+    w = 1.0 / np.arange(1, n + 1) ** exponent
+    return w / w.sum()
+
+
+def _multi_valued(rng, names, weights, n_rows, counts_p):
+    """
+    Gera uma coluna 'a, b, c' por linha: o nº de valores segue counts_p e
+    cada valor é sorteado pela popularidade (sem repetir dentro da linha).
+    """
+    names = np.asarray(names, dtype=object)
+    counts = rng.choice(len(counts_p), size=n_rows, p=counts_p)
+    column = np.full(n_rows, '', dtype=object)
+    chosen = []
+
+    for slot in range(len(counts_p) - 1):
+        idx = rng.choice(len(names), size=n_rows, p=weights)
+        valid = counts > slot
+        for previous in chosen:
+            valid &= idx != previous
+        chosen.append(np.where(valid, idx, -1))
+
+        values = names[idx]
+        first = valid & (column == '')
+        rest = valid & ~first
+        column[first] = values[first]
+        column[rest] = column[rest] + ', ' + values[rest]
+
+    return column
+
+
+def generate_catalog(n_rows, seed=42, n_people=None):
+    """
+    Gera um DataFrame com as colunas do CSV original (title, director, cast,
+    country, listed_in, ...). Mesma semente => mesmo catálogo.
+    """
+    rng = np.random.default_rng(seed)
+    n_people = n_people or max(1000, n_rows // 2)
+    people = [f"Person {i}" for i in range(n_people)]
+    people_w = _zipf_weights(n_people)
+
+    df = pd.DataFrame({
+        'show_id': [f"s{i + 1}" for i in range(n_rows)],
+        'type': np.where(rng.random(n_rows) < 0.7, 'Movie', 'TV Show'),
+        'title': [f"Title {i}" for i in range(n_rows)],
+        'director': _multi_valued(rng, people, people_w, n_rows, [0.3, 0.65, 0.05]),
+        'cast': _multi_valued(
+            rng, people, people_w, n_rows,
+            [0.1, 0.05, 0.05, 0.1, 0.15, 0.15, 0.15, 0.1, 0.1, 0.05]
+        ),
+        'country': _multi_valued(
+            rng, COUNTRIES, _zipf_weights(N_COUNTRIES), n_rows, [0.1, 0.7, 0.15, 0.05]
+        ),
+        'release_year': rng.integers(1940, 2025, size=n_rows),
+        'listed_in': _multi_valued(
+            rng, GENRES, _zipf_weights(N_GENRES), n_rows, [0.0, 0.25, 0.4, 0.35]
+        ),
+    })
+
+    # Campos vazios viram NaN, como no CSV real
+    for column in ('director', 'cast', 'country'):
+        df[column] = df[column].replace('', np.nan)
+
+    return df
+
+
+def write_catalog_csv(filepath, n_rows, seed=42):
+    df = generate_catalog(n_rows, seed=seed)
+    df.to_csv(filepath, index=False)
+    return filepath
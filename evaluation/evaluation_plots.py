@@ -1,15 +1,28 @@
+import hashlib
+import json
 import os
+import time
 import matplotlib.pyplot as plt
 import networkx as nx
 from collections import Counter
 import numpy as np
 
+from evaluation.offline_eval import evaluate
+from src import instrumentation, recommender
+from src.centrality import compute_centrality, top_nodes
+from src.graph_state import graph_fingerprint
+from src.workers import WORKER_STATE, worker_pool
+
 IMAGES_DIR = os.path.join("paper", "images")
 os.makedirs(IMAGES_DIR, exist_ok=True)
 
+DPI = 300
+RENDER_VERSION = 1                   # incrementar quando o código das figuras mudar
+MANIFEST_NAME = ".render_manifest.json"
+
 
 # 1. Distribuição de grau
-def plot_degree_distribution(G):
+def plot_degree_distribution(G, path=None):
     degrees = [d for _, d in G.degree() if d > 0]
 
     plt.figure(figsize=(8, 6))
@@ -21,8 +34,8 @@ def plot_degree_distribution(G):
     plt.grid(alpha=0.3)
     plt.tight_layout()
 
-    path = os.path.join(IMAGES_DIR, "distribuicao_grau.png")
-    plt.savefig(path, dpi=300)
+    path = path or os.path.join(IMAGES_DIR, "distribuicao_grau.png")
+    plt.savefig(path, dpi=DPI)
     plt.close()
 
 
@@ -33,23 +46,10 @@ def plot_degree_distribution(G):
 
 
 # 2. Centralidade de gêneros
-def plot_centralidade_generos(G, top_n=10):
-    from collections import defaultdict
-
-    genre_strength = defaultdict(float)
-
-    for u, v, d in G.edges(data=True):
-        weight = d.get("weight", 1)
-        if G.nodes[u]["type"] == "genre":
-            genre_strength[u] += weight
-        elif G.nodes[v]["type"] == "genre":
-            genre_strength[v] += weight
-
-    genres = sorted(
-        genre_strength.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:top_n]
+def plot_centralidade_generos(G, top_n=10, path=None):
+    # Força (soma dos pesos das arestas) dos gêneros, com seleção parcial do top N
+    table = compute_centrality(G, ['strength'])
+    genres = top_nodes(table, 'strength', top_n, 'genre')
 
     labels, values = zip(*genres)
 
@@ -61,8 +61,8 @@ def plot_centralidade_generos(G, top_n=10):
     plt.grid(axis="x", alpha=0.3)
     plt.tight_layout()
 
-    path = os.path.join(IMAGES_DIR, "centralidade_generos.png")
-    plt.savefig(path, dpi=300)
+    path = path or os.path.join(IMAGES_DIR, "centralidade_generos.png")
+    plt.savefig(path, dpi=DPI)
     plt.close()
 
 
@@ -70,7 +70,7 @@ def plot_centralidade_generos(G, top_n=10):
 
 # 3. Distribuição de gêneros por região
 
-def plot_genero_regiao(G, regiao_nome):
+def plot_genero_regiao(G, regiao_nome, path=None):
     genre_weights = Counter()
 
     for u, v, d in G.edges(data=True):
@@ -89,15 +89,15 @@ def plot_genero_regiao(G, regiao_nome):
     plt.grid(axis="x", alpha=0.3)
     plt.tight_layout()
 
-    path = os.path.join(IMAGES_DIR, f"genero_{regiao_nome.lower()}.png")
-    plt.savefig(path, dpi=300)
+    path = path or os.path.join(IMAGES_DIR, f"genero_{regiao_nome.lower()}.png")
+    plt.savefig(path, dpi=DPI)
     plt.close()
 
 
 
 # 4. Comparação estrutural entre regiões
 
-def plot_comparacao_regioes(region_graphs):
+def plot_comparacao_regioes(region_graphs, path=None):
     nomes = []
     nos = []
     arestas = []
@@ -119,53 +119,206 @@ def plot_comparacao_regioes(region_graphs):
     plt.grid(axis="y", alpha=0.3)
     plt.tight_layout()
 
-    path = os.path.join(IMAGES_DIR, "comparacao_regioes.png")
-    plt.savefig(path, dpi=300)
+    path = path or os.path.join(IMAGES_DIR, "comparacao_regioes.png")
+    plt.savefig(path, dpi=DPI)
     plt.close()
 
 
-# 5. Avaliação do sistema de recomendação 
-def plot_avaliacao_recomendacao(G_full, recommender_fn, sample_size=100):
-    titles = [
-        n for n, d in G_full.nodes(data=True)
-        if d.get("type") == "title"
-    ][:sample_size]
-
-    scores = []
+# 5. Avaliação do sistema de recomendação (leave-one-out, ver offline_eval)
+def plot_avaliacao_recomendacao(G_full, recommender_fn, sample_size=300, k=10, path=None):
+    summary = evaluate(G_full, sample_size, k, recommend_fn=recommender_fn)
+    if not summary.get("queries"):
+        return
 
-    for title in titles:
-        recs = recommender_fn(G_full.nodes[title]["label"], G_full)
-        scores.append(len(recs))
+    nomes = [f"Hit@{k}", f"Precisão@{k}", f"NDCG@{k}", "Cobertura", "Diversidade"]
+    valores = [
+        summary[f"hit@{k}"], summary[f"precision@{k}"], summary[f"ndcg@{k}"],
+        summary["coverage"], summary["diversity"] or 0.0,
+    ]
 
     plt.figure(figsize=(8, 6))
-    plt.hist(scores, bins=10, edgecolor="black")
-    plt.xlabel("Número de recomendações")
-    plt.ylabel("Frequência")
-    plt.title("Avaliação do Sistema de Recomendação")
-    plt.grid(alpha=0.3)
+    plt.bar(nomes, valores, color="#4C72B0", edgecolor="black")
+    plt.ylim(0, 1)
+    plt.ylabel("Valor")
+    plt.title(f"Avaliação do Sistema de Recomendação\n"
+              f"({summary['queries']} consultas, atributo escondido: {summary['held_out']})")
+    plt.grid(axis="y", alpha=0.3)
     plt.tight_layout()
 
-    path = os.path.join(IMAGES_DIR, "avaliacao_recomendacao.png")
-    plt.savefig(path, dpi=300)
+    path = path or os.path.join(IMAGES_DIR, "avaliacao_recomendacao.png")
+    plt.savefig(path, dpi=DPI)
     plt.close()
 
 
+# Pipeline de renderização
+# Cada figura vira um job (arquivo, função, argumentos). A impressão digital
+# do job (conteúdo dos grafos + parâmetros) fica no manifesto da pasta de
+# imagens; o conteúdo vem de graph_fingerprint, calculado em blocos uma vez
+# por versão do grafo e compartilhado entre os jobs; figuras com a mesma impressão digital e o arquivo presente são
+# puladas. As demais são renderizadas em processos com o backend Agg.
+
+def _fingerprint_value(value):
+    if isinstance(value, nx.Graph) or getattr(value, 'is_compact', False):
+        return f"graph:{graph_fingerprint(value)}"
+    if isinstance(value, dict):
+        return {str(k): _fingerprint_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint_value(v) for v in value]
+    if callable(value):
+        # Funções de recomendação: o ranking depende também dos pesos
+        return f"fn:{value.__module__}.{value.__qualname__}:{recommender.weights_key()!r}"
+    return repr(value)
+
+
+def job_fingerprint(fn, args, kwargs):
+    payload = json.dumps({
+        'version': RENDER_VERSION,
+        'dpi': DPI,
+        'fn': fn.__name__,
+        'args': _fingerprint_value(list(args)),
+        'kwargs': _fingerprint_value(kwargs),
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _job_cost(args):
+    # Estimativa grosseira para agendar as figuras mais pesadas primeiro
+    cost = 0
+    for value in args:
+        graphs = value.values() if isinstance(value, dict) else [value]
+        cost += sum(G.number_of_edges() for G in graphs if hasattr(G, 'number_of_edges'))
+    return cost
+
+
+def plot_jobs(G_country_genre, G_full, recommender_fn, region_graphs):
+    """
+    [(arquivo, função, args, kwargs), ...] das figuras do projeto.
+    """
+    jobs = [
+        ("distribuicao_grau.png", plot_degree_distribution, (G_country_genre,), {}),
+        ("centralidade_generos.png", plot_centralidade_generos, (G_country_genre,), {}),
+    ]
+    for nome, G in region_graphs.items():
+        jobs.append((f"genero_{nome.lower()}.png", plot_genero_regiao, (G, nome), {}))
+    jobs.append(("comparacao_regioes.png", plot_comparacao_regioes, (region_graphs,), {}))
+    jobs.append(("avaliacao_recomendacao.png", plot_avaliacao_recomendacao, (G_full, recommender_fn), {}))
+    return jobs
+
+
+def _load_manifest(images_dir):
+    try:
+        with open(os.path.join(images_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(images_dir, manifest):
+    path = os.path.join(images_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _render(job, path):
+    filename, fn, args, kwargs = job
+    start = time.perf_counter()
+    try:
+        fn(*args, path=path, **kwargs)
+    except Exception as exc:
+        plt.close("all")
+        return {"file": filename, "status": "error", "error": f"{type(exc).__name__}: {exc}",
+                "seconds": time.perf_counter() - start}
+    status = "rendered" if os.path.exists(path) else "empty"
+    return {"file": filename, "status": status, "seconds": time.perf_counter() - start}
+
+
+def _render_job(i):
+    return i, _render(WORKER_STATE["jobs"][i], WORKER_STATE["paths"][i])
+
+
+def _render_all(jobs, paths, workers):
+    if workers <= 1:
+        # Agg também no processo principal, sem perder o backend interativo do menu
+        backend = plt.get_backend()
+        plt.switch_backend("Agg")
+        try:
+            return [_render(job, path) for job, path in zip(jobs, paths)]
+        finally:
+            plt.switch_backend(backend)
+
+    # Filhos herdam os grafos; o backend é trocado em cada filho
+    order = sorted(range(len(jobs)), key=lambda i: -_job_cost(jobs[i][2]))
+    results = [None] * len(jobs)
+    with worker_pool(workers, plt.switch_backend, ("Agg",), jobs=jobs, paths=paths) as pool:
+        for i, result in pool.imap_unordered(_render_job, order):
+            results[i] = result
+    return results
+
+
+def render_plots(jobs, workers=None, force=False, images_dir=None):
+    """
+    Renderiza os jobs desatualizados e imprime o tempo de cada figura.
+    workers > 1 usa processos (None = nº de CPUs); force=True ignora o manifesto.
+    """
+    images_dir = images_dir or IMAGES_DIR
+    os.makedirs(images_dir, exist_ok=True)
+    manifest = _load_manifest(images_dir)
+
+    results, pending, fingerprints = {}, [], {}
+    for job in jobs:
+        filename, fn, args, kwargs = job
+        fingerprints[filename] = job_fingerprint(fn, args, kwargs)
+        path = os.path.join(images_dir, filename)
+        if not force and manifest.get(filename) == fingerprints[filename] and os.path.exists(path):
+            results[filename] = {"file": filename, "status": "skipped", "seconds": 0.0}
+        else:
+            pending.append(job)
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    paths = [os.path.join(images_dir, job[0]) for job in pending]
+    start = time.perf_counter()
+    for result in _render_all(pending, paths, workers) if pending else []:
+        results[result["file"]] = result
+        if result["status"] == "rendered":
+            manifest[result["file"]] = fingerprints[result["file"]]
+            instrumentation.observe_seconds(f"render.{os.path.splitext(result['file'])[0]}", result["seconds"])
+        else:
+            manifest.pop(result["file"], None)
+    elapsed = time.perf_counter() - start
+
+    _save_manifest(images_dir, manifest)
+
+    ordered = [results[job[0]] for job in jobs]
+    for r in ordered:
+        extra = f"  {r['error']}" if r["status"] == "error" else ""
+        print(f"  {r['file']:<40} {r['status']:<9} {r['seconds']:>7.2f}s{extra}")
+    rendered = sum(r["status"] == "rendered" for r in ordered)
+    print(f"{rendered} figuras renderizadas, {len(ordered) - len(pending)} atualizadas "
+          f"(puladas) em {elapsed:.2f}s com {max(workers, 1)} processo(s)")
+    return ordered
+
+
 # Função principal
 def generate_all_plots_extended(
     G_country_genre,
     G_full,
     recommender_fn,
-    region_graphs
+    region_graphs,
+    workers=None,
+    force=False
 ):
     print("\n=== Gerando gráficos do projeto ===")
 
-    plot_degree_distribution(G_country_genre)
-    plot_centralidade_generos(G_country_genre)
-
-    for nome, G in region_graphs.items():
-        plot_genero_regiao(G, nome)
-
-    plot_comparacao_regioes(region_graphs)
-    plot_avaliacao_recomendacao(G_full, recommender_fn)
-
-    print("=== Todos os gráficos foram gerados com sucesso ===")
+    results = render_plots(
+        plot_jobs(G_country_genre, G_full, recommender_fn, region_graphs),
+        workers=workers, force=force
+    )
+
+    errors = [r for r in results if r["status"] == "error"]
+    if errors:
+        print(f"=== {len(errors)} gráfico(s) com erro ===")
+    else:
+        print("=== Todos os gráficos foram gerados com sucesso ===")
+    return results
@@ -0,0 +1,333 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+from src.features import TYPE_CODES, get_features
+from src.recommender import recommend_titles
+from src.sparse_recommender import get_compiled
+from src.title_index import get_title_index
+from src.workers import WORKER_STATE, worker_pool, worker_state
+
+# Avaliação offline do recomendador (leave-one-out).
+# Para cada título da amostra, um atributo (por padrão uma pessoa: diretor
+# ou elenco; sem pessoas, um gênero) é escondido com exclude_neighbors.
+# As recomendações são relevantes se compartilham o atributo escondido com
+# o título, ou seja, o sinal que o recomendador precisa recuperar.
+#
+#   python -m evaluation.offline_eval --sample 2000 --k 10 --workers 2
+#   python -m evaluation.offline_eval --synthetic 50000 --engine networkx sparse
+
+RESULTS_DIR = os.path.join('evaluation', 'results')
+N_STRATA = 4
+
+
+# Amostra
+
+def _held_out_type(features, held_out):
+    if held_out is not None:
+        return held_out
+    has_people = np.any(features.type_code == TYPE_CODES['person'])
+    return 'person' if has_people else 'genre'
+
+
+def build_queries(G, sample_size=1000, held_out=None, strata=N_STRATA, seed=42):
+    """
+    Amostra estratificada de consultas (título, atributo escondido).
+    Estratos = quantis do grau do título, com alocação proporcional.
+    Só entram títulos com um atributo do tipo escondido compartilhado com
+    algum outro título (senão não há o que recuperar).
+    """
+    features = get_features(G)
+    held_out = _held_out_type(features, held_out)
+    code = TYPE_CODES[held_out]
+    rng = random.Random(seed)
+
+    title_ids = np.flatnonzero(features.type_code == TYPE_CODES['title'])
+    adj, owner = features.gather(title_ids)
+    shareable = (features.type_code[adj] == code) & (features.degree[adj] >= 2)
+    eligible = np.unique(owner[shareable])
+    if len(eligible) == 0:
+        return []
+
+    # Estratos por grau (bordas nos quantis; graus repetidos podem juntar estratos)
+    degree = features.degree[title_ids[eligible]]
+    edges = np.unique(np.quantile(degree, np.linspace(0, 1, strata + 1)[1:-1]))
+    stratum = np.searchsorted(edges, degree, side='right')
+
+    sample_size = min(sample_size, len(eligible))
+    chosen = []
+    for s in np.unique(stratum):
+        members = eligible[stratum == s].tolist()
+        quota = max(1, round(sample_size * len(members) / len(eligible)))
+        chosen += rng.sample(members, min(quota, len(members)))
+    rng.shuffle(chosen)
+    chosen = chosen[:sample_size]
+
+    nodes = features.nodes
+    queries = []
+    for i in chosen:
+        source = title_ids[i]
+        options = [
+            n for n in features.neighbors(source).tolist()
+            if features.type_code[n] == code and features.degree[n] >= 2
+        ]
+        hidden = rng.choice(options)
+        queries.append((G.nodes[nodes[source]]['label'], nodes[hidden]))
+    return queries
+
+
+# Métricas de uma consulta
+
+def _relevant_labels(G, hidden, title_label):
+    return {
+        G.nodes[n]['label'] for n in G.neighbors(hidden)
+        if G.nodes[n].get('type') == 'title'
+    } - {title_label}
+
+
+def _attribute_sets(G, labels):
+    index = get_title_index(G)
+    sets = []
+    for label in labels:
+        node = index.lookup(label)
+        sets.append(set(G.neighbors(node)) if node is not None else set())
+    return sets
+
+
+def _intra_list_diversity(sets):
+    """
+    1 - Jaccard médio entre os pares de recomendações (atributos não ponderados).
+    """
+    if len(sets) < 2:
+        return None
+    total, pairs = 0.0, 0
+    for i in range(len(sets)):
+        for j in range(i + 1, len(sets)):
+            union = len(sets[i] | sets[j])
+            total += len(sets[i] & sets[j]) / union if union else 1.0
+            pairs += 1
+    return 1.0 - total / pairs
+
+
+def evaluate_query(G, title_label, hidden, k=10, engine="networkx", recommend_fn=recommend_titles):
+    start = time.perf_counter()
+    recs = recommend_fn(title_label, G, k, engine=engine, exclude_neighbors=[hidden])
+    elapsed = time.perf_counter() - start
+
+    labels = [r for r, _ in recs]
+    relevant = _relevant_labels(G, hidden, title_label)
+    gains = np.array([1.0 if r in relevant else 0.0 for r in labels])
+    discounts = 1.0 / np.log2(np.arange(2, len(gains) + 2))
+
+    ideal = min(k, len(relevant))
+    idcg = float((1.0 / np.log2(np.arange(2, ideal + 2))).sum())
+    hits = int(gains.sum())
+
+    return {
+        'title': title_label,
+        'hit': float(hits > 0),
+        'precision': hits / k,
+        'recall': hits / len(relevant) if relevant else 0.0,
+        'ndcg': float((gains * discounts).sum()) / idcg if idcg else 0.0,
+        'diversity': _intra_list_diversity(_attribute_sets(G, labels)),
+        'returned': len(labels),
+        'seconds': elapsed,
+        'recommended': labels,
+    }
+
+
+# Execução (paralela)
+
+def _evaluate_chunk(queries):
+    state = WORKER_STATE
+    return [
+        evaluate_query(state['G'], t, h, state['k'], state['engine'], state['recommend_fn'])
+        for t, h in queries
+    ]
+
+
+def _chunks(items, size):
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _prepare(G, engine):
+    # Estruturas derivadas construídas antes do fork são compartilhadas
+    get_title_index(G)
+    get_features(G)
+    if engine == "sparse":
+        with contextlib.redirect_stdout(io.StringIO()):
+            get_compiled(G)
+
+
+def _run_queries(G, queries, k, engine, workers, chunksize, recommend_fn):
+    _prepare(G, engine)
+    state = dict(G=G, k=k, engine=engine, recommend_fn=recommend_fn)
+    if workers <= 1:
+        with worker_state(**state):
+            return _evaluate_chunk(queries)
+
+    results = []
+    with worker_pool(workers, **state) as pool:
+        for chunk in pool.imap_unordered(_evaluate_chunk, _chunks(queries, chunksize)):
+            results.extend(chunk)
+    return results
+
+
+def _gini(counts, n_items):
+    """
+    Concentração das recomendações no catálogo (0 = uniforme, 1 = um só título).
+    """
+    if n_items == 0:
+        return 0.0
+    values = np.zeros(n_items)
+    values[:len(counts)] = sorted(counts)
+    values.sort()
+    total = values.sum()
+    if total == 0:
+        return 0.0
+    ranks = np.arange(1, n_items + 1)
+    return float(((2 * ranks - n_items - 1) * values).sum() / (n_items * total))
+
+
+def summarize(results, n_titles, k, elapsed):
+    if not results:
+        return {'queries': 0}
+
+    diversity = [r['diversity'] for r in results if r['diversity'] is not None]
+    latency = np.array([r['seconds'] for r in results]) * 1000
+    freq = Counter(label for r in results for label in r['recommended'])
+
+    return {
+        'queries': len(results),
+        'k': k,
+        f'hit@{k}': float(np.mean([r['hit'] for r in results])),
+        f'precision@{k}': float(np.mean([r['precision'] for r in results])),
+        f'recall@{k}': float(np.mean([r['recall'] for r in results])),
+        f'ndcg@{k}': float(np.mean([r['ndcg'] for r in results])),
+        'coverage': len(freq) / n_titles if n_titles else 0.0,
+        'diversity': float(np.mean(diversity)) if diversity else None,
+        'gini': _gini(list(freq.values()), n_titles),
+        'empty': sum(1 for r in results if r['returned'] == 0),
+        'seconds': round(elapsed, 3),
+        'qps': len(results) / elapsed if elapsed else None,
+        'p50_ms': float(np.percentile(latency, 50)),
+        'p99_ms': float(np.percentile(latency, 99)),
+    }
+
+
+def evaluate(G, sample_size=1000, k=10, engine="networkx", workers=1, held_out=None,
+             seed=42, chunksize=64, queries=None, recommend_fn=recommend_titles):
+    """
+    Qualidade (hit@K, precision, recall, NDCG, cobertura, diversidade, Gini)
+    e vazão (consultas/s) do recomendador sobre uma amostra estratificada.
+    workers > 1 distribui as consultas entre processos (None = nº de CPUs).
+    recommend_fn precisa aceitar engine= e exclude_neighbors= (como recommend_titles).
+    """
+    if queries is None:
+        queries = build_queries(G, sample_size, held_out, seed=seed)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    results = _run_queries(G, queries, k, engine, workers, chunksize, recommend_fn)
+    elapsed = time.perf_counter() - start
+
+    n_titles = len(get_title_index(G).labels)
+    summary = summarize(results, n_titles, k, elapsed)
+    summary.update({'engine': engine, 'workers': workers,
+                    'held_out': _held_out_type(get_features(G), held_out)})
+    return summary
+
+
+def print_summary(summary):
+    k = summary.get('k')
+    if not summary.get('queries'):
+        print("Nenhuma consulta avaliável (sem atributos compartilhados do tipo escondido).")
+        return
+    diversity = summary['diversity']
+    print(
+        f"[{summary['engine']}] {summary['queries']} consultas, atributo escondido: {summary['held_out']}\n"
+        f"  hit@{k} {summary[f'hit@{k}']:.3f} | precision@{k} {summary[f'precision@{k}']:.3f} | "
+        f"recall@{k} {summary[f'recall@{k}']:.3f} | NDCG@{k} {summary[f'ndcg@{k}']:.3f}\n"
+        f"  cobertura {summary['coverage']:.3f} | diversidade "
+        f"{'-' if diversity is None else f'{diversity:.3f}'} | Gini {summary['gini']:.3f} | "
+        f"vazias {summary['empty']}\n"
+        f"  {summary['qps']:.1f} consultas/s ({summary['workers']} processos) | "
+        f"p50 {summary['p50_ms']:.2f} ms | p99 {summary['p99_ms']:.2f} ms"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avaliação offline (leave-one-out) do recomendador.")
+    parser.add_argument('--sample', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--engine', nargs='+', default=['networkx'], choices=['networkx', 'sparse'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--held-out', default=None, choices=['person', 'genre', 'country'],
+                        help="tipo de atributo escondido (padrão: pessoa, se houver)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--synthetic', type=int, default=None,
+                        help="usa um catálogo sintético de N linhas em vez do CSV")
+    parser.add_argument('--out', default=None, help="arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from benchmarks.synthetic import generate_catalog
+        from src.graph_builder import build_full_graph
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            G = build_full_graph(generate_catalog(args.synthetic, seed=args.seed),
+                                 include_people=True, max_cast=10)
+    else:
+        # Mesmos grafos (e cache) do menu interativo
+        from src.config import CSV_PATH, INCLUIR_PESSOAS, MAX_ELENCO, MIN_TITULOS_PESSOA, REGIOES
+        from src.graph_store import load_or_build_graphs
+        from src.tuning import apply_configured_profile
+
+        apply_configured_profile()
+        G = load_or_build_graphs(
+            CSV_PATH, REGIOES,
+            include_people=INCLUIR_PESSOAS,
+            max_cast=MAX_ELENCO,
+            min_person_titles=MIN_TITULOS_PESSOA
+        )['full']
+
+    queries = build_queries(G, args.sample, args.held_out, seed=args.seed)
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'sample': args.sample,
+        'seed': args.seed,
+        'runs': [],
+    }
+    for engine in args.engine:
+        summary = evaluate(G, k=args.k, engine=engine, workers=args.workers,
+                           held_out=args.held_out, queries=queries)
+        print_summary(summary)
+        report['runs'].append(summary)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados salvos em '{out}'")
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,56 @@
 import os
-import math
 import networkx as nx
 import matplotlib.pyplot as plt
 
 
-from src.data_loader import load_data
-from src.graph_builder import (
-    build_full_graph,
-    build_country_genre_graph,
-    build_region_country_genre_graph
-)
+from src import instrumentation
+from src.config import CSV_PATH, INCLUIR_PESSOAS, MAX_ELENCO, MIN_TITULOS_PESSOA, REGIOES
+from src.export import export_graphs
+from src.graph_store import load_or_build_graphs
+from src.layout import layout_nodes
 from src.recommender import recommend_titles
+from src.title_index import get_title_index
+from src.tuning import apply_configured_profile
 from evaluation.evaluation_plots import generate_all_plots_extended
 
-# Configurações
-CSV_PATH = os.path.join('data', 'raw', 'netflix_titles.csv')
+# Configurações (CSV, regiões, camada de pessoas e perfil de pesos ficam em src/config.py)
 
-ESTADOS_UNIDOS = {"United States"}
-EUROPA = {
-    "United Kingdom", "France", "Germany", "Spain", "Italy",
-    "Netherlands", "Sweden", "Norway", "Denmark", "Belgium"
-}
-AMERICA_LATINA = {
-    "Brazil", "Mexico", "Argentina", "Colombia", "Chile", "Peru"
-}
+# Tempos por fase (carga, construção, recomendação); também via GRAPH_INSTRUMENTATION=1
+INSTRUMENTACAO = False
+ARQUIVO_METRICAS = os.path.join('data', 'metricas.json')   # .prom = formato Prometheus
+
+# Exportação (opção 2): formatos extras além do .gexf do Gephi ('npz', 'parquet', 'graphml.gz')
+PASTA_EXPORTACAO = os.path.join('paper', 'gephi_files')
+FORMATOS_EXTRAS = []
+PROCESSOS_EXPORTACAO = None   # None = nº de CPUs
+
+# Gráficos (opção 3): figuras com entradas inalteradas não são renderizadas de novo
+PROCESSOS_GRAFICOS = None     # None = nº de CPUs
 
 
 
 # Exportação para o gephi
-def exportar_para_gephi(G, nome_arquivo):
-    pasta = os.path.join('paper', 'gephi_files')
-    os.makedirs(pasta, exist_ok=True)
-    try:
-        nx.write_gexf(G, os.path.join(pasta, nome_arquivo))
-        print(f"✅ Exportado: {nome_arquivo}")
-    except Exception as e:
-        print(f"❌ Erro ao exportar {nome_arquivo}: {e}")
+def exportar_grafos(grafos):
+    """
+    Exporta {nome_base: grafo} em paralelo: .gexf + FORMATOS_EXTRAS.
+    """
+    jobs = [
+        (G, os.path.join(PASTA_EXPORTACAO, f"{nome}.{fmt}"))
+        for nome, G in grafos.items()
+        for fmt in ['gexf'] + FORMATOS_EXTRAS
+    ]
+    resultados = export_graphs(jobs, workers=PROCESSOS_EXPORTACAO)
+
+    erros = [r for r in resultados if 'error' in r]
+    total = sum(r.get('seconds', 0) for r in resultados)
+    print(f"{len(resultados) - len(erros)}/{len(resultados)} arquivos exportados "
+          f"(soma dos tempos {total:.2f}s).")
 
 
 
-# Buca de títulos
+# Buca de títulos (índice de trigramas, resultados ordenados por relevância)
 def buscar_filme_proximo(termo, G):
-    termo = termo.lower()
-    return [
-        d['label']
-        for _, d in G.nodes(data=True)
-        if d.get('type') == 'title'
-        and termo in d.get('label', '').lower()
-    ]
+    return get_title_index(G).search(termo)
 
 
 
@@ -58,16 +61,16 @@ def visualizar_grafo_recomendacao(G, filme_alvo, recomendacoes):
     titulos_recs = [r[0] for r in recomendacoes]
     nodes_to_draw = {filme_alvo}
     
-    # Adiciona nós intermediários
+    # Adiciona nós intermediários (vizinhos do alvo calculados uma vez só)
+    vizinhos_alvo = set(G.neighbors(filme_alvo))
     for rec in titulos_recs:
         nodes_to_draw.add(rec)
-        common = list(nx.common_neighbors(G, filme_alvo, rec))
-        nodes_to_draw.update(common)
+        nodes_to_draw.update(n for n in G.neighbors(rec) if n in vizinhos_alvo)
         
     sub = G.subgraph(list(nodes_to_draw))
     
-    # Layout
-    pos = nx.spring_layout(sub, k=0.9, iterations=50, seed=42)
+    # Layout: atributos em posições globais fixas (cache em disco), só os títulos são posicionados
+    pos = layout_nodes(G, sub.nodes)
     plt.figure(figsize=(14, 10))
     
     # Cores
@@ -82,7 +85,9 @@ def visualizar_grafo_recomendacao(G, filme_alvo, recomendacoes):
         else: color_map.append('#95a5a6')
         
     nx.draw_networkx_nodes(sub, pos, node_color=color_map, node_size=1000, alpha=0.9)
-    nx.draw_networkx_labels(sub, pos, font_size=8, font_weight='bold')
+    # Pessoas têm chave inteira: o nome fica em 'label'
+    rotulos = {node: G.nodes[node].get('label', node) for node in sub}
+    nx.draw_networkx_labels(sub, pos, labels=rotulos, font_size=8, font_weight='bold')
     
     # Arestas com espessura variável
     edges_list = list(sub.edges())
@@ -125,27 +130,38 @@ def visualizar_grafo_recomendacao(G, filme_alvo, recomendacoes):
 def main():
     print("=== NETFLIX ANALYTICS TOOL ===")
 
-    try:
-        df = load_data(CSV_PATH)
-    except:
-        print("❌ Erro ao carregar o CSV.")
-        return
+    if INSTRUMENTACAO:
+        instrumentation.enable()
 
+    apply_configured_profile()
 
-    # Construção dos grafos
+    # Construção dos grafos (ou carga do cache em disco, se o CSV não mudou)
 
     print("\nConstruindo grafos...")
 
+    try:
+        graphs = load_or_build_graphs(
+            CSV_PATH, REGIOES,
+            include_people=INCLUIR_PESSOAS,
+            max_cast=MAX_ELENCO,
+            min_person_titles=MIN_TITULOS_PESSOA
+        )
+    except (OSError, ValueError, KeyError) as e:
+        # Arquivo ausente/ilegível, CSV malformado (ParserError e EmptyDataError
+        # são ValueError) ou sem as colunas esperadas
+        print(f"❌ Erro ao carregar o CSV: {e}")
+        return
+
     # Grafo completo
-    G_full = build_full_graph(df)
+    G_full = graphs['full']
 
     # Grafo global País × Gênero
-    G_country_genre = build_country_genre_graph(df)
+    G_country_genre = graphs['country_genre']
 
     # Grafos regionais
-    G_eua = build_region_country_genre_graph(df, ESTADOS_UNIDOS)
-    G_europa = build_region_country_genre_graph(df, EUROPA)
-    G_latam = build_region_country_genre_graph(df, AMERICA_LATINA)
+    G_eua = graphs['eua']
+    G_europa = graphs['europa']
+    G_latam = graphs['latam']
 
 
     # Menu
@@ -179,11 +195,13 @@ def main():
                 print("❌ Filme não encontrado.")
 
         elif opt == '2':
-            exportar_para_gephi(G_full, "recomendacao.gexf")
-            exportar_para_gephi(G_country_genre, "pais_genero_global.gexf")
-            exportar_para_gephi(G_eua, "genero_estados_unidos.gexf")
-            exportar_para_gephi(G_europa, "genero_europa.gexf")
-            exportar_para_gephi(G_latam, "genero_america_latina.gexf")
+            exportar_grafos({
+                "recomendacao": G_full,
+                "pais_genero_global": G_country_genre,
+                "genero_estados_unidos": G_eua,
+                "genero_europa": G_europa,
+                "genero_america_latina": G_latam,
+            })
 
         elif opt == '3':
             region_graphs = {
@@ -196,7 +214,8 @@ def main():
                 G_country_genre=G_country_genre,
                 G_full=G_full,
                 recommender_fn=recommend_titles,
-                region_graphs=region_graphs
+                region_graphs=region_graphs,
+                workers=PROCESSOS_GRAFICOS
             )
 
             print("✅ Gráficos gerados com sucesso!")
@@ -204,6 +223,10 @@ def main():
         else:
             print("❌ Opção inválida.")
 
+    if instrumentation.ENABLED:
+        print("\n" + instrumentation.report())
+        print(f"Métricas salvas em '{instrumentation.export(ARQUIVO_METRICAS)}'")
+
 
 
 if __name__ == "__main__":
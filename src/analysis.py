@@ -1,31 +1,34 @@
 import networkx as nx
 import matplotlib.pyplot as plt
 
-def analyze_centrality(G, top_n=5):
+from src.centrality import compute_centrality, top_nodes
+from src.layout import layout_nodes
+
+def analyze_centrality(G, top_n=5, measure='degree', betweenness_k=None):
     """
-    Calcula a Centralidade de Grau para identificar 'hubs' (Países e Gêneros mais influentes).
+    Identifica os 'hubs' (Países e Gêneros mais influentes) por uma medida de
+    centralidade: degree, strength, pagerank, eigenvector ou betweenness
+    (ver src/centrality; betweenness_k sorteia origens em grafos grandes).
     """
     print("\n--- Iniciando Análise de Centralidade ---")
-    
-    # Calcula o grau de todos os nós
-    degree_dict = dict(G.degree())
-    
-    # Separa nós por tipo
-    genre_nodes = [n for n, attr in G.nodes(data=True) if attr.get('type') == 'genre']
-    country_nodes = [n for n, attr in G.nodes(data=True) if attr.get('type') == 'country']
 
-    # Ordena para achar os top N
-    top_genres = sorted([(n, degree_dict[n]) for n in genre_nodes], key=lambda x: x[1], reverse=True)[:top_n]
-    top_countries = sorted([(n, degree_dict[n]) for n in country_nodes], key=lambda x: x[1], reverse=True)[:top_n]
+    table = compute_centrality(G, [measure], betweenness_k=betweenness_k)
+
+    # Top N por tipo com seleção parcial (sem ordenar todos os nós)
+    top_genres = top_nodes(table, measure, top_n, 'genre')
+    top_countries = top_nodes(table, measure, top_n, 'country')
+
+    unit = "conexões" if measure == 'degree' else f"({measure})"
+    fmt = (lambda v: f"{v:.0f}") if measure == 'degree' else (lambda v: f"{v:.4g}")
 
     print(f"Top {top_n} Gêneros mais comuns:")
-    for genre, count in top_genres:
-        print(f"   - {genre}: {count} conexões")
+    for genre, value in top_genres:
+        print(f"   - {genre}: {fmt(value)} {unit}")
 
     print(f"Top {top_n} Países produtores:")
-    for country, count in top_countries:
-        print(f"   - {country}: {count} conexões")
-        
+    for country, value in top_countries:
+        print(f"   - {country}: {fmt(value)} {unit}")
+
     return top_genres, top_countries
 
 def plot_subgraph(G, central_node, filename="graph_viz.png"):
@@ -42,7 +45,7 @@ def plot_subgraph(G, central_node, filename="graph_viz.png"):
     subgraph = G.subgraph(subset)
     
     plt.figure(figsize=(10, 8))
-    pos = nx.spring_layout(subgraph, seed=42)
+    pos = layout_nodes(G, subgraph.nodes)
     
     # Cores simples
     colors = ['#1f78b4' if G.nodes[n].get('type') == 'title' else '#33a02c' for n in subgraph]
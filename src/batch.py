@@ -0,0 +1,57 @@
+import os
+from itertools import islice
+
+from src.recommender import recommend_titles
+from src.sparse_recommender import get_compiled
+from src.title_index import get_title_index
+from src.workers import WORKER_STATE, worker_pool
+
+# Recomendação em lote para o catálogo inteiro.
+# Os processos herdam o grafo (e a versão compilada) via src.workers.
+
+
+def _recommend_chunk(args):
+    titles, top_n = args
+    G = WORKER_STATE['G']
+    engine = WORKER_STATE['engine']
+    return [(t, recommend_titles(t, G, top_n, engine=engine)) for t in titles]
+
+
+def _chunks(titles, size):
+    it = iter(titles)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _prepare(G, engine):
+    # Estruturas derivadas construídas antes do fork são compartilhadas
+    get_title_index(G)
+    if engine == "sparse":
+        get_compiled(G)
+
+
+def recommend_batch(titles, G, top_n=5, workers=None, engine="sparse", chunksize=256):
+    """
+    Gera (título, [(recomendação, score), ...]) para cada título.
+    titles=None usa todos os títulos do grafo. Os resultados são produzidos
+    à medida que ficam prontos (a ordem não é garantida com workers > 1).
+    """
+    if titles is None:
+        titles = list(get_title_index(G).labels)
+
+    workers = workers or os.cpu_count() or 1
+    _prepare(G, engine)
+
+    if workers == 1:
+        for title in titles:
+            yield title, recommend_titles(title, G, top_n, engine=engine)
+        return
+
+    tasks = ((chunk, top_n) for chunk in _chunks(titles, chunksize))
+
+    with worker_pool(workers, G=G, engine=engine) as pool:
+        for results in pool.imap_unordered(_recommend_chunk, tasks):
+            yield from results
@@ -0,0 +1,375 @@
+import argparse
+import os
+import random
+import time
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import scipy.sparse.linalg  # noqa: F401  (sp.linalg)
+
+from src.features import OTHER_CODE, TYPE_CODES
+from src.graph_state import get_derived
+from src.instrumentation import timed
+from src.recommender import top_n_indices
+from src.workers import WORKER_STATE, worker_pool
+
+# Centralidades dos grafos (País × Gênero, regionais e completo) com álgebra
+# esparsa: a adjacência vira uma matriz CSR (construída uma vez por versão do
+# grafo) e cada medida é um produto matriz–vetor iterado:
+# - degree / strength:  nº de vizinhos / soma dos pesos das arestas
+# - pagerank:           iteração de potência (mesma definição do nx.pagerank)
+# - eigenvector:        maior autovetor via ARPACK (nx.eigenvector_centrality_numpy)
+# - betweenness:        Brandes por BFS em lotes de origens (A @ matriz densa),
+#                       aproximada com k origens sorteadas (nx, k=...)
+# Betweenness ignora pesos (caminhos em nº de saltos), como o padrão do networkx.
+#
+#   python -m src.centrality --betweenness-k 256 --workers 4
+
+MEASURES = ['degree', 'strength', 'pagerank', 'eigenvector', 'betweenness']
+
+TYPE_NAMES = sorted(TYPE_CODES, key=TYPE_CODES.get) + ['other']
+
+BATCH_CELLS = 4_000_000      # nós × origens por lote da betweenness
+OUTPUT_DIR = os.path.join('data', 'centrality')
+
+
+class AdjacencyMatrix:
+    """
+    - nodes:      nó de cada linha
+    - labels:     label de cada nó
+    - type_code:  código do tipo (mesmos códigos do feature store)
+    - matrix:     adjacência ponderada em CSR (peso = atributo 'weight', 1 se ausente)
+    - binary:     mesma estrutura com pesos 1 (contagem de caminhos)
+    """
+
+    def __init__(self, G, weight='weight'):
+        if getattr(G, 'is_compact', False):
+            # Grafo compacto: CSR pronta, sem pesos nas arestas
+            n = G.number_of_nodes()
+            self.nodes = np.arange(n)
+            self.labels = G.labels
+            self.type_code = G.node_type
+            binary = sp.csr_matrix(
+                (np.ones(len(G.indices)), G.indices, G.indptr), shape=(n, n)
+            )
+            self.matrix = binary
+        else:
+            self.nodes = list(G.nodes)
+            node_id = {v: i for i, v in enumerate(self.nodes)}
+            n = len(self.nodes)
+            self.labels = np.array([d.get('label', v) for v, d in G.nodes(data=True)], dtype=object)
+            self.type_code = np.fromiter(
+                (TYPE_CODES.get(d.get('type'), OTHER_CODE) for _, d in G.nodes(data=True)),
+                dtype=np.int8, count=n
+            )
+
+            m = G.number_of_edges()
+            src = np.empty(m, dtype=np.int64)
+            dst = np.empty(m, dtype=np.int64)
+            w = np.empty(m)
+            for i, (u, v, value) in enumerate(G.edges(data=weight, default=1)):
+                src[i], dst[i], w[i] = node_id[u], node_id[v], value
+
+            if not G.is_directed():
+                loops = src == dst
+                src, dst = np.concatenate([src, dst[~loops]]), np.concatenate([dst, src[~loops]])
+                w = np.concatenate([w, w[~loops]])
+
+            self.matrix = sp.csr_matrix((w, (src, dst)), shape=(n, n))
+            binary = self.matrix.copy()
+            binary.data[:] = 1.0
+
+        self.binary = binary
+        self.directed = G.is_directed()
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+
+@timed('build_centrality_matrix')
+def build_adjacency(G):
+    return AdjacencyMatrix(G)
+
+
+def get_adjacency(G):
+    return get_derived(G, 'centrality_matrix', build_adjacency)
+
+
+# Medidas
+
+def degree(adj):
+    return np.diff(adj.binary.indptr).astype(np.float64)
+
+
+def strength(adj):
+    return np.asarray(adj.matrix.sum(axis=1)).ravel()
+
+
+def pagerank(adj, alpha=0.85, max_iter=100, tol=1.0e-6):
+    """
+    Mesma iteração do nx.pagerank (teleporte e nós sem saída uniformes).
+    """
+    n = len(adj)
+    if n == 0:
+        return np.zeros(0)
+
+    out = strength(adj)
+    dangling = out == 0
+    inv = np.divide(1.0, out, out=np.zeros(n), where=~dangling)
+    transition = sp.diags(inv) @ adj.matrix
+
+    x = np.full(n, 1.0 / n)
+    p = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        xlast = x
+        x = alpha * (x @ transition + x[dangling].sum() * p) + (1 - alpha) * p
+        if np.abs(x - xlast).sum() < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
+def eigenvector(adj, tol=0):
+    """
+    Autovetor do maior autovalor (ARPACK), normalizado como o
+    nx.eigenvector_centrality_numpy. A iteração de potência do
+    nx.eigenvector_centrality não converge em 100 passos no grafo completo.
+    """
+    n = len(adj)
+    if n == 0:
+        return np.zeros(0)
+
+    if n < 3:
+        values, vectors = np.linalg.eig(adj.matrix.T.toarray())
+        largest = vectors[:, np.argmax(values.real)].real
+    elif adj.directed:
+        _, vectors = sp.linalg.eigs(adj.matrix.T, k=1, which='LR', tol=tol, v0=np.ones(n))
+        largest = vectors[:, 0].real
+    else:
+        # v0 fixo: resultado reprodutível (o ARPACK sorteia o vetor inicial)
+        _, vectors = sp.linalg.eigsh(adj.matrix, k=1, which='LA', tol=tol, v0=np.ones(n))
+        largest = vectors[:, 0]
+
+    norm = np.sign(largest.sum()) * np.linalg.norm(largest)
+    return largest / norm if norm else largest
+
+
+def _brandes_batch(binary, sources):
+    """
+    Dependências de Brandes de um lote de origens (colunas), por nível:
+    a contagem de caminhos mínimos avança com binary @ fronteira e as
+    dependências voltam com binary @ ((1 + delta) / sigma) do nível seguinte.
+    """
+    n, b = binary.shape[0], len(sources)
+    cols = np.arange(b)
+
+    dist = np.full((n, b), -1, dtype=np.int32)
+    sigma = np.zeros((n, b))
+    dist[sources, cols] = 0
+    sigma[sources, cols] = 1.0
+
+    frontier = sigma.copy()
+    level = 0
+    while True:
+        reached = binary @ frontier
+        new = (reached > 0) & (dist < 0)
+        if not new.any():
+            break
+        level += 1
+        dist[new] = level
+        sigma[new] = reached[new]
+        frontier = np.where(new, reached, 0.0)
+
+    delta = np.zeros((n, b))
+    for d in range(level, 0, -1):
+        at_d = dist == d
+        coeff = np.where(at_d, (1.0 + delta) / np.where(at_d, sigma, 1.0), 0.0)
+        back = binary @ coeff
+        parents = dist == d - 1
+        delta[parents] += sigma[parents] * back[parents]
+
+    delta[sources, cols] = 0.0
+    return delta.sum(axis=1)
+
+
+def betweenness(adj, k=None, seed=42, normalized=True):
+    """
+    Betweenness (endpoints=False). k = nº de origens sorteadas (None = todas).
+    A amostra segue random.Random(seed).sample(range(n), k), a mesma
+    do nx.betweenness_centrality(G, k, seed=seed) na ordem de G.nodes.
+    """
+    n = len(adj)
+    if k is None or k >= n:
+        sources = np.arange(n)
+        sampled = None
+    else:
+        sources = np.asarray(random.Random(seed).sample(range(n), k), dtype=np.int64)
+        sampled = sources
+
+    bc = np.zeros(n)
+    batch = max(1, BATCH_CELLS // max(n, 1))
+    for start in range(0, len(sources), batch):
+        bc += _brandes_batch(adj.binary, sources[start:start + batch])
+
+    return _rescale(bc, n, normalized, adj.directed, sampled)
+
+
+def _rescale(bc, n, normalized, directed, sampled):
+    # Mesma escala de networkx.algorithms.centrality.betweenness._rescale
+    pairs = n - 1
+    if pairs < 2:
+        return bc
+    k = pairs if sampled is None else len(sampled)
+    correction = 1 if directed else 2
+
+    if sampled is None:
+        return bc * (1 / (k * (pairs - 1)) if normalized else pairs / (k * correction))
+
+    if normalized:
+        scale_source = 1 / ((k - 1) * (pairs - 1)) if k > 1 else np.nan
+        scale_other = 1 / (k * (pairs - 1))
+    else:
+        scale_source = pairs / ((k - 1) * correction) if k > 1 else np.nan
+        scale_other = pairs / (k * correction)
+
+    scale = np.full(n, scale_other)
+    scale[sampled] = scale_source
+    return bc * scale
+
+
+_MEASURE_FNS = {
+    'degree': degree,
+    'strength': strength,
+    'pagerank': pagerank,
+    'eigenvector': eigenvector,
+}
+
+
+@timed('compute_centrality')
+def compute_centrality(G, measures=None, betweenness_k=None, seed=42):
+    """
+    Tabela (node, label, type, <medidas>) com uma linha por nó.
+    betweenness_k limita as origens da betweenness (recomendado no grafo completo).
+    """
+    measures = list(measures or MEASURES)
+    adj = get_adjacency(G)
+
+    table = pd.DataFrame({
+        'node': adj.nodes,
+        'label': adj.labels,
+        'type': np.asarray(TYPE_NAMES, dtype=object)[adj.type_code],
+    })
+    for name in measures:
+        if name == 'betweenness':
+            table[name] = betweenness(adj, betweenness_k, seed)
+        elif name in _MEASURE_FNS:
+            table[name] = _MEASURE_FNS[name](adj)
+        else:
+            raise ValueError(f"Medida desconhecida: {name} (opções: {MEASURES})")
+    return table
+
+
+def top_nodes(table, measure, top_n=10, node_type=None):
+    """
+    [(label, valor), ...] dos top_n nós pela medida (seleção parcial, empates
+    pela ordem dos nós), opcionalmente só de um tipo.
+    """
+    if node_type is not None:
+        table = table[table['type'] == node_type]
+    values = table[measure].to_numpy()
+    idx = top_n_indices(values, top_n)
+    labels = table['label'].to_numpy()
+    return [(labels[i], float(values[i])) for i in idx]
+
+
+def summarize(table, top_n=10, types=('genre', 'country')):
+    """
+    {medida: {tipo: top_n}} de todas as medidas presentes na tabela.
+    """
+    measures = [m for m in MEASURES if m in table.columns]
+    return {m: {t: top_nodes(table, m, top_n, t) for t in types} for m in measures}
+
+
+# Várias regiões
+
+def _region_job(name):
+    s = WORKER_STATE
+    return name, compute_centrality(s['graphs'][name], s['measures'], s['betweenness_k'], s['seed'])
+
+
+def centrality_by_graph(graphs, measures=None, betweenness_k=None, seed=42, workers=1):
+    """
+    Tabelas de centralidade de vários grafos ({nome: grafo}).
+    workers > 1 calcula os grafos em processos separados (None = nº de CPUs).
+    """
+    workers = min(workers or os.cpu_count() or 1, len(graphs))
+    if workers <= 1:
+        return {name: compute_centrality(G, measures, betweenness_k, seed) for name, G in graphs.items()}
+
+    # Maiores primeiro: o grafo mais lento não fica para o fim
+    order = sorted(graphs, key=lambda name: -graphs[name].number_of_edges())
+    with worker_pool(workers, graphs=graphs, measures=measures,
+                     betweenness_k=betweenness_k, seed=seed) as pool:
+        results = dict(pool.imap_unordered(_region_job, order))
+
+    return {name: results[name] for name in graphs}
+
+
+def save_tables(tables, output_dir=OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name, table in tables.items():
+        paths[name] = os.path.join(output_dir, f'{name}.csv')
+        table.to_csv(paths[name], index=False)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Centralidades de todos os grafos (relatório por região).")
+    parser.add_argument('--measures', nargs='+', default=MEASURES, choices=MEASURES)
+    parser.add_argument('--betweenness-k', type=int, default=256,
+                        help="origens sorteadas da betweenness no grafo completo (0 = exata)")
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None, help="processos para os grafos regionais")
+    parser.add_argument('--skip-full', action='store_true', help="não calcula o grafo completo")
+    parser.add_argument('--out', default=OUTPUT_DIR)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from src.config import CSV_PATH, INCLUIR_PESSOAS, MAX_ELENCO, MIN_TITULOS_PESSOA, REGIOES
+    from src.graph_store import load_or_build_graphs
+    from src.tuning import apply_configured_profile
+
+    apply_configured_profile()
+    graphs = load_or_build_graphs(
+        CSV_PATH, REGIOES,
+        include_people=INCLUIR_PESSOAS,
+        max_cast=MAX_ELENCO,
+        min_person_titles=MIN_TITULOS_PESSOA
+    )
+
+    start = time.perf_counter()
+    # Grafos País × Gênero são pequenos: betweenness exata
+    small = {name: G for name, G in graphs.items() if name != 'full'}
+    tables = centrality_by_graph(small, args.measures, None, args.seed, args.workers)
+    if not args.skip_full:
+        tables['full'] = compute_centrality(
+            graphs['full'], args.measures, args.betweenness_k or None, args.seed
+        )
+    print(f"Centralidades de {len(tables)} grafos em {time.perf_counter() - start:.2f}s")
+
+    for name, table in tables.items():
+        print(f"\n=== {name} ===")
+        for measure, by_type in summarize(table, args.top).items():
+            for node_type, top in by_type.items():
+                items = ', '.join(f"{label} ({value:.4g})" for label, value in top)
+                print(f"  {measure:<12} {node_type:<8} {items}")
+
+    paths = save_tables(tables, args.out)
+    print(f"\nTabelas salvas em '{args.out}' ({len(paths)} arquivos)")
+    return tables
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import sys
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.features import OTHER_CODE, TYPE_CODES
+from src.graph_builder import PERSON_COLUMNS, PRUNED_PEOPLE, _ensure_edge_tables, split_people
+from src.instrumentation import timed
+
+# Grafo compacto: alternativa de pouca memória ao nx.Graph do build_full_graph.
+# Nós são ids inteiros densos, agrupados por tipo (títulos, países, gêneros,
+# pessoas); labels são internados por tipo, então um título com o mesmo nome
+# de um gênero ou país continua sendo outro nó. Adjacência em CSR.
+
+# Nome de cada código de tipo (tipos desconhecidos viram 'other')
+TYPE_NAMES = sorted(TYPE_CODES, key=TYPE_CODES.get) + ['other']
+
+RELATIONS = ['produced_in', 'is_genre'] + [relation for _, relation, _ in PERSON_COLUMNS]
+
+
+class CompactGraph:
+    """
+    - labels:          label de cada nó (array de objetos)
+    - node_type:       código do tipo (int8, mesmos códigos do feature store)
+    - type_offsets:    nós do tipo t ocupam os ids [type_offsets[t], type_offsets[t + 1])
+    - indptr/indices:  adjacência em CSR (int64 / int32)
+    - relation:        código da relação de cada posição de indices (int8, -1 = sem relação)
+    - relation_names:  nome de cada código de relação
+    - pruned_people:   pessoas removidas por prune_people em cada nó (int32)
+
+    Adaptadores no estilo networkx (nodes, neighbors, degree, adj, edges, graph,
+    subgraph, to_networkx) permitem usar o grafo em recommend_titles,
+    analyze_centrality e na exportação.
+    """
+
+    is_compact = True
+
+    def __init__(self, labels, node_type, indptr, indices, relation=None, relation_names=(),
+                 pruned_people=None):
+        self.labels = np.asarray(labels, dtype=object)
+        self.node_type = np.asarray(node_type, dtype=np.int8)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        if relation is None:
+            relation = np.full(len(self.indices), -1, dtype=np.int8)
+        self.relation = np.asarray(relation, dtype=np.int8)
+        self.relation_names = list(relation_names)
+        if pruned_people is None:
+            pruned_people = np.zeros(len(self.labels), dtype=np.int32)
+        self.pruned_people = np.asarray(pruned_people, dtype=np.int32)
+        self.graph = {}
+
+        if np.any(np.diff(self.node_type) < 0):
+            raise ValueError("Os nós do grafo compacto devem estar agrupados por tipo.")
+
+        counts = np.bincount(self.node_type, minlength=len(TYPE_NAMES))
+        self.type_offsets = np.zeros(len(TYPE_NAMES) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.type_offsets[1:])
+
+        self._by_label = {}
+
+    @classmethod
+    def from_edges(cls, labels_by_type, src, dst, relation, relation_names, pruned_people=None):
+        """
+        Monta o grafo a partir de labels por tipo ({tipo: labels}, id local = posição)
+        e de arestas não direcionadas (src, dst) em ids globais, uma por par.
+        """
+        labels, types = [], []
+        for name in TYPE_NAMES:
+            values = labels_by_type.get(name, ())
+            labels.append(np.asarray(values, dtype=object))
+            types.append(np.full(len(values), TYPE_NAMES.index(name), dtype=np.int8))
+        labels = np.concatenate(labels)
+        n_nodes = len(labels)
+
+        # As duas direções; ordenação estável => vizinhos na ordem de inserção
+        both_src = np.concatenate([src, dst]).astype(np.int64)
+        both_dst = np.concatenate([dst, src]).astype(np.int32)
+        both_rel = np.concatenate([relation, relation]).astype(np.int8)
+        order = np.argsort(both_src, kind='stable')
+
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(both_src, minlength=n_nodes), out=indptr[1:])
+
+        return cls(labels, np.concatenate(types), indptr, both_dst[order],
+                   both_rel[order], relation_names, pruned_people)
+
+    @classmethod
+    def from_networkx(cls, G):
+        """
+        Converte um nx.Graph (ex.: build_full_graph). A ordem dos nós dentro
+        de cada tipo e a ordem dos vizinhos são preservadas.
+        """
+        nodes = list(G.nodes)
+        codes = np.fromiter(
+            (TYPE_CODES.get(d.get('type'), OTHER_CODE) for _, d in G.nodes(data=True)),
+            dtype=np.int8, count=len(nodes)
+        )
+        order = np.argsort(codes, kind='stable')
+        new_id = np.empty(len(nodes), dtype=np.int64)
+        new_id[order] = np.arange(len(nodes))
+        node_id = {n: int(new_id[i]) for i, n in enumerate(nodes)}
+
+        relation_code = {name: i for i, name in enumerate(RELATIONS)}
+        adj = G.adj
+        ordered = [nodes[i] for i in order.tolist()]
+
+        degree = np.fromiter((len(adj[n]) for n in ordered), dtype=np.int64, count=len(nodes))
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(degree, out=indptr[1:])
+
+        indices = np.fromiter(
+            (node_id[m] for n in ordered for m in adj[n]),
+            dtype=np.int32, count=int(indptr[-1])
+        )
+        relation = np.fromiter(
+            (relation_code.setdefault(d.get('relation'), len(relation_code)) if 'relation' in d else -1
+             for n in ordered for d in adj[n].values()),
+            dtype=np.int8, count=int(indptr[-1])
+        )
+
+        labels = [G.nodes[n].get('label', str(n)) for n in ordered]
+        pruned = [G.nodes[n].get(PRUNED_PEOPLE, 0) for n in ordered]
+        compact = cls(labels, codes[order], indptr, indices, relation, list(relation_code), pruned)
+        compact.graph.update(G.graph)
+        return compact
+
+    # Consultas por tipo
+
+    def type_range(self, type_name):
+        code = TYPE_CODES.get(type_name, OTHER_CODE)
+        return int(self.type_offsets[code]), int(self.type_offsets[code + 1])
+
+    def node(self, type_name, label):
+        """
+        Id do nó de um tipo pelo label (dicionário por tipo criado sob demanda).
+        """
+        if type_name not in self._by_label:
+            start, end = self.type_range(type_name)
+            self._by_label[type_name] = {
+                l: start + i for i, l in reversed(list(enumerate(self.labels[start:end].tolist())))
+            }
+        return self._by_label[type_name].get(label)
+
+    def titles(self):
+        """
+        Pares (nó, label) de todos os títulos.
+        """
+        start, end = self.type_range('title')
+        return zip(range(start, end), self.labels[start:end].tolist())
+
+    def memory_usage(self):
+        """
+        Bytes ocupados pelos arrays e pelos labels.
+        """
+        arrays = (self.labels, self.node_type, self.indptr, self.indices, self.relation,
+                  self.pruned_people)
+        return sum(a.nbytes for a in arrays) + sum(sys.getsizeof(l) for l in self.labels.tolist())
+
+    # Adaptadores no estilo networkx
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        return iter(range(len(self.labels)))
+
+    def __contains__(self, n):
+        return isinstance(n, (int, np.integer)) and 0 <= n < len(self.labels)
+
+    def __getitem__(self, n):
+        return self.adj[n]
+
+    @property
+    def nodes(self):
+        return _NodeView(self)
+
+    @property
+    def adj(self):
+        return _AdjacencyView(self)
+
+    @property
+    def degree(self):
+        return _DegreeView(self)
+
+    def number_of_nodes(self):
+        return len(self.labels)
+
+    def number_of_edges(self):
+        return len(self.indices) // 2
+
+    def is_directed(self):
+        return False
+
+    def neighbors(self, n):
+        return iter(self.indices[self.indptr[n]:self.indptr[n + 1]].tolist())
+
+    def edges(self, data=False):
+        src = np.repeat(np.arange(len(self.labels)), np.diff(self.indptr))
+        mask = src < self.indices
+        pairs = zip(src[mask].tolist(), self.indices[mask].tolist())
+        if not data:
+            return pairs
+        relations = (self._relation_attrs(r) for r in self.relation[mask].tolist())
+        return ((u, v, d) for (u, v), d in zip(pairs, relations))
+
+    def subgraph(self, nodes):
+        return self.to_networkx(nodes)
+
+    def to_networkx(self, nodes=None):
+        """
+        nx.Graph equivalente (ou só o subgrafo induzido por 'nodes'),
+        com chaves inteiras e 'type' / 'label' como atributos.
+        """
+        if nodes is None:
+            keep = np.arange(len(self.labels))
+        else:
+            keep = np.unique(np.fromiter((int(n) for n in nodes), dtype=np.int64))
+
+        H = nx.Graph()
+        H.add_nodes_from((i, self._node_attrs(i)) for i in keep.tolist())
+
+        degree = np.diff(self.indptr)[keep]
+        src = np.repeat(keep, degree)
+        starts = np.repeat(self.indptr[keep] - np.cumsum(degree) + degree, degree)
+        slots = starts + np.arange(int(degree.sum()))
+        dst = self.indices[slots]
+
+        mask = src < dst
+        if nodes is not None:
+            mask &= np.isin(dst, keep)
+
+        H.add_edges_from(
+            (u, v, self._relation_attrs(r)) for u, v, r in zip(
+                src[mask].tolist(), dst[mask].tolist(), self.relation[slots[mask]].tolist()
+            )
+        )
+        H.graph.update(self.graph)
+        return H
+
+    def _node_attrs(self, n):
+        attrs = {'type': TYPE_NAMES[self.node_type[n]], 'label': self.labels[n]}
+        if self.pruned_people[n]:
+            attrs[PRUNED_PEOPLE] = int(self.pruned_people[n])
+        return attrs
+
+    def _relation_attrs(self, code):
+        return {'relation': self.relation_names[code]} if code >= 0 else {}
+
+
+class _NodeView:
+    def __init__(self, G):
+        self._G = G
+
+    def __iter__(self):
+        return iter(self._G)
+
+    def __len__(self):
+        return len(self._G)
+
+    def __contains__(self, n):
+        return n in self._G
+
+    def __getitem__(self, n):
+        return self._G._node_attrs(n)
+
+    def __call__(self, data=False):
+        if data is False:
+            return self
+        if data is True:
+            return ((n, self._G._node_attrs(n)) for n in self._G)
+        return ((n, self._G._node_attrs(n).get(data)) for n in self._G)
+
+
+class _AdjacencyView:
+    def __init__(self, G):
+        self._G = G
+
+    def __iter__(self):
+        return iter(self._G)
+
+    def __len__(self):
+        return len(self._G)
+
+    def __getitem__(self, n):
+        G = self._G
+        start, end = G.indptr[n], G.indptr[n + 1]
+        return {
+            m: G._relation_attrs(r)
+            for m, r in zip(G.indices[start:end].tolist(), G.relation[start:end].tolist())
+        }
+
+
+class _DegreeView:
+    def __init__(self, G):
+        self._G = G
+
+    def _degrees(self):
+        return np.diff(self._G.indptr)
+
+    def __call__(self, nbunch=None):
+        if nbunch is None:
+            return self
+        if nbunch in self._G:
+            return self[nbunch]
+        degrees = self._degrees()
+        return ((n, int(degrees[n])) for n in nbunch)
+
+    def __getitem__(self, n):
+        return int(self._G.indptr[n + 1] - self._G.indptr[n])
+
+    def __iter__(self):
+        return iter(zip(range(len(self._G)), self._degrees().tolist()))
+
+    def __len__(self):
+        return len(self._G)
+
+
+@timed('build_compact_graph')
+def build_compact_graph(df, edges=None, include_people=False, max_cast=None, min_person_titles=2):
+    """
+    Mesmo conteúdo de build_full_graph, direto das tabelas de arestas para o
+    grafo compacto (sem passar por um nx.Graph).
+    """
+    edges = _ensure_edge_tables(df, edges, include_people, max_cast)
+
+    titles = pd.unique(edges['titles'])
+    titles = np.asarray(titles, dtype=object)
+    title_pos = pd.Index(titles)
+
+    layers = [
+        ('country', edges['title_country'], 'country', np.int8(RELATIONS.index('produced_in'))),
+        ('genre', edges['title_genre'], 'genre', np.int8(RELATIONS.index('is_genre'))),
+    ]
+    pruned = np.zeros(len(titles), dtype=np.int32)
+    if include_people:
+        title_person, counts = split_people(edges['title_person'], min_person_titles)
+        pruned[title_pos.get_indexer(counts.index)] = counts.to_numpy()
+        relation = title_person['relation'].astype(str).map(RELATIONS.index).to_numpy(dtype=np.int8)
+        layers.append(('person', title_person, 'person', relation))
+
+    labels_by_type = {'title': titles}
+    src, dst, rel = [], [], []
+    offset = len(titles)
+    for type_name, table, column, relation in layers:
+        codes, uniques = pd.factorize(table[column])
+        uniques = np.asarray(uniques, dtype=object)
+        if type_name == 'person':
+            uniques = edges['people'][uniques.astype(np.int64)]
+
+        labels_by_type[type_name] = uniques
+        src.append(title_pos.get_indexer(table['title']).astype(np.int64))
+        dst.append(codes.astype(np.int64) + offset)
+        rel.append(np.broadcast_to(relation, len(table)).astype(np.int8))
+        offset += len(uniques)
+
+    src, dst, rel = np.concatenate(src), np.concatenate(dst), np.concatenate(rel)
+
+    # Arestas repetidas (títulos duplicados) entram uma vez, na primeira ocorrência
+    _, first = np.unique(src * offset + dst, return_index=True)
+    first.sort()
+
+    # Títulos ocupam os primeiros ids
+    pruned = np.concatenate([pruned, np.zeros(offset - len(titles), dtype=np.int32)])
+    G = CompactGraph.from_edges(labels_by_type, src[first], dst[first], rel[first], RELATIONS, pruned)
+    print(f"Grafo compacto: {G.number_of_nodes()} nós, {G.number_of_edges()} arestas.")
+    return G
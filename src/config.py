@@ -0,0 +1,30 @@
+import os
+
+# Configuração compartilhada pelo menu interativo (main.py) e pelos CLIs
+# (service, similarity_index, offline_eval, tuning, centrality): mesmo CSV,
+# mesmas regiões e mesma camada de pessoas => mesmo cache de grafos.
+
+CSV_PATH = os.path.join('data', 'raw', 'netflix_titles.csv')
+
+ESTADOS_UNIDOS = {"United States"}
+EUROPA = {
+    "United Kingdom", "France", "Germany", "Spain", "Italy",
+    "Netherlands", "Sweden", "Norway", "Denmark", "Belgium"
+}
+AMERICA_LATINA = {
+    "Brazil", "Mexico", "Argentina", "Colombia", "Chile", "Peru"
+}
+
+REGIOES = {
+    "eua": ESTADOS_UNIDOS,
+    "europa": EUROPA,
+    "latam": AMERICA_LATINA
+}
+
+# Camada de pessoas (diretores + elenco) no grafo completo
+INCLUIR_PESSOAS = True
+MAX_ELENCO = 10          # primeiros nomes do elenco por título
+MIN_TITULOS_PESSOA = 2   # pessoas com um só título não ligam filmes
+
+# Pesos do recomendador ajustados por src/tuning.py (None = pesos padrão)
+PERFIL_PESOS = None      # ex.: os.path.join('data', 'weights_profile.json')
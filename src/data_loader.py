@@ -1,6 +1,21 @@
 import pandas as pd
 import os
+from itertools import repeat
 
+from src.instrumentation import timed
+
+# Colunas usadas pelos construtores de grafos
+GRAPH_COLUMNS = ['title', 'country', 'listed_in']
+PEOPLE_COLUMNS = ['director', 'cast']
+CHUNK_SIZE = 100_000
+
+try:
+    import pyarrow  # noqa: F401
+    TITLE_DTYPE = 'string[pyarrow]'
+except ImportError:
+    TITLE_DTYPE = 'string'
+
+@timed('load_data')
 def load_data(filepath):
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
@@ -14,3 +29,69 @@ def load_data(filepath):
 
     print(f"Total de registros: {len(df)}")
     return df
+
+def iter_chunks(filepath, chunksize=CHUNK_SIZE, columns=GRAPH_COLUMNS):
+    """
+    Lê o CSV em blocos, apenas com as colunas necessárias.
+    'country'/'listed_in' vêm como category (combinações se repetem muito).
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
+
+    dtype = {
+        'title': TITLE_DTYPE, 'country': 'category', 'listed_in': 'category',
+        'director': TITLE_DTYPE, 'cast': TITLE_DTYPE,
+    }
+    dtype = {c: t for c, t in dtype.items() if c in columns}
+
+    for chunk in pd.read_csv(filepath, usecols=columns, dtype=dtype, chunksize=chunksize):
+        chunk['title'] = chunk['title'].fillna('Unknown Title')
+        yield chunk
+
+def _split_categories(column):
+    """
+    Quebra 'a, b' em tupla uma vez por categoria distinta.
+    Retorna (tuplas por código, códigos por linha); código -1 = vazio.
+    """
+    split = [
+        tuple(v.strip() for v in str(value).split(',') if v.strip())
+        for value in column.cat.categories
+    ]
+    return split, column.cat.codes.to_numpy()
+
+def _split_values(column):
+    return [
+        tuple(v.strip() for v in value.split(',') if v.strip()) if isinstance(value, str) else ()
+        for value in column.tolist()
+    ]
+
+def iter_records(filepath, chunksize=CHUNK_SIZE, include_people=False):
+    """
+    Gera registros normalizados (title, countries, genres) lendo o CSV em blocos.
+    Com include_people=True: (title, countries, genres, directors, cast).
+    O pico de memória depende do tamanho do bloco, não do arquivo.
+    """
+    total = 0
+    print(f"Carregando dados (streaming) de: {filepath}")
+
+    columns = GRAPH_COLUMNS + PEOPLE_COLUMNS if include_people else GRAPH_COLUMNS
+    for chunk in iter_chunks(filepath, chunksize, columns):
+        countries, country_codes = _split_categories(chunk['country'])
+        genres, genre_codes = _split_categories(chunk['listed_in'])
+
+        if include_people:
+            people = zip(_split_values(chunk['director']), _split_values(chunk['cast']))
+        else:
+            people = repeat(())
+
+        for title, c, g, extra in zip(chunk['title'], country_codes.tolist(),
+                                      genre_codes.tolist(), people):
+            yield (
+                title.strip(),
+                countries[c] if c >= 0 else (),
+                genres[g] if g >= 0 else ()
+            ) + extra
+
+        total += len(chunk)
+
+    print(f"Total de registros: {total}")
@@ -0,0 +1,388 @@
+import gzip
+import os
+import re
+import time
+from datetime import date
+from xml.sax.saxutils import quoteattr
+
+import networkx as nx
+import numpy as np
+
+from src.instrumentation import timed
+from src.string_arrays import encode_strings
+from src.workers import WORKER_STATE, worker_pool, worker_state
+
+# Exportação dos grafos para ferramentas externas.
+# - .gexf       (Gephi): escrito em streaming, nó a nó / aresta a aresta,
+#               sem montar a árvore XML em memória
+# - .parquet    lista de arestas (requer pyarrow), escrita em lotes
+# - .graphml.gz GraphML comprimido (networkx)
+# - .npz        adjacência CSR + tipos + labels (carrega direto no NumPy/SciPy)
+# export_graphs exporta vários grafos em paralelo (um processo por grafo).
+
+FORMATS = ('gexf', 'parquet', 'graphml.gz', 'npz')
+BLOCK_SIZE = 50_000          # nós por bloco ao percorrer o CSR / linhas por lote
+WRITE_BUFFER = 1 << 20
+
+# Caracteres proibidos em XML 1.0
+_INVALID_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def export_format(path):
+    for fmt in FORMATS:
+        if path.endswith('.' + fmt):
+            return fmt
+    if path.endswith('.graphml'):
+        return 'graphml.gz'
+    raise ValueError(f"Formato de exportação desconhecido: {path} (use {', '.join(FORMATS)})")
+
+
+# Iteração em blocos (grafo compacto não é convertido para networkx)
+
+def _iter_nodes(G):
+    if getattr(G, 'is_compact', False):
+        from src.compact_graph import TYPE_NAMES
+        for start in range(0, G.number_of_nodes(), BLOCK_SIZE):
+            stop = min(start + BLOCK_SIZE, G.number_of_nodes())
+            types = G.node_type[start:stop].tolist()
+            for i, (label, t) in enumerate(zip(G.labels[start:stop].tolist(), types), start):
+                yield i, {'type': TYPE_NAMES[t], 'label': label}
+    else:
+        yield from G.nodes(data=True)
+
+
+def _iter_edges(G):
+    if getattr(G, 'is_compact', False):
+        names = G.relation_names
+        n = G.number_of_nodes()
+        for start in range(0, n, BLOCK_SIZE):
+            stop = min(start + BLOCK_SIZE, n)
+            lo, hi = G.indptr[start], G.indptr[stop]
+            src = np.repeat(np.arange(start, stop), np.diff(G.indptr[start:stop + 1]))
+            dst = G.indices[lo:hi]
+            rel = G.relation[lo:hi]
+            mask = src < dst
+            for u, v, r in zip(src[mask].tolist(), dst[mask].tolist(), rel[mask].tolist()):
+                yield u, v, ({'relation': names[r]} if r >= 0 else {})
+    else:
+        yield from G.edges(data=True)
+
+
+def _node_id_fn(G):
+    """
+    Função nó -> id exportado. Chaves não-textuais (pessoas no grafo completo,
+    todos os nós do compacto) recebem o tipo como prefixo ('person:5'), para
+    não colidir com títulos cujo nome é um número ('5').
+    """
+    if getattr(G, 'is_compact', False):
+        from src.compact_graph import TYPE_NAMES
+        node_type = G.node_type
+        return lambda n: f'{TYPE_NAMES[node_type[n]]}:{n}'
+    nodes = G.nodes
+    return lambda n: n if isinstance(n, str) else f"{nodes[n].get('type', 'node')}:{n}"
+
+
+# GEXF em streaming
+
+def _xml_value(value):
+    return quoteattr(_INVALID_XML.sub('', str(value)))
+
+
+def _gexf_type(value):
+    if isinstance(value, (bool, np.bool_)):
+        return 'boolean'
+    if isinstance(value, (int, np.integer)):
+        return 'long'
+    if isinstance(value, (float, np.floating)):
+        return 'double'
+    return 'string'
+
+
+def _scan_attributes(items, skip):
+    """
+    Atributos presentes e seus tipos GEXF (uma passada, sem guardar os itens).
+    """
+    found = {}
+    for *_, data in items:
+        for key, value in data.items():
+            if key not in skip and key not in found:
+                found[key] = _gexf_type(value)
+    return found
+
+
+def _attvalues(data, ids):
+    values = ''.join(
+        f'<attvalue for="{ids[k]}" value={_xml_value(v)} />'
+        for k, v in data.items() if k in ids
+    )
+    return f'<attvalues>{values}</attvalues>' if values else ''
+
+
+@timed('write_gexf')
+def write_gexf(G, path):
+    """
+    GEXF 1.2 compatível com o Gephi (mesmos ids/atributos de nx.write_gexf),
+    escrito em streaming: memória constante além do próprio grafo.
+    """
+    node_attrs = _scan_attributes(_iter_nodes(G), skip={'label'})
+    edge_attrs = _scan_attributes(_iter_edges(G), skip={'weight'})
+
+    node_ids = {k: str(i) for i, k in enumerate(node_attrs)}
+    edge_ids = {k: str(i) for i, k in enumerate(edge_attrs, len(node_attrs))}
+    edge_type = 'directed' if G.is_directed() else 'undirected'
+    node_id = _node_id_fn(G)
+
+    with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+        f.write(
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<gexf xmlns="http://www.gexf.net/1.2draft" version="1.2">\n'
+            f'  <meta lastmodifieddate="{date.today().isoformat()}">\n'
+            f'    <creator>NetworkX {nx.__version__}</creator>\n'
+            '  </meta>\n'
+            f'  <graph defaultedgetype="{edge_type}" mode="static" name="">\n'
+        )
+        for cls, attrs, ids in (('node', node_attrs, node_ids), ('edge', edge_attrs, edge_ids)):
+            if attrs:
+                f.write(f'    <attributes mode="static" class="{cls}">\n')
+                for key, kind in attrs.items():
+                    f.write(f'      <attribute id="{ids[key]}" title={_xml_value(key)} type="{kind}" />\n')
+                f.write('    </attributes>\n')
+
+        f.write('    <nodes>\n')
+        lines = []
+        for n, data in _iter_nodes(G):
+            label = data.get('label', n)
+            lines.append(
+                f'      <node id={_xml_value(node_id(n))} label={_xml_value(label)}>'
+                f'{_attvalues(data, node_ids)}</node>\n'
+            )
+            if len(lines) >= BLOCK_SIZE:
+                f.write(''.join(lines))
+                lines.clear()
+        f.write(''.join(lines))
+        f.write('    </nodes>\n    <edges>\n')
+
+        lines = []
+        for i, (u, v, data) in enumerate(_iter_edges(G)):
+            weight = data.get('weight')
+            weight = f' weight="{weight}"' if weight is not None else ''
+            lines.append(
+                f'      <edge source={_xml_value(node_id(u))} target={_xml_value(node_id(v))} id="{i}"{weight}>'
+                f'{_attvalues(data, edge_ids)}</edge>\n'
+            )
+            if len(lines) >= BLOCK_SIZE:
+                f.write(''.join(lines))
+                lines.clear()
+        f.write(''.join(lines))
+        f.write('    </edges>\n  </graph>\n</gexf>\n')
+
+    return path
+
+
+# Formatos binários
+
+def _node_arrays(G):
+    """
+    (labels, tipos, índice posicional por nó) na ordem de iteração do grafo.
+    """
+    labels, types, index = [], [], {}
+    for i, (n, data) in enumerate(_iter_nodes(G)):
+        index[n] = i
+        labels.append(str(data.get('label', n)))
+        types.append(data.get('type', ''))
+    return labels, types, index
+
+
+@timed('write_npz')
+def write_npz(G, path):
+    """
+    CSR simétrico (indptr, indices, weight/relation por aresta), tipo e label
+    de cada nó. Labels/tipos ficam como blob UTF-8 + offsets (sem pickle).
+    """
+    if getattr(G, 'is_compact', False):
+        from src.compact_graph import TYPE_NAMES
+        labels = G.labels.tolist()
+        type_names = TYPE_NAMES
+        node_type = G.node_type
+        indptr, indices = G.indptr, G.indices
+        relation = G.relation
+        relation_names = list(G.relation_names)
+        weight = None
+    else:
+        labels, types, index = _node_arrays(G)
+        type_names = sorted(set(types))
+        code = {t: i for i, t in enumerate(type_names)}
+        node_type = np.array([code[t] for t in types], dtype=np.int8)
+
+        relation_names = sorted({d['relation'] for _, _, d in G.edges(data=True) if 'relation' in d})
+        rel_code = {r: i for i, r in enumerate(relation_names)}
+
+        m = G.number_of_edges()
+        src = np.empty(m, dtype=np.int64)
+        dst = np.empty(m, dtype=np.int64)
+        rel = np.full(m, -1, dtype=np.int8)
+        w = np.full(m, np.nan)
+        for k, (u, v, d) in enumerate(G.edges(data=True)):
+            src[k], dst[k] = index[u], index[v]
+            if 'relation' in d:
+                rel[k] = rel_code[d['relation']]
+            if 'weight' in d:
+                w[k] = d['weight']
+
+        # Cada aresta nos dois sentidos, ordenada por origem
+        both_src = np.concatenate([src, dst])
+        order = np.argsort(both_src, kind='stable')
+        indices = np.concatenate([dst, src])[order]
+        relation = np.concatenate([rel, rel])[order]
+        weight = np.concatenate([w, w])[order] if not np.isnan(w).all() else None
+        indptr = np.zeros(len(labels) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(both_src, minlength=len(labels)))
+
+    labels_blob, labels_offsets = encode_strings(labels)
+    types_blob, types_offsets = encode_strings(type_names)
+    rel_blob, rel_offsets = encode_strings(relation_names)
+
+    arrays = {
+        'indptr': indptr, 'indices': indices.astype(np.int32 if len(labels) < 2**31 else np.int64),
+        'relation': relation, 'node_type': node_type,
+        'labels_blob': labels_blob, 'labels_offsets': labels_offsets,
+        'types_blob': types_blob, 'types_offsets': types_offsets,
+        'relations_blob': rel_blob, 'relations_offsets': rel_offsets,
+    }
+    if weight is not None:
+        arrays['weight'] = weight
+
+    # savez acrescenta .npz se faltar
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    return path
+
+
+@timed('write_parquet')
+def write_parquet(G, path, batch_size=BLOCK_SIZE * 20):
+    """
+    Lista de arestas (source, target, source_type, target_type, relation, weight)
+    escrita em lotes com pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Exportação em Parquet requer o pacote 'pyarrow'.") from None
+
+    info = {n: (str(d.get('label', n)), d.get('type', '')) for n, d in _iter_nodes(G)}
+    schema = pa.schema([
+        ('source', pa.string()), ('target', pa.string()),
+        ('source_type', pa.string()), ('target_type', pa.string()),
+        ('relation', pa.string()), ('weight', pa.float64()),
+    ])
+
+    def flush(writer, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in schema]
+        writer.write_table(pa.Table.from_arrays([pa.array(c, t.type) for c, t in zip(columns, schema)],
+                                                schema=schema))
+
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        rows, written = [], 0
+        for u, v, d in _iter_edges(G):
+            (su, tu), (sv, tv) = info[u], info[v]
+            rows.append((su, sv, tu, tv, d.get('relation'), d.get('weight')))
+            if len(rows) >= batch_size:
+                flush(writer, rows)
+                written += len(rows)
+                rows = []
+        if rows or not written:
+            flush(writer, rows)
+    return path
+
+
+@timed('write_graphml')
+def write_graphml(G, path):
+    node_id = _node_id_fn(G)
+    if getattr(G, 'is_compact', False):
+        G = G.to_networkx()
+    G = nx.relabel_nodes(G, {n: node_id(n) for n in G if not isinstance(n, str)})
+    if path.endswith('.gz'):
+        with gzip.open(path, 'wb') as f:
+            nx.write_graphml(G, f)
+    else:
+        nx.write_graphml(G, path)
+    return path
+
+
+WRITERS = {
+    'gexf': write_gexf,
+    'parquet': write_parquet,
+    'graphml.gz': write_graphml,
+    'npz': write_npz,
+}
+
+
+def export_graph(G, path):
+    """
+    Exporta um grafo no formato da extensão de 'path' (arquivo temporário +
+    rename: uma falha não deixa arquivo pela metade). Retorna tempo e tamanho.
+    """
+    fmt = export_format(path)
+    folder, name = os.path.split(path)
+    os.makedirs(folder or '.', exist_ok=True)
+
+    start = time.perf_counter()
+    tmp = os.path.join(folder, f".tmp-{os.getpid()}-{name}")
+    try:
+        WRITERS[fmt](G, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return {
+        'path': path,
+        'seconds': time.perf_counter() - start,
+        'mb': os.path.getsize(path) / 2**20,
+    }
+
+
+def _export_job(i):
+    G, path = WORKER_STATE['jobs'][i]
+    try:
+        return export_graph(G, path)
+    except Exception as e:
+        # Erro de um grafo não derruba os demais; o tipo vai junto da mensagem
+        return {'path': path, 'error': f"{type(e).__name__}: {e}"}
+
+
+def _size(G):
+    return G.number_of_nodes() + G.number_of_edges()
+
+
+def export_graphs(jobs, workers=None):
+    """
+    Exporta [(grafo, caminho), ...] em paralelo. Os maiores grafos entram
+    primeiro no pool; os resultados são impressos à medida que terminam.
+    """
+    jobs = list(jobs)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    order = sorted(range(len(jobs)), key=lambda i: -_size(jobs[i][0]))
+
+    results = []
+
+    def report(result):
+        name = os.path.basename(result['path'])
+        if 'error' in result:
+            print(f"❌ Erro ao exportar {name}: {result['error']}")
+        else:
+            print(f"✅ Exportado: {name} ({result['seconds']:.2f}s, {result['mb']:.1f} MB)")
+        results.append(result)
+
+    if workers <= 1:
+        with worker_state(jobs=jobs):
+            for i in order:
+                report(_export_job(i))
+        return results
+
+    with worker_pool(workers, jobs=jobs) as pool:
+        for result in pool.imap_unordered(_export_job, order):
+            report(result)
+
+    return results
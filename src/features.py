@@ -0,0 +1,154 @@
+import numpy as np
+
+from src.graph_builder import PRUNED_PEOPLE
+from src.graph_state import get_derived
+from src.instrumentation import timed
+
+# Feature store do recomendador: ids inteiros por nó e arrays NumPy com
+# tipo, grau, peso do tipo e 1/log(grau), além da adjacência em CSR.
+# Construído uma vez por versão do grafo (ver graph_state).
+
+TYPE_CODES = {'title': 0, 'country': 1, 'genre': 2, 'person': 3}
+OTHER_CODE = 4
+N_TYPES = 5
+
+
+def type_weights():
+    """
+    Pesos do Jaccard por código de tipo (lidos das constantes do recommender).
+    """
+    from src import recommender
+
+    w = np.full(N_TYPES, 0.1)
+    w[TYPE_CODES['person']] = recommender.WEIGHT_PERSON
+    w[TYPE_CODES['genre']] = recommender.WEIGHT_GENRE
+    w[TYPE_CODES['country']] = recommender.WEIGHT_COUNTRY
+    return w
+
+
+def adamic_factors():
+    """
+    Fatores do Adamic-Adar por código de tipo (constantes do recommender).
+    """
+    from src import recommender
+
+    f = np.ones(N_TYPES)
+    f[TYPE_CODES['person']] = recommender.ADAMIC_PERSON
+    f[TYPE_CODES['country']] = recommender.ADAMIC_COUNTRY
+    return f
+
+
+class NodeFeatures:
+    """
+    - node_id / nodes:  mapeamento nó <-> id inteiro
+    - type_code:        código do tipo (int8)
+    - degree:           grau
+    - inv_log_degree:   1/log(grau) (0 se grau <= 1)
+    - type_weight:      peso do tipo no Jaccard
+    - adamic_weight:    fator do tipo × 1/log(grau)
+    - pruned:           pessoas removidas por prune_people (títulos; 0 nos demais)
+    - set_size:         grau + pruned (tamanho da vizinhança sem poda)
+    - neighbor_weight:  soma de type_weight dos vizinhos, inclusive das pessoas
+                        removidas (peso do conjunto no Jaccard)
+    - indptr / indices: adjacência em CSR
+    """
+
+    def __init__(self, G):
+        if getattr(G, 'is_compact', False):
+            self._from_compact(G)
+        else:
+            self._from_networkx(G)
+        n_nodes = len(self.nodes)
+        self.set_size = self.degree + self.pruned
+
+        self.inv_log_degree = np.zeros(n_nodes)
+        mask = self.degree > 1
+        self.inv_log_degree[mask] = 1.0 / np.log(self.degree[mask])
+
+        self._weights_key = None
+        self.refresh_weights()
+
+    def _from_networkx(self, G):
+        self.nodes = list(G.nodes)
+        self.node_id = {n: i for i, n in enumerate(self.nodes)}
+        n_nodes = len(self.nodes)
+
+        self.type_code = np.fromiter(
+            (TYPE_CODES.get(d.get('type'), OTHER_CODE) for _, d in G.nodes(data=True)),
+            dtype=np.int8, count=n_nodes
+        )
+
+        self.pruned = np.fromiter(
+            (d.get(PRUNED_PEOPLE, 0) for _, d in G.nodes(data=True)), dtype=np.int64, count=n_nodes
+        )
+
+        node_id = self.node_id
+        adj = G.adj
+        self.degree = np.fromiter((len(adj[n]) for n in self.nodes), dtype=np.int64, count=n_nodes)
+        self.indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(self.degree, out=self.indptr[1:])
+        self.indices = np.fromiter(
+            (node_id[m] for n in self.nodes for m in adj[n]),
+            dtype=np.int32, count=int(self.indptr[-1])
+        )
+
+    def _from_compact(self, G):
+        # Grafo compacto: nós já são ids inteiros e a adjacência já está em CSR
+        self.nodes = range(G.number_of_nodes())
+        self.node_id = self.nodes
+        self.type_code = G.node_type
+        self.indptr = G.indptr
+        self.indices = G.indices
+        self.degree = np.diff(G.indptr)
+        self.pruned = G.pruned_people.astype(np.int64)
+
+    def refresh_weights(self):
+        """
+        Recalcula os arrays que dependem das constantes de peso, se mudaram.
+        """
+        w_type = type_weights()
+        factors = adamic_factors()
+        key = (tuple(w_type), tuple(factors))
+        if key == self._weights_key:
+            return
+
+        self.type_weight = w_type[self.type_code]
+        self.adamic_weight = factors[self.type_code] * self.inv_log_degree
+
+        owner = np.repeat(np.arange(len(self.nodes)), self.degree)
+        self.neighbor_weight = np.bincount(
+            owner, weights=self.type_weight[self.indices], minlength=len(self.nodes)
+        ) + w_type[TYPE_CODES['person']] * self.pruned
+        self._weights_key = key
+
+    def ids(self, nodes):
+        node_id = self.node_id
+        return np.fromiter((node_id[n] for n in nodes), dtype=np.int64)
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def gather(self, ids):
+        """
+        Vizinhos de vários nós de uma vez: (vizinhos concatenados, posição do dono em ids).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        lens = self.degree[ids]
+        owner = np.repeat(np.arange(len(ids)), lens)
+        offsets = np.arange(int(lens.sum())) - np.repeat(np.cumsum(lens) - lens, lens)
+        return self.indices[self.indptr[ids][owner] + offsets], owner
+
+
+@timed('build_features')
+def build_features(G):
+    return NodeFeatures(G)
+
+
+def get_features(G):
+    """
+    Feature store do grafo; reconstruído quando o grafo muda e com os
+    pesos atualizados se as constantes do recommender mudaram.
+    """
+    features = get_derived(G, 'node_features', build_features)
+    features.refresh_weights()
+    return features
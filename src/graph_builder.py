@@ -1,87 +1,389 @@
-import networkx as nx
-from itertools import product
-from collections import Counter
+import numpy as np
+import pandas as pd
+
+from src.graph_state import VersionedGraph
+from src.instrumentation import timed
+
+# Tabelas de arestas (ingestão única)
+
+# (coluna, relação, sujeita ao limite de elenco)
+PERSON_COLUMNS = [
+    ('director', 'directed_by', False),
+    ('cast', 'has_cast', True),
+]
+
+# Atributo dos títulos: nº de pessoas removidas por prune_people
+PRUNED_PEOPLE = 'pruned_people'
+
+def _explode_column(df, column, name):
+    """
+    Quebra uma coluna 'a, b, c' em uma linha por valor, de forma vetorizada.
+    Mantém o índice posicional da linha original em 'row'.
+    """
+    values = df[column].fillna('').astype(str).str.split(',')
+    exploded = values.explode()
+    exploded = exploded.str.strip()
+
+    table = pd.DataFrame({
+        'row': exploded.index.to_numpy(),
+        name: exploded.to_numpy()
+    })
+    table = table[table[name].notna() & (table[name] != '')]
+    return table.reset_index(drop=True)
+
+
+def _person_table(df, titles, max_cast=None):
+    """
+    Tabela (row, title, person, relation) de 'director' e 'cast'.
+    Pessoas viram ids inteiros (códigos do vocabulário 'people');
+    max_cast limita o elenco aos primeiros nomes de cada título.
+    """
+    parts = []
+    for column, relation, cap in PERSON_COLUMNS:
+        if column not in df:
+            continue
+        table = _explode_column(df, column, 'person')
+        limit = max_cast if cap else None
+        if limit is not None:
+            table = table[table.groupby('row', sort=False).cumcount().to_numpy() < limit]
+        table['relation'] = relation
+        parts.append(table)
+
+    if not parts:
+        table = pd.DataFrame({'row': [], 'person': [], 'relation': []})
+    else:
+        table = pd.concat(parts, ignore_index=True)
+
+    codes, people = pd.factorize(table['person'])
+    table['person'] = codes.astype(np.int32)
+    table['relation'] = table['relation'].astype('category')
+    table.insert(1, 'title', titles.to_numpy()[table['row'].to_numpy(dtype=np.int64)])
+
+    return table, np.asarray(people, dtype=object)
+
+
+@timed('build_edge_tables')
+def build_edge_tables(df, include_people=False, max_cast=None):
+    """
+    Tokeniza 'country' e 'listed_in' uma única vez.
+    Retorna um dict com:
+      - titles:        títulos normalizados por linha
+      - title_country: tabela explodida (row, title, country)
+      - title_genre:   tabela explodida (row, title, genre)
+    Com include_people=True também:
+      - title_person:  tabela (row, title, person, relation), person = id inteiro
+      - people:        nomes das pessoas, indexados pelo id
+    Todos os grafos podem ser construídos a partir dessas tabelas.
+    """
+    df = df.reset_index(drop=True)
+    titles = df['title'].astype(str).str.strip()
+
+    title_country = _explode_column(df, 'country', 'country')
+    title_genre = _explode_column(df, 'listed_in', 'genre')
+
+    title_country.insert(1, 'title', titles.to_numpy()[title_country['row'].to_numpy()])
+    title_genre.insert(1, 'title', titles.to_numpy()[title_genre['row'].to_numpy()])
+
+    edges = {
+        'titles': titles,
+        'title_country': title_country,
+        'title_genre': title_genre,
+    }
+    if include_people:
+        edges['title_person'], edges['people'] = _person_table(df, titles, max_cast)
+
+    return edges
+
+
+@timed('build_edge_tables_from_records')
+def build_edge_tables_from_records(records, batch_size=100_000, max_cast=None):
+    """
+    Mesmas tabelas de build_edge_tables, a partir de registros
+    (title, countries, genres) — ex.: data_loader.iter_records.
+    Registros (title, countries, genres, directors, cast) também geram
+    'title_person' / 'people'.
+    Países e gêneros ficam como category (códigos inteiros + vocabulário).
+    """
+    titles = []
+    names = ('country', 'genre', 'person')
+    vocab = {name: {} for name in names}
+    parts = {name: [] for name in names}
+    rows = {name: [] for name in names}
+    codes = {name: [] for name in names}
+    relations = []
+    relation_parts = []
+    has_people = False
+
+    def flush():
+        for name in names:
+            if rows[name]:
+                parts[name].append((
+                    np.asarray(rows[name], dtype=np.int64),
+                    np.asarray(codes[name], dtype=np.int32)
+                ))
+                rows[name].clear()
+                codes[name].clear()
+        if relations:
+            relation_parts.append(np.asarray(relations, dtype=np.int8))
+            relations.clear()
+
+    for row, (title, countries, genres, *people) in enumerate(records):
+        titles.append(title)
+        for name, values in (('country', countries), ('genre', genres)):
+            lookup = vocab[name]
+            for value in values:
+                rows[name].append(row)
+                codes[name].append(lookup.setdefault(value, len(lookup)))
+
+        if people:
+            has_people = True
+            lookup = vocab['person']
+            for relation, ((_, _, cap), values) in enumerate(zip(PERSON_COLUMNS, people)):
+                if cap and max_cast is not None:
+                    values = values[:max_cast]
+                for value in values:
+                    rows['person'].append(row)
+                    codes['person'].append(lookup.setdefault(value, len(lookup)))
+                    relations.append(relation)
+
+        if (row + 1) % batch_size == 0:
+            flush()
+    flush()
+
+    titles = pd.Series(titles, dtype='string' if titles else object)
+    title_values = titles.to_numpy(dtype=object)
+
+    tables = {}
+    for name in names:
+        if parts[name]:
+            row_ids = np.concatenate([r for r, _ in parts[name]])
+            value_codes = np.concatenate([c for _, c in parts[name]])
+        else:
+            row_ids = np.zeros(0, dtype=np.int64)
+            value_codes = np.zeros(0, dtype=np.int32)
+
+        if name == 'person':
+            value = value_codes
+        else:
+            value = pd.Categorical.from_codes(value_codes, categories=list(vocab[name]))
+
+        tables[name] = pd.DataFrame({
+            'row': row_ids,
+            'title': title_values[row_ids],
+            name: value,
+        })
+
+    edges = {
+        'titles': titles,
+        'title_country': tables['country'],
+        'title_genre': tables['genre'],
+    }
+    if has_people:
+        relation_codes = (
+            np.concatenate(relation_parts) if relation_parts else np.zeros(0, dtype=np.int8)
+        )
+        tables['person']['relation'] = pd.Categorical.from_codes(
+            relation_codes,
+            categories=[relation for _, relation, _ in PERSON_COLUMNS]
+        )
+        edges['title_person'] = tables['person']
+        edges['people'] = np.array(list(vocab['person']), dtype=object)
+
+    return edges
+
+
+def _ensure_edge_tables(df, edges, include_people=False, max_cast=None):
+    if edges is None:
+        edges = build_edge_tables(df, include_people=include_people, max_cast=max_cast)
+    elif include_people and 'title_person' not in edges:
+        if df is None:
+            raise ValueError("Tabelas sem 'title_person': reconstrua com include_people=True.")
+        titles = edges['titles'].reset_index(drop=True)
+        edges = dict(edges)
+        edges['title_person'], edges['people'] = _person_table(
+            df.reset_index(drop=True), titles, max_cast
+        )
+    return edges
+
+
+def split_people(title_person, min_person_titles=2):
+    """
+    Remove pessoas com menos de min_person_titles títulos distintos:
+    uma pessoa com um único título nunca é vizinho comum de dois títulos.
+    Retorna (pares título–pessoa mantidos, nº de pessoas removidas por título).
+
+    As removidas ainda contam na união do Jaccard ponderado: o feature store
+    soma a contagem por título (atributo PRUNED_PEOPLE) ao peso e ao tamanho
+    da vizinhança, e os scores ficam iguais aos do grafo sem poda. Exato com
+    min_person_titles <= 2; acima disso uma pessoa removida pode ser comum a
+    dois títulos e a interseção perde o seu peso.
+    """
+    pairs = title_person.drop_duplicates(['title', 'person'])
+    n_titles = pairs.groupby('person', sort=False).size()
+    keep = n_titles.index[n_titles.to_numpy() >= min_person_titles]
+    kept = pairs['person'].isin(keep)
+    return pairs[kept], pairs[~kept].groupby('title', sort=False).size()
+
+
+def prune_people(title_person, min_person_titles=2):
+    """
+    Pares título–pessoa sem as pessoas de poucos títulos (ver split_people).
+    """
+    return split_people(title_person, min_person_titles)[0]
+
+
+def _add_person_layer(G, edges, min_person_titles):
+    """
+    Nós 'person' com chave inteira (id interno) e o nome em 'label':
+    não colidem com títulos homônimos e ocupam menos que strings.
+    """
+    title_person, pruned = split_people(edges['title_person'], min_person_titles)
+    people = edges['people']
+
+    for title, count in pruned.items():
+        G.nodes[title][PRUNED_PEOPLE] = int(count)
+
+    ids = pd.unique(title_person['person'])
+    G.add_nodes_from(
+        (p, {'type': 'person', 'label': people[p]}) for p in ids.tolist()
+    )
+
+    for relation, group in title_person.groupby('relation', sort=False, observed=True):
+        G.add_edges_from(
+            zip(group['title'], group['person'].tolist()),
+            relation=relation
+        )
+
+
+def country_genre_counts(edges):
+    """
+    Produto país × gênero por linha (equivalente ao itertools.product do laço antigo),
+    agregado em contagens na ordem de primeira ocorrência.
+    """
+    pairs = edges['title_country'][['row', 'country']].merge(
+        edges['title_genre'][['row', 'genre']], on='row', how='inner', sort=False
+    )
+    counts = pairs.groupby(['country', 'genre'], sort=False, observed=True).size()
+    return counts.rename('weight').reset_index()
+
+
+def _weighted_country_genre_graph(counts, max_weight):
+    G = VersionedGraph()
+    for country, genre, weight in counts.itertuples(index=False, name=None):
+        G.add_node(country, type='country', label=country)
+        G.add_node(genre, type='genre', label=genre)
+        G.add_edge(country, genre, weight=weight / max_weight)
+    return G
 
 # Grafo completo (filmes) -> recomendação
 
-def build_full_graph(df):
-    G = nx.Graph()
+@timed('build_full_graph')
+def build_full_graph(df, edges=None, include_people=False, max_cast=None, min_person_titles=2):
+    """
+    Grafo título–país–gênero. include_people=True adiciona diretores e elenco
+    (limitado a max_cast nomes por título), sem pessoas de um único título.
+    """
+    edges = _ensure_edge_tables(df, edges, include_people, max_cast)
+    G = VersionedGraph()
 
-    for _, row in df.iterrows():
-        title = row['title'].strip()
-        countries = [c.strip() for c in row['country'].split(',') if c.strip()]
-        genres = [g.strip() for g in row['listed_in'].split(',') if g.strip()]
+    titles = pd.unique(edges['titles'])
+    G.add_nodes_from((t, {'type': 'title', 'label': t}) for t in titles)
 
-        G.add_node(title, type='title', label=title)
+    title_country = edges['title_country']
+    countries = pd.unique(title_country['country'])
+    G.add_nodes_from((c, {'type': 'country', 'label': c}) for c in countries)
+    G.add_edges_from(
+        zip(title_country['title'], title_country['country']),
+        relation='produced_in'
+    )
 
-        for country in countries:
-            G.add_node(country, type='country', label=country)
-            G.add_edge(title, country, relation='produced_in')
+    title_genre = edges['title_genre']
+    genres = pd.unique(title_genre['genre'])
+    G.add_nodes_from((g, {'type': 'genre', 'label': g}) for g in genres)
+    G.add_edges_from(
+        zip(title_genre['title'], title_genre['genre']),
+        relation='is_genre'
+    )
 
-        for genre in genres:
-            G.add_node(genre, type='genre', label=genre)
-            G.add_edge(title, genre, relation='is_genre')
+    if include_people:
+        _add_person_layer(G, edges, min_person_titles)
 
     print(f"Grafo completo: {G.number_of_nodes()} nós, {G.number_of_edges()} arestas.")
     return G
 
 # Grafo país x gênero (global)
-def build_country_genre_graph(df, min_edge_weight=5, top_countries=15, top_genres=15):
-    edge_counter = Counter()
+def _top_by_count(count, n):
+    """
+    Os n maiores; empates pelo nome, e não pela ordem das linhas, para que
+    contagens atualizadas incrementalmente deem o mesmo corte.
+    """
+    ranked = sorted(count.items(), key=lambda item: (-item[1], str(item[0])))
+    return {name for name, _ in ranked[:n]}
+
 
-    for _, row in df.iterrows():
-        countries = [c.strip() for c in row['country'].split(',') if c.strip()]
-        genres = [g.strip() for g in row['listed_in'].split(',') if g.strip()]
+def country_genre_graph_from_counts(counts, min_edge_weight=5, top_countries=15, top_genres=15):
+    """
+    Monta o grafo global a partir das contagens (country, genre, weight).
+    """
+    if counts.empty:
+        return VersionedGraph()
 
-        for country, genre in product(countries, genres):
-            edge_counter[(country, genre)] += 1
+    # Nº de gêneros distintos por país (e vice-versa)
+    country_count = counts.groupby('country', sort=False, observed=True).size()
+    genre_count = counts.groupby('genre', sort=False, observed=True).size()
 
-    country_count = Counter(c for c, _ in edge_counter)
-    genre_count = Counter(g for _, g in edge_counter)
+    top_countries_set = _top_by_count(country_count, top_countries)
+    top_genres_set = _top_by_count(genre_count, top_genres)
 
-    top_countries_set = set(c for c, _ in country_count.most_common(top_countries))
-    top_genres_set = set(g for g, _ in genre_count.most_common(top_genres))
+    max_weight = int(counts['weight'].max())
+    kept = counts[
+        counts['country'].isin(top_countries_set) &
+        counts['genre'].isin(top_genres_set) &
+        (counts['weight'] >= min_edge_weight)
+    ]
 
-    G = nx.Graph()
-    max_weight = max(edge_counter.values())
+    return _weighted_country_genre_graph(kept, max_weight)
 
-    for (country, genre), weight in edge_counter.items():
-        if (
-            country in top_countries_set and
-            genre in top_genres_set and
-            weight >= min_edge_weight
-        ):
-            G.add_node(country, type='country', label=country)
-            G.add_node(genre, type='genre', label=genre)
-            G.add_edge(country, genre, weight=weight / max_weight)
+
+@timed('build_country_genre_graph')
+def build_country_genre_graph(df, min_edge_weight=5, top_countries=15, top_genres=15, edges=None):
+    edges = _ensure_edge_tables(df, edges)
+    counts = country_genre_counts(edges)
+
+    G = country_genre_graph_from_counts(counts, min_edge_weight, top_countries, top_genres)
 
     print(f"Grafo País–Gênero Global: {G.number_of_nodes()} nós, {G.number_of_edges()} arestas.")
     return G
 
 # Grafo país x gênero por região
-def build_region_country_genre_graph(df, region_countries, min_edge_weight=3):
-    edge_counter = Counter()
+def region_graph_from_counts(counts, region_countries, min_edge_weight=3):
+    """
+    Monta o grafo regional a partir das contagens globais (country, genre, weight),
+    normalizando pelo maior peso dentro da região.
+    """
+    counts = counts[counts['country'].isin(region_countries)]
+
+    if counts.empty:
+        return VersionedGraph()
 
-    for _, row in df.iterrows():
-        countries = [c.strip() for c in row['country'].split(',') if c.strip()]
-        genres = [g.strip() for g in row['listed_in'].split(',') if g.strip()]
+    max_weight = int(counts['weight'].max())
+    kept = counts[counts['weight'] >= min_edge_weight]
 
-        region_only = [c for c in countries if c in region_countries]
+    return _weighted_country_genre_graph(kept, max_weight)
 
-        for country, genre in product(region_only, genres):
-            edge_counter[(country, genre)] += 1
 
-    if not edge_counter:
-        return nx.Graph()
+@timed('build_region_country_genre_graph')
+def build_region_country_genre_graph(df, region_countries, min_edge_weight=3, edges=None):
+    edges = _ensure_edge_tables(df, edges)
 
-    max_weight = max(edge_counter.values())
-    G = nx.Graph()
+    title_country = edges['title_country']
+    region_edges = {
+        'title_country': title_country[title_country['country'].isin(region_countries)],
+        'title_genre': edges['title_genre'],
+    }
+    counts = country_genre_counts(region_edges)
 
-    for (country, genre), weight in edge_counter.items():
-        if weight >= min_edge_weight:
-            G.add_node(country, type='country', label=country)
-            G.add_node(genre, type='genre', label=genre)
-            G.add_edge(country, genre, weight=weight / max_weight)
+    G = region_graph_from_counts(counts, region_countries, min_edge_weight)
 
     print(f"Grafo Regional ({len(region_countries)} países): {G.number_of_nodes()} nós, {G.number_of_edges()} arestas.")
     return G
@@ -0,0 +1,164 @@
+import hashlib
+import itertools
+import weakref
+
+import networkx as nx
+
+# Estruturas derivadas de um grafo (índices, matrizes compiladas, ...)
+# ficam guardadas fora do grafo, associadas a ele por referência fraca.
+# Cada entrada registra a versão do grafo em que foi construída e é
+# reconstruída automaticamente quando o grafo muda.
+
+_DERIVED = weakref.WeakKeyDictionary()
+_TOKENS = weakref.WeakKeyDictionary()
+_token_counter = itertools.count(1)
+
+
+def graph_token(G):
+    """
+    Identificador único e estável do objeto grafo (não reaproveitado como id()).
+    """
+    if G not in _TOKENS:
+        _TOKENS[G] = next(_token_counter)
+    return _TOKENS[G]
+
+
+class VersionedGraph(nx.Graph):
+    """
+    nx.Graph que conta as próprias mutações (nós e arestas) em
+    graph['version']: a versão muda até quando a aresta adicionada liga
+    nós que já existiam. Alterações só em atributos continuam pedindo
+    bump_version(G).
+    """
+
+    def _bump(self):
+        self.graph['version'] = self.graph.get('version', 0) + 1
+
+
+def _versioned(name):
+    method = getattr(nx.Graph, name)
+
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._bump()
+        return result
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ('add_node', 'add_nodes_from', 'remove_node', 'remove_nodes_from',
+              'add_edge', 'add_edges_from', 'add_weighted_edges_from',
+              'remove_edge', 'remove_edges_from', 'update', 'clear', 'clear_edges'):
+    setattr(VersionedGraph, _name, _versioned(_name))
+
+
+def graph_version(G):
+    """
+    Versão atual do grafo: (token, nº de mutações registradas, nº de nós).
+    Em VersionedGraph (e no grafo compacto, imutável) custa O(1); num
+    nx.Graph comum entra também o nº de arestas (O(n)), para que arestas
+    novas entre nós existentes invalidem as estruturas derivadas.
+    """
+    version = (
+        graph_token(G),
+        G.graph.get('version', 0),
+        G.number_of_nodes(),
+    )
+    if isinstance(G, VersionedGraph) or getattr(G, 'is_compact', False):
+        return version
+    return version + (G.number_of_edges(),)
+
+
+def bump_version(G):
+    """
+    Marca o grafo como alterado, invalidando todas as estruturas derivadas.
+    """
+    G.graph['version'] = G.graph.get('version', 0) + 1
+
+
+def get_derived(G, key, factory):
+    """
+    Retorna a estrutura derivada 'key' do grafo, construindo-a com factory(G)
+    se ainda não existir ou se o grafo mudou desde a última construção.
+    """
+    version = graph_version(G)
+    entries = _DERIVED.setdefault(G, {})
+    entry = entries.get(key)
+
+    if entry is None or entry[0] != version:
+        entry = (version, factory(G))
+        entries[key] = entry
+
+    return entry[1]
+
+
+def set_derived(G, key, value):
+    """
+    Registra uma estrutura derivada já atualizada para a versão atual do grafo.
+    """
+    _DERIVED.setdefault(G, {})[key] = (graph_version(G), value)
+
+
+def clear_derived(G, key=None):
+    if key is None:
+        _DERIVED.pop(G, None)
+    else:
+        _DERIVED.get(G, {}).pop(key, None)
+
+
+def refresh_derived(G, keys):
+    """
+    Marca estruturas derivadas como ainda válidas na versão atual do grafo
+    (usado por atualizações incrementais que sabem o que não foi afetado).
+    """
+    entries = _DERIVED.get(G, {})
+    version = graph_version(G)
+    for key in keys:
+        if key in entries:
+            entries[key] = (version, entries[key][1])
+
+
+FINGERPRINT_CHUNK = 4096
+
+
+def _update_chunked(h, items, encode=repr):
+    # Alimenta o hash em blocos: memória constante mesmo em grafos grandes
+    items = iter(items)
+    while True:
+        block = list(itertools.islice(items, FINGERPRINT_CHUNK))
+        if not block:
+            return
+        h.update(encode(block).encode('utf-8'))
+
+
+def array_fingerprint(arrays, labels):
+    """
+    Hash de arrays numpy (bytes crus) e de uma sequência de labels, sem
+    montar strings do tamanho do grafo.
+    """
+    h = hashlib.sha1()
+    for arr in arrays:
+        h.update(arr.tobytes())
+    _update_chunked(h, labels, lambda block: '\x1f'.join(map(str, block)) + '\x1f')
+    return h.hexdigest()
+
+
+def _content_fingerprint(G):
+    if getattr(G, 'is_compact', False):
+        arrays = (G.node_type, G.indptr, G.indices, G.relation, G.pruned_people)
+        return array_fingerprint(arrays, G.labels.tolist())
+    h = hashlib.sha1()
+    _update_chunked(h, G.nodes(data=True))
+    h.update(b'\x1e')
+    _update_chunked(h, G.edges(data=True))
+    return h.hexdigest()
+
+
+def graph_fingerprint(G):
+    """
+    Hash do conteúdo do grafo (nós, arestas e atributos), estável entre
+    execuções; calculado uma vez por versão do grafo.
+    """
+    return get_derived(G, 'content_fingerprint', _content_fingerprint)
@@ -0,0 +1,389 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from src.data_loader import iter_records, load_data
+from src.graph_builder import (
+    PRUNED_PEOPLE,
+    build_edge_tables,
+    build_edge_tables_from_records,
+    build_full_graph,
+    build_country_genre_graph
+)
+from src.region_graphs import build_region_graphs
+from src.graph_state import VersionedGraph, set_derived
+from src.instrumentation import timed
+from src.sparse_recommender import CompiledGraph, get_compiled
+from src.string_arrays import decode_strings, encode_strings
+
+# Cache em disco dos grafos construídos.
+# Chave = hash do CSV + parâmetros resolvidos dos builders (explícitos +
+# padrões); cada entrada é um diretório de arquivos .npy + um manifest.json.
+# Os grafos networkx são reconstruídos em memória a partir dos arrays na
+# carga; a versão compilada (CSR do grafo completo e da transposta) usa os
+# arquivos mapeados em memória (np.load com mmap_mode='c': páginas lidas sob
+# demanda e compartilhadas entre processos, cópia só se alguém escrever).
+# CACHE_FORMAT deve ser incrementado quando a semântica dos builders mudar.
+
+CACHE_DIR = os.path.join('data', 'cache')
+CACHE_FORMAT = 4
+MAX_ENTRIES = 4
+
+_FINGERPRINTS = 'fingerprints.json'
+
+# Argumentos de build_all_graphs que não mudam o resultado
+_NOT_IN_KEY = {'df', 'regions', 'edges', 'region_workers'}
+
+
+# Chave do cache
+
+def file_sha256(filepath, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def csv_fingerprint(filepath, cache_dir=CACHE_DIR):
+    """
+    Hash do conteúdo do CSV. O hash é memorizado por (tamanho, mtime)
+    para não reler arquivos grandes que não mudaram.
+    """
+    stat = os.stat(filepath)
+    path_key = os.path.abspath(filepath)
+    memo_path = os.path.join(cache_dir, _FINGERPRINTS)
+
+    memo = {}
+    if os.path.exists(memo_path):
+        with open(memo_path, encoding='utf-8') as f:
+            memo = json.load(f)
+
+    entry = memo.get(path_key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = file_sha256(filepath)
+    memo[path_key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(memo_path, 'w', encoding='utf-8') as f:
+        json.dump(memo, f)
+
+    return digest
+
+
+def _normalize_params(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, dict):
+        return {k: _normalize_params(v) for k, v in value.items()}
+    return value
+
+
+def resolved_params(params):
+    """
+    Parâmetros de build_all_graphs com os valores padrão preenchidos:
+    mudar um padrão dos builders muda a chave do cache.
+    """
+    signature = inspect.signature(build_all_graphs)
+    resolved = {
+        name: p.default for name, p in signature.parameters.items()
+        if name not in _NOT_IN_KEY and p.default is not inspect.Parameter.empty
+    }
+    unknown = set(params) - set(resolved)
+    if unknown:
+        raise TypeError(f"Parâmetros desconhecidos: {sorted(unknown)}")
+    resolved.update(params)
+    return resolved
+
+
+def cache_key(csv_hash, params):
+    payload = json.dumps(
+        {'format': CACHE_FORMAT, 'csv': csv_hash, 'params': _normalize_params(params)},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+
+# Serialização de grafos em arrays
+
+def _save_graph(G, path, name):
+    nodes = list(G.nodes)
+    key_is_int = np.array([type(n) is int for n in nodes], dtype=bool)
+    if not all(isinstance(n, str) for n, is_int in zip(nodes, key_is_int) if not is_int):
+        raise TypeError(f"Grafo '{name}': apenas nós com chave string ou inteira podem ir para o cache.")
+
+    node_id = {n: i for i, n in enumerate(nodes)}
+    types = sorted({d.get('type', '') for _, d in G.nodes(data=True)})
+    type_code = {t: i for i, t in enumerate(types)}
+
+    arrays = {}
+    has_int_keys = bool(key_is_int.any())
+    arrays['keys_blob'], arrays['keys_offsets'] = encode_strings(
+        [str(n) for n in nodes] if has_int_keys else nodes
+    )
+    if has_int_keys:
+        arrays['key_is_int'] = key_is_int
+    arrays['node_type'] = np.array(
+        [type_code[d.get('type', '')] for _, d in G.nodes(data=True)], dtype=np.int8
+    )
+
+    pruned = np.array([d.get(PRUNED_PEOPLE, 0) for _, d in G.nodes(data=True)], dtype=np.int32)
+    if pruned.any():
+        arrays['pruned_people'] = pruned
+
+    labels = [d.get('label', n) for n, d in G.nodes(data=True)]
+    label_is_key = labels == nodes
+    if not label_is_key:
+        arrays['labels_blob'], arrays['labels_offsets'] = encode_strings(labels)
+
+    edges = list(G.edges(data=True))
+    arrays['src'] = np.array([node_id[u] for u, _, _ in edges], dtype=np.int32)
+    arrays['dst'] = np.array([node_id[v] for _, v, _ in edges], dtype=np.int32)
+
+    edge_attrs = {}
+    for attr in sorted({k for _, _, d in edges for k in d}):
+        values = [d.get(attr) for _, _, d in edges]
+        if all(isinstance(v, str) or v is None for v in values):
+            names = sorted({v for v in values if v is not None})
+            code = {v: i for i, v in enumerate(names)}
+            arrays[f'edge_{attr}'] = np.array(
+                [code.get(v, -1) for v in values], dtype=np.int16
+            )
+            edge_attrs[attr] = {'kind': 'category', 'names': names}
+        else:
+            arrays[f'edge_{attr}'] = np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+            edge_attrs[attr] = {'kind': 'float'}
+
+    for key, arr in arrays.items():
+        np.save(os.path.join(path, f'{name}.{key}.npy'), arr)
+
+    return {
+        'types': types, 'label_is_key': label_is_key,
+        'int_keys': has_int_keys, 'edge_attrs': edge_attrs, 'pruned_people': 'pruned_people' in arrays
+    }
+
+
+def _load_graph(path, name, meta):
+    def load(key):
+        return np.load(os.path.join(path, f'{name}.{key}.npy'))
+
+    nodes = decode_strings(load('keys_blob'), load('keys_offsets'))
+    if meta.get('int_keys'):
+        nodes = [
+            int(n) if is_int else n
+            for n, is_int in zip(nodes, load('key_is_int').tolist())
+        ]
+    labels = nodes if meta['label_is_key'] else decode_strings(
+        load('labels_blob'), load('labels_offsets')
+    )
+    types = meta['types']
+
+    G = VersionedGraph()
+    G.add_nodes_from(
+        (n, {'type': types[t], 'label': l})
+        for n, t, l in zip(nodes, load('node_type').tolist(), labels)
+    )
+    if meta.get('pruned_people'):
+        pruned = load('pruned_people')
+        for i in np.flatnonzero(pruned).tolist():
+            G.nodes[nodes[i]][PRUNED_PEOPLE] = int(pruned[i])
+
+    src = load('src').tolist()
+    dst = load('dst').tolist()
+
+    columns = []
+    for attr, info in meta['edge_attrs'].items():
+        values = load(f'edge_{attr}').tolist()
+        if info['kind'] == 'category':
+            names = info['names']
+            values = [names[v] if v >= 0 else None for v in values]
+        columns.append((attr, values))
+
+    if columns:
+        attr_dicts = (
+            {attr: values[i] for attr, values in columns if values[i] is not None}
+            for i in range(len(src))
+        )
+        G.add_edges_from(
+            (nodes[u], nodes[v], d) for u, v, d in zip(src, dst, attr_dicts)
+        )
+    else:
+        G.add_edges_from((nodes[u], nodes[v]) for u, v in zip(src, dst))
+
+    return G, nodes
+
+
+def _save_compiled(compiled, G, path):
+    node_id = {n: i for i, n in enumerate(G.nodes)}
+    arrays = {
+        'indptr': compiled.matrix.indptr,
+        'indices': compiled.matrix.indices,
+        't_indptr': compiled.matrix_t.indptr,
+        't_indices': compiled.matrix_t.indices,
+        'col_type': compiled.col_type,
+        'col_inv_log': compiled.col_inv_log,
+        'title_ids': np.array([node_id[n] for n in compiled.titles], dtype=np.int32),
+        'attr_ids': np.array([node_id[n] for n in compiled.attrs], dtype=np.int32),
+    }
+    for key, arr in arrays.items():
+        np.save(os.path.join(path, f'compiled.{key}.npy'), arr)
+
+
+def _load_compiled(path, G, nodes):
+    def load(key):
+        return np.load(os.path.join(path, f'compiled.{key}.npy'), mmap_mode='c')
+
+    titles = [nodes[i] for i in load('title_ids').tolist()]
+    attrs = [nodes[i] for i in load('attr_ids').tolist()]
+    labels = [G.nodes[n].get('label') for n in titles]
+    pruned = [G.nodes[n].get(PRUNED_PEOPLE, 0) for n in titles]
+
+    compiled = CompiledGraph.from_arrays(
+        load('indptr'), load('indices'), load('col_type'), load('col_inv_log'),
+        titles, labels, attrs, pruned, transposed=(load('t_indptr'), load('t_indices'))
+    )
+    set_derived(G, 'sparse_compiled', compiled)
+
+
+# Cache
+
+def save_graphs(graphs, path, key, full_name='full'):
+    """
+    Salva os grafos (e a versão compilada do grafo completo) em 'path'.
+    A escrita é feita em um diretório temporário e renomeada no final.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    manifest = {'format': CACHE_FORMAT, 'key': key, 'graphs': {}}
+    for name, G in graphs.items():
+        manifest['graphs'][name] = _save_graph(G, tmp_path, name)
+
+    if full_name in graphs:
+        _save_compiled(get_compiled(graphs[full_name]), graphs[full_name], tmp_path)
+        manifest['compiled'] = full_name
+
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_graphs(path):
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format') != CACHE_FORMAT:
+        return None
+
+    graphs = {}
+    for name, meta in manifest['graphs'].items():
+        G, nodes = _load_graph(path, name, meta)
+        graphs[name] = G
+        if manifest.get('compiled') == name:
+            _load_compiled(path, G, nodes)
+
+    return graphs
+
+
+def _prune(cache_dir, keep):
+    """
+    Remove as entradas de grafos mais antigas. Só conta diretórios com
+    manifest.json: outros caches em data/cache (layout, índice de
+    similaridade) não são entradas de grafos.
+    """
+    entries = [
+        os.path.join(cache_dir, d) for d in os.listdir(cache_dir)
+        if '.tmp-' not in d and os.path.isfile(os.path.join(cache_dir, d, 'manifest.json'))
+    ]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for old in entries[keep:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+@timed('build_all_graphs')
+def build_all_graphs(df, regions, min_edge_weight=5, top_countries=15, top_genres=15,
+                     region_min_edge_weight=3, include_people=False, max_cast=None,
+                     min_person_titles=2, edges=None, region_workers=1):
+    """
+    Constrói o grafo completo, o global País × Gênero e um grafo por região.
+    region_workers > 1 conta as regiões em paralelo (None = nº de CPUs).
+    """
+    if edges is None:
+        edges = build_edge_tables(df, include_people=include_people, max_cast=max_cast)
+
+    graphs = {
+        'full': build_full_graph(
+            df, edges=edges, include_people=include_people,
+            max_cast=max_cast, min_person_titles=min_person_titles
+        ),
+        'country_genre': build_country_genre_graph(
+            df, min_edge_weight=min_edge_weight,
+            top_countries=top_countries, top_genres=top_genres, edges=edges
+        ),
+    }
+    graphs.update(build_region_graphs(
+        df, regions, min_edge_weight=region_min_edge_weight, edges=edges, workers=region_workers
+    ))
+
+    return graphs
+
+
+def _build_from_csv(csv_path, regions, streaming, params, region_workers=1):
+    if streaming:
+        # Leitura em blocos: só as colunas usadas, sem materializar o CSV inteiro
+        include_people = params.get('include_people', False)
+        edges = build_edge_tables_from_records(
+            iter_records(csv_path, include_people=include_people),
+            max_cast=params.get('max_cast')
+        )
+        return build_all_graphs(None, regions, edges=edges, region_workers=region_workers, **params)
+    return build_all_graphs(load_data(csv_path), regions, region_workers=region_workers, **params)
+
+
+def load_or_build_graphs(csv_path, regions, cache_dir=CACHE_DIR, use_cache=True,
+                         streaming=False, region_workers=1, **params):
+    """
+    Carrega os grafos do cache se o CSV e os parâmetros não mudaram;
+    caso contrário lê o CSV, constrói tudo e atualiza o cache.
+    streaming=True usa o leitor em blocos (memória limitada).
+    region_workers não entra na chave do cache (não muda o resultado).
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Arquivo não encontrado: {csv_path}")
+
+    if not use_cache:
+        return _build_from_csv(csv_path, regions, streaming, params, region_workers)
+
+    key = cache_key(
+        csv_fingerprint(csv_path, cache_dir),
+        {'regions': regions, **resolved_params(params)}
+    )
+    path = os.path.join(cache_dir, key)
+
+    if os.path.exists(os.path.join(path, 'manifest.json')):
+        start = time.perf_counter()
+        graphs = load_graphs(path)
+        if graphs is not None:
+            os.utime(path)
+            print(f"Grafos carregados do cache ({time.perf_counter() - start:.2f}s): {path}")
+            return graphs
+
+    graphs = _build_from_csv(csv_path, regions, streaming, params, region_workers)
+
+    save_graphs(graphs, path, key)
+    _prune(cache_dir, MAX_ENTRIES)
+    print(f"Cache de grafos atualizado: {path}")
+
+    return graphs
@@ -0,0 +1,314 @@
+from collections import Counter
+
+import pandas as pd
+
+from src.graph_builder import (
+    PERSON_COLUMNS,
+    PRUNED_PEOPLE,
+    build_edge_tables,
+    build_full_graph,
+    country_genre_counts,
+    country_genre_graph_from_counts,
+    region_graph_from_counts
+)
+from src.graph_state import bump_version, refresh_derived
+
+# Atualização incremental do catálogo: aplica linhas novas/removidas ao
+# grafo completo e aos contadores país × gênero, sem reconstruir tudo.
+# Os grafos normalizados (global e regionais) são refeitos só quando
+# consultados e apenas se alguma contagem relevante mudou.
+# Com include_people=True a camada de pessoas acompanha o delta: uma pessoa
+# fica no grafo enquanto tiver min_person_titles títulos (como prune_people),
+# com o mesmo id inteiro da construção inicial; as que ficam de fora entram
+# na contagem PRUNED_PEOPLE de cada título.
+
+# Estruturas derivadas que só dependem do conjunto de títulos
+TITLE_ONLY_DERIVED = ('title_index', 'text_index')
+
+
+class IncrementalCatalog:
+
+    def __init__(self, df, regions=None, min_edge_weight=5, top_countries=15, top_genres=15,
+                 region_min_edge_weight=3, include_people=False, max_cast=None, min_person_titles=2):
+        self.regions = dict(regions or {})
+        self.include_people = include_people
+        self.max_cast = max_cast
+        self.min_person_titles = min_person_titles
+        self.params = {
+            'min_edge_weight': min_edge_weight,
+            'top_countries': top_countries,
+            'top_genres': top_genres,
+        }
+        self.region_min_edge_weight = region_min_edge_weight
+
+        edges = build_edge_tables(df, include_people=include_people, max_cast=max_cast)
+        self.G_full = build_full_graph(
+            df, edges=edges, include_people=include_people,
+            max_cast=max_cast, min_person_titles=min_person_titles
+        )
+
+        # Nº de linhas por título e multiplicidade de cada aresta título–atributo
+        self.title_rows = Counter(edges['titles'].tolist())
+        self.edge_refs = Counter()
+        self._count_edges(edges, self.edge_refs, 1)
+
+        # Pessoas: id por nome e títulos (com a relação) de cada pessoa, inclusive
+        # das que ainda não têm títulos suficientes para entrar no grafo
+        self.people = list(edges['people']) if include_people else []
+        self.person_ids = {name: i for i, name in enumerate(self.people)}
+        self.person_refs = Counter()
+        self.person_titles = {}
+        self.title_people = {}
+        if include_people:
+            self._count_people(edges['title_person'], self.person_refs, 1)
+            for (title, person), relation in self._person_relations(edges['title_person']).items():
+                self.person_titles.setdefault(person, {})[title] = relation
+                self.title_people.setdefault(title, set()).add(person)
+
+        counts = country_genre_counts(edges)
+        self.pair_counts = Counter({
+            (c, g): w for c, g, w in counts.itertuples(index=False, name=None)
+        })
+
+        self._graphs = {}
+        self._dirty = {'country_genre'} | set(self.regions)
+
+    @staticmethod
+    def _count_edges(edges, counter, sign):
+        for title, country in zip(edges['title_country']['title'], edges['title_country']['country']):
+            counter[(title, country, 'country')] += sign
+        for title, genre in zip(edges['title_genre']['title'], edges['title_genre']['genre']):
+            counter[(title, genre, 'genre')] += sign
+
+    @staticmethod
+    def _count_people(title_person, counter, sign):
+        for title, person in zip(title_person['title'], title_person['person'].tolist()):
+            counter[(title, person)] += sign
+
+    @staticmethod
+    def _person_relations(title_person):
+        # Primeira relação de cada par (diretor antes de elenco, como em prune_people)
+        pairs = title_person.drop_duplicates(['title', 'person'])
+        return dict(zip(zip(pairs['title'], pairs['person'].tolist()), pairs['relation']))
+
+    def _global_people(self, edges, create):
+        """
+        title_person do delta com os ids do catálogo (nomes novos ganham id
+        se create=True; desconhecidos são descartados na remoção).
+        """
+        table = edges['title_person']
+        names = edges['people'][table['person'].to_numpy(dtype='int64')]
+        ids = []
+        for name in names.tolist():
+            if name not in self.person_ids and create:
+                self.person_ids[name] = len(self.people)
+                self.people.append(name)
+            ids.append(self.person_ids.get(name, -1))
+        table = table.assign(person=ids)
+        return table[table['person'] >= 0]
+
+    def _sync_person(self, person, summary):
+        """
+        Ajusta o nó e as arestas da pessoa à lista atual de títulos.
+        """
+        G = self.G_full
+        titles = self.person_titles.get(person, {})
+        wanted = titles if len(titles) >= self.min_person_titles else {}
+        current = set(G.neighbors(person)) if person in G else set()
+
+        if wanted and person not in G:
+            G.add_node(person, type='person', label=self.people[person])
+            summary['people_added'] += 1
+        for title in current - set(wanted):
+            G.remove_edge(title, person)
+            summary['edges_removed'] += 1
+        for title in set(wanted) - current:
+            G.add_edge(title, person, relation=wanted[title])
+            summary['edges_added'] += 1
+        if not wanted and person in G:
+            G.remove_node(person)
+            summary['people_removed'] += 1
+
+    def _sync_pruned(self, title, summary):
+        """
+        Atualiza a contagem de pessoas do título que estão fora do grafo.
+        """
+        G = self.G_full
+        if title not in G:
+            return
+        count = sum(1 for person in self.title_people.get(title, ()) if person not in G)
+        if G.nodes[title].get(PRUNED_PEOPLE, 0) == count:
+            return
+        if count:
+            G.nodes[title][PRUNED_PEOPLE] = count
+        else:
+            del G.nodes[title][PRUNED_PEOPLE]
+        summary['pruned_changed'] += 1
+
+    # Grafos normalizados (reconstruídos sob demanda)
+
+    def _counts_frame(self):
+        return pd.DataFrame(
+            [(c, g, w) for (c, g), w in self.pair_counts.items()],
+            columns=['country', 'genre', 'weight']
+        )
+
+    def graph(self, name):
+        """
+        'full', 'country_genre' ou o nome de uma região.
+        """
+        if name == 'full':
+            return self.G_full
+
+        if name in self._dirty or name not in self._graphs:
+            counts = self._counts_frame()
+            if name == 'country_genre':
+                G = country_genre_graph_from_counts(counts, **self.params)
+            else:
+                G = region_graph_from_counts(
+                    counts, self.regions[name], self.region_min_edge_weight
+                )
+            self._graphs[name] = G
+            self._dirty.discard(name)
+
+        return self._graphs[name]
+
+    @property
+    def country_genre(self):
+        return self.graph('country_genre')
+
+    # Delta
+
+    def _edges_of(self, rows):
+        if rows is None:
+            return None
+        columns = ['title', 'country', 'listed_in']
+        if self.include_people:
+            columns += [column for column, _, _ in PERSON_COLUMNS]
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(list(rows), columns=columns)
+        if rows.empty:
+            return None
+        rows = rows.reindex(columns=rows.columns.union(columns, sort=False))
+        rows['title'] = rows['title'].fillna('Unknown Title')
+        for column in columns[1:]:
+            rows[column] = rows[column].fillna('')
+        return build_edge_tables(rows, include_people=self.include_people, max_cast=self.max_cast)
+
+    def apply_delta(self, added_rows=None, removed_rows=None):
+        """
+        Aplica linhas adicionadas/removidas (DataFrame ou lista de dicts com
+        title, country, listed_in e, com pessoas, director e cast). Linhas
+        removidas devem ter o mesmo conteúdo das linhas originais. Retorna
+        um resumo das mudanças.
+        """
+        G = self.G_full
+        summary = Counter()
+        touched_countries = set()
+        touched_people = set()
+        touched_titles = set()
+        titles_changed = False
+
+        removed = self._edges_of(removed_rows)
+        added = self._edges_of(added_rows)
+
+        for edges, sign in ((removed, -1), (added, 1)):
+            if edges is None:
+                continue
+
+            # Títulos
+            for title in edges['titles'].tolist():
+                self.title_rows[title] += sign
+                if sign > 0 and title not in G:
+                    G.add_node(title, type='title', label=title)
+                    summary['titles_added'] += 1
+                    titles_changed = True
+
+            # Arestas título–atributo
+            delta = Counter()
+            self._count_edges(edges, delta, sign)
+            for (title, attr, kind), change in delta.items():
+                key = (title, attr, kind)
+                before = self.edge_refs[key]
+                self.edge_refs[key] = before + change
+
+                if before <= 0 < self.edge_refs[key]:
+                    if attr not in G:
+                        G.add_node(attr, type=kind, label=attr)
+                    relation = 'produced_in' if kind == 'country' else 'is_genre'
+                    G.add_edge(title, attr, relation=relation)
+                    summary['edges_added'] += 1
+                elif self.edge_refs[key] <= 0 < before:
+                    G.remove_edge(title, attr)
+                    summary['edges_removed'] += 1
+                    if G.degree(attr) == 0:
+                        G.remove_node(attr)
+
+                if self.edge_refs[key] <= 0:
+                    del self.edge_refs[key]
+
+            # Pares título–pessoa (o nó da pessoa é ajustado no fim)
+            if self.include_people:
+                title_person = self._global_people(edges, create=sign > 0)
+                relations = self._person_relations(title_person)
+                delta = Counter()
+                self._count_people(title_person, delta, sign)
+                for (title, person), change in delta.items():
+                    before = self.person_refs[(title, person)]
+                    self.person_refs[(title, person)] = before + change
+                    titles = self.person_titles.setdefault(person, {})
+                    if before <= 0 < self.person_refs[(title, person)]:
+                        titles[title] = relations[(title, person)]
+                        self.title_people.setdefault(title, set()).add(person)
+                    elif self.person_refs[(title, person)] <= 0 < before:
+                        titles.pop(title, None)
+                        self.title_people[title].discard(person)
+                        if not self.title_people[title]:
+                            del self.title_people[title]
+                    if self.person_refs[(title, person)] <= 0:
+                        del self.person_refs[(title, person)]
+                    if not titles:
+                        del self.person_titles[person]
+                    touched_people.add(person)
+                    touched_titles.add(title)
+
+            # Contagens país × gênero
+            for (country, genre, weight) in country_genre_counts(edges).itertuples(index=False, name=None):
+                self.pair_counts[(country, genre)] += sign * weight
+                if self.pair_counts[(country, genre)] <= 0:
+                    del self.pair_counts[(country, genre)]
+                touched_countries.add(country)
+                summary['pairs_changed'] += 1
+
+        # Títulos sem nenhuma linha restante saem do grafo
+        for title in [t for t, n in self.title_rows.items() if n <= 0]:
+            del self.title_rows[title]
+            if title in G:
+                G.remove_node(title)
+                summary['titles_removed'] += 1
+                titles_changed = True
+
+        for person in touched_people:
+            self._sync_person(person, summary)
+            touched_titles.update(self.person_titles.get(person, ()))
+        for title in touched_titles:
+            self._sync_pruned(title, summary)
+
+        # Invalidação grossa: qualquer aresta nova/removida muda a versão do grafo
+        # e descarta todas as estruturas derivadas (feature store, CSR, índice
+        # de similaridade, layout), que são reconstruídas na próxima consulta.
+        # Só o que depende apenas do conjunto de títulos é mantido. Mudar a
+        # contagem PRUNED_PEOPLE (atributo de nó) também conta como mudança.
+        if summary['edges_added'] or summary['edges_removed'] or summary['pruned_changed'] or titles_changed:
+            bump_version(G)
+            if not titles_changed:
+                refresh_derived(G, TITLE_ONLY_DERIVED)
+
+        # Normalização preguiçosa: só marca os grafos afetados
+        if touched_countries:
+            self._dirty.add('country_genre')
+            for name, countries in self.regions.items():
+                if touched_countries & set(countries):
+                    self._dirty.add(name)
+
+        return dict(summary)
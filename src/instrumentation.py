@@ -0,0 +1,302 @@
+import bisect
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+
+# Instrumentação leve: timers por fase e contadores (histogramas) das etapas
+# de carga, construção, projeção e recomendação. Desligada por padrão; com
+# ENABLED = False cada ponto instrumentado custa só uma checagem de flag.
+#
+#   from src import instrumentation
+#   instrumentation.enable()
+#   ... recommend_titles(...)
+#   print(instrumentation.report())
+#   instrumentation.export('metrics.json')    # ou 'metrics.prom'
+#
+# GRAPH_INSTRUMENTATION=1 no ambiente liga a instrumentação na importação.
+
+ENABLED = os.environ.get('GRAPH_INSTRUMENTATION', '') not in ('', '0')
+
+# Limites dos buckets (Prometheus: cada bucket conta as observações <= limite)
+SECONDS_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10_000, 50_000, 100_000, 1_000_000)
+
+PROMETHEUS_PREFIX = 'graph'
+
+
+class Histogram:
+    """
+    Histograma acumulado: contagem por bucket, soma, mínimo e máximo.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # último = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Quantil aproximado pelo limite superior do bucket (como histogram_quantile).
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for limit, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return min(limit, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {str(b): n for b, n in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+_TIMERS = {}
+_VALUES = {}
+_COUNTERS = {}
+_LOCK = threading.Lock()
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+
+def disable():
+    enable(False)
+
+
+def reset():
+    with _LOCK:
+        _TIMERS.clear()
+        _VALUES.clear()
+        _COUNTERS.clear()
+
+
+def _observe(table, buckets, name, value):
+    with _LOCK:
+        hist = table.get(name)
+        if hist is None:
+            hist = table[name] = Histogram(buckets)
+        hist.observe(value)
+
+
+def observe_seconds(name, seconds):
+    if ENABLED:
+        _observe(_TIMERS, SECONDS_BUCKETS, name, seconds)
+
+
+def observe(name, value):
+    """
+    Registra um valor por evento (ex.: candidatos por consulta).
+    """
+    if ENABLED:
+        _observe(_VALUES, COUNT_BUCKETS, name, value)
+
+
+def incr(name, n=1):
+    if ENABLED:
+        with _LOCK:
+            _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _observe(_TIMERS, SECONDS_BUCKETS, self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(name):
+    """
+    with timer('fase'): ...  — mede a duração do bloco (no-op se desligado).
+    """
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def timed(name=None):
+    """
+    Decorador: mede cada chamada da função (nome padrão = nome da função).
+    """
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Timer(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Exportação
+
+def snapshot():
+    with _LOCK:
+        return {
+            'timers': {k: v.to_dict() for k, v in sorted(_TIMERS.items())},
+            'values': {k: v.to_dict() for k, v in sorted(_VALUES.items())},
+            'counters': dict(sorted(_COUNTERS.items())),
+        }
+
+
+def to_json(indent=2):
+    return json.dumps(snapshot(), indent=indent)
+
+
+def _prom_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _prom_histogram(lines, metric, label, hist):
+    seen = 0
+    for limit, n in zip(hist.buckets, hist.counts):
+        seen += n
+        lines.append(f'{metric}_bucket{{{label},le="{limit}"}} {seen}')
+    lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {hist.count}')
+    lines.append(f'{metric}_sum{{{label}}} {hist.sum}')
+    lines.append(f'{metric}_count{{{label}}} {hist.count}')
+
+
+def to_prometheus(prefix=PROMETHEUS_PREFIX):
+    """
+    Formato texto do Prometheus: um histograma de latência por fase, um por
+    valor observado e um counter por contador.
+    """
+    lines = []
+    with _LOCK:
+        if _TIMERS:
+            metric = f'{prefix}_phase_seconds'
+            lines += [f'# HELP {metric} Duração de cada fase.', f'# TYPE {metric} histogram']
+            for name, hist in sorted(_TIMERS.items()):
+                _prom_histogram(lines, metric, f'phase="{_prom_label(name)}"', hist)
+
+        if _VALUES:
+            metric = f'{prefix}_observed'
+            lines += [f'# HELP {metric} Valores por evento (candidatos, vizinhos, ...).',
+                      f'# TYPE {metric} histogram']
+            for name, hist in sorted(_VALUES.items()):
+                _prom_histogram(lines, metric, f'name="{_prom_label(name)}"', hist)
+
+        for name, value in sorted(_COUNTERS.items()):
+            metric = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+            lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+
+    return '\n'.join(lines) + '\n'
+
+
+def export(path):
+    """
+    Salva as métricas em JSON ou, se o arquivo terminar em .prom, no formato Prometheus.
+    """
+    text = to_prometheus() if path.endswith('.prom') else to_json()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def report():
+    """
+    Tabela legível das fases (ms) e dos valores observados.
+    """
+    data = snapshot()
+    lines = [f"{'fase':<34} {'n':>7} {'média':>10} {'p50':>10} {'p95':>10} {'total':>10}"]
+    for name, h in data['timers'].items():
+        lines.append(
+            f"{name:<34} {h['count']:>7} {h['mean'] * 1000:>8.3f}ms {h['p50'] * 1000:>8.3f}ms "
+            f"{h['p95'] * 1000:>8.3f}ms {h['sum']:>9.3f}s"
+        )
+    for name, h in data['values'].items():
+        lines.append(f"{name:<34} {h['count']:>7} {h['mean']:>10.1f} {h['p50']:>10} {h['p95']:>10}")
+    for name, value in data['counters'].items():
+        lines.append(f"{name:<34} {value:>7}")
+    return '\n'.join(lines)
+
+
+# Perfil completo (opcional)
+
+@contextlib.contextmanager
+def profile(path=None, engine='cprofile', top=25):
+    """
+    Captura um perfil do bloco. engine='cprofile' (biblioteca padrão) salva
+    um .prof (snakeviz / pstats); engine='pyinstrument' salva um .html se o
+    pacote estiver instalado (senão cai no cProfile). Imprime o resumo.
+    """
+    if engine == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument não instalado; usando cProfile.")
+            engine = 'cprofile'
+
+    if engine == 'pyinstrument':
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            print(profiler.output_text(unicode=True, color=False))
+            if path:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+                print(f"Perfil salvo em '{path}'")
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+        print(out.getvalue())
+        if path:
+            profiler.dump_stats(path)
+            print(f"Perfil salvo em '{path}'")
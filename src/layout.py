@@ -0,0 +1,381 @@
+import hashlib
+import os
+import zlib
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.features import TYPE_CODES, get_features
+from src.graph_state import array_fingerprint, get_derived
+from src.instrumentation import timed, timer
+
+# Layouts das visualizações sem nx.spring_layout a cada chamada.
+# Os nós de atributo (países, gêneros, pessoas) têm uma posição global fixa,
+# calculada uma vez por grafo e guardada em disco:
+# - países / gêneros: layout de forças do grafo de coocorrência (via títulos
+#   e arestas diretas entre atributos);
+# - pessoas: média das posições dos países / gêneros dos seus títulos, com um
+#   deslocamento determinístico pelo nome.
+# Cada visualização posiciona só os títulos (média dos atributos vizinhos) e
+# relaxa as forças com os atributos fixos: o mesmo gênero cai sempre no mesmo
+# lugar. Acima de EXACT_LIMIT nós a repulsão usa uma grade no estilo
+# Barnes-Hut (células distantes pelo centro de massa).
+
+CACHE_DIR = os.path.join('data', 'cache', 'layout')
+LAYOUT_VERSION = 1
+
+EXACT_LIMIT = 1500          # até aqui a repulsão é exata (todos os pares)
+NODES_PER_CELL = 8          # ocupação média das células da grade
+BLOCK_CELLS = 4_000_000     # nós × células por bloco do campo distante
+PERSON_JITTER = 0.04        # raio do deslocamento das pessoas (layout em [-1, 1])
+TITLE_JITTER = 0.03
+SEED = 42
+
+_TITLE = TYPE_CODES['title']
+_PERSON = TYPE_CODES['person']
+
+
+# Layout de forças (Fruchterman-Reingold, como nx.spring_layout)
+
+def _exact_repulsion(pos, targets, k):
+    disp = np.zeros((len(targets), 2))
+    step = max(1, BLOCK_CELLS // max(len(pos), 1))
+    for start in range(0, len(targets), step):
+        rows = targets[start:start + step]
+        delta = pos[rows, None, :] - pos[None, :, :]
+        d2 = np.maximum((delta ** 2).sum(axis=2), (0.01 * k) ** 2)
+        disp[start:start + len(rows)] = (delta * (k * k / d2)[:, :, None]).sum(axis=1)
+    return disp
+
+
+def _grid_repulsion(pos, targets, k):
+    """
+    Repulsão aproximada: pares exatos nas 3×3 células vizinhas, centro de massa
+    das células mais distantes (Barnes-Hut de um nível).
+    """
+    n = len(pos)
+    g = int(np.clip(np.sqrt(n / NODES_PER_CELL), 2, 256))
+    lo = pos.min(axis=0)
+    span = float(np.ptp(pos, axis=0).max()) or 1.0
+    cxy = np.clip(((pos - lo) / span * g).astype(np.int64), 0, g - 1)
+    cell = cxy[:, 0] * g + cxy[:, 1]
+
+    mass = np.bincount(cell, minlength=g * g).astype(np.float64)
+    occupied = np.flatnonzero(mass)
+    com = np.stack([
+        np.bincount(cell, weights=pos[:, 0], minlength=g * g)[occupied],
+        np.bincount(cell, weights=pos[:, 1], minlength=g * g)[occupied],
+    ], axis=1) / mass[occupied, None]
+    ox, oy = occupied // g, occupied % g
+
+    # Campo distante
+    disp = np.zeros((len(targets), 2))
+    step = max(1, BLOCK_CELLS // len(occupied))
+    for start in range(0, len(targets), step):
+        rows = targets[start:start + step]
+        delta = pos[rows, None, :] - com[None, :, :]
+        d2 = np.maximum((delta ** 2).sum(axis=2), (0.01 * k) ** 2)
+        f = mass[occupied] * k * k / d2
+        near = (np.abs(cxy[rows, 0, None] - ox) <= 1) & (np.abs(cxy[rows, 1, None] - oy) <= 1)
+        f[near] = 0.0
+        disp[start:start + len(rows)] = (delta * f[:, :, None]).sum(axis=1)
+
+    # Campo próximo: nós das células vizinhas, um deslocamento de célula por vez
+    order = np.argsort(cell, kind='stable')
+    starts = np.zeros(g * g + 1, dtype=np.int64)
+    np.cumsum(mass.astype(np.int64), out=starts[1:])
+    slot = np.arange(len(targets))
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            nx_, ny_ = cxy[targets, 0] + dx, cxy[targets, 1] + dy
+            valid = (nx_ >= 0) & (nx_ < g) & (ny_ >= 0) & (ny_ < g)
+            nb = nx_[valid] * g + ny_[valid]
+            counts = mass[nb].astype(np.int64)
+            owner = np.repeat(slot[valid], counts)
+            offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+            partner = order[np.repeat(starts[nb], counts) + offsets]
+            src = targets[owner]
+            keep = partner != src
+            owner, src, partner = owner[keep], src[keep], partner[keep]
+
+            delta = pos[src] - pos[partner]
+            d2 = np.maximum((delta ** 2).sum(axis=1), (0.01 * k) ** 2)
+            f = delta * (k * k / d2)[:, None]
+            disp[:, 0] += np.bincount(owner, weights=f[:, 0], minlength=len(targets))
+            disp[:, 1] += np.bincount(owner, weights=f[:, 1], minlength=len(targets))
+
+    return disp
+
+
+def force_layout(pos, src, dst, weight=None, fixed=None, iterations=50, k=None):
+    """
+    Fruchterman-Reingold vetorizado. pos: posições iniciais (n × 2);
+    (src, dst, weight): arestas; fixed: máscara dos nós que não se movem.
+    """
+    pos = np.array(pos, dtype=np.float64)
+    n = len(pos)
+    movable = np.arange(n) if fixed is None else np.flatnonzero(~np.asarray(fixed))
+    if n < 2 or len(movable) == 0:
+        return pos
+
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    weight = np.ones(len(src)) if weight is None else np.asarray(weight, dtype=np.float64)
+
+    extent = float(np.ptp(pos, axis=0).max()) or 1.0
+    k = k or extent * np.sqrt(1.0 / n)
+    t = 0.1 * extent
+    dt = t / (iterations + 1)
+    repulsion = _exact_repulsion if n <= EXACT_LIMIT else _grid_repulsion
+    index_of = np.full(n, -1, dtype=np.int64)
+    index_of[movable] = np.arange(len(movable))
+
+    for _ in range(iterations):
+        disp = repulsion(pos, movable, k)
+
+        delta = pos[src] - pos[dst]
+        dist = np.sqrt((delta ** 2).sum(axis=1))
+        f = delta * (dist * weight / k)[:, None]
+        for nodes, sign in ((src, -1.0), (dst, 1.0)):
+            rows = index_of[nodes]
+            mask = rows >= 0
+            for axis in (0, 1):
+                disp[:, axis] += sign * np.bincount(
+                    rows[mask], weights=f[mask, axis], minlength=len(movable)
+                )
+
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 0.01)
+        pos[movable] += disp * (np.minimum(length, t) / length)[:, None]
+        t -= dt
+
+    return pos
+
+
+def _rescale(pos, scale=1.0):
+    """
+    Centraliza e ajusta ao quadrado [-scale, scale] (como nx.rescale_layout).
+    """
+    if len(pos) == 0:
+        return pos
+    pos = pos - pos.mean(axis=0)
+    lim = np.abs(pos).max()
+    return pos * (scale / lim) if lim > 0 else pos
+
+
+def _stable_jitter(labels, radius):
+    """
+    Deslocamento determinístico por label (crc32, não depende do hash do Python).
+    """
+    h = np.fromiter((zlib.crc32(str(label).encode('utf-8')) for label in labels),
+                    dtype=np.uint64, count=len(labels))
+    angle = (h % 3600).astype(np.float64) / 3600 * 2 * np.pi
+    r = radius * np.sqrt(((h >> np.uint64(12)) % 1000).astype(np.float64) / 1000)
+    return np.stack([r * np.cos(angle), r * np.sin(angle)], axis=1)
+
+
+# Tabela global de posições dos atributos
+
+class AnchorTable:
+    """
+    Posições globais dos nós de atributo:
+    - type_codes / labels:  chave (tipo, label) de cada âncora
+    - positions:            posição de cada âncora (em [-1, 1])
+    """
+
+    def __init__(self, type_codes, labels, positions):
+        self.type_codes = np.asarray(type_codes, dtype=np.int8)
+        self.labels = np.asarray(labels, dtype=object)
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self._index = {
+            (int(t), label): i for i, (t, label) in enumerate(zip(self.type_codes, self.labels))
+        }
+
+    def __len__(self):
+        return len(self.labels)
+
+    def lookup(self, type_code, label):
+        return self._index.get((int(type_code), label))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp_path, type_codes=self.type_codes,
+                 labels=self.labels.astype(str), positions=self.positions)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['type_codes'], data['labels'].astype(object), data['positions'])
+
+
+def _node_labels(G, features):
+    if getattr(G, 'is_compact', False):
+        return G.labels
+    return np.array([G.nodes[n].get('label', n) for n in features.nodes], dtype=object)
+
+
+def _fingerprint(G):
+    # Estrutura do grafo inteiro (tipos, labels e CSR do feature store, tudo o
+    # que build_anchor_table lê): a coocorrência via títulos muda as posições
+    # mesmo quando o conjunto de atributos é o mesmo
+    features = get_features(G)
+    structure = array_fingerprint(
+        (features.type_code, features.indptr, features.indices), _node_labels(G, features).tolist()
+    )
+    key = f"v{LAYOUT_VERSION}:{SEED}:{structure}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+@timed('build_anchor_layout')
+def build_anchor_table(G, iterations=100):
+    """
+    Layout global dos atributos (ver comentário do módulo).
+    """
+    features = get_features(G)
+    type_code = np.asarray(features.type_code)
+    labels = _node_labels(G, features)
+    n = len(type_code)
+
+    hubs = np.flatnonzero((type_code != _TITLE) & (type_code != _PERSON))
+    people = np.flatnonzero(type_code == _PERSON)
+    titles = np.flatnonzero(type_code == _TITLE)
+    hub_of = np.full(n, -1, dtype=np.int64)
+    hub_of[hubs] = np.arange(len(hubs))
+
+    owner = np.repeat(np.arange(n), features.degree)
+    neighbor = np.asarray(features.indices, dtype=np.int64)
+
+    # Coocorrência dos hubs: títulos em comum + arestas diretas entre hubs
+    is_title = type_code[owner] == _TITLE
+    to_hub = hub_of[neighbor] >= 0
+    mask = is_title & to_hub
+    incidence = sp.csr_matrix(
+        (np.ones(int(mask.sum())), (owner[mask], hub_of[neighbor[mask]])),
+        shape=(n, len(hubs))
+    )
+    title_hub = incidence[titles]
+    cooc = (title_hub.T @ title_hub).tocoo()
+
+    direct = (hub_of[owner] >= 0) & to_hub
+    pairs = sp.coo_matrix(
+        (np.ones(int(direct.sum())), (hub_of[owner[direct]], hub_of[neighbor[direct]])),
+        shape=(len(hubs), len(hubs))
+    )
+    affinity = sp.triu(cooc + pairs, k=1).tocoo()
+    weight = np.log1p(affinity.data)
+    if len(weight):
+        weight /= weight.max()
+
+    rng = np.random.default_rng(SEED)
+    hub_pos = force_layout(
+        rng.random((len(hubs), 2)), affinity.row, affinity.col, weight, iterations=iterations
+    )
+    hub_pos = _rescale(hub_pos)
+
+    # Pessoas: média dos hubs dos seus títulos + deslocamento pelo nome
+    positions = np.zeros((n, 2))
+    positions[hubs] = hub_pos
+    if len(people):
+        person_row = np.full(n, -1, dtype=np.int64)
+        person_row[people] = np.arange(len(people))
+        mask = (person_row[owner] >= 0) & (type_code[neighbor] == _TITLE)
+        person_title = sp.csr_matrix(
+            (np.ones(int(mask.sum())), (person_row[owner[mask]], neighbor[mask])),
+            shape=(len(people), n)
+        )
+        person_hub = person_title @ incidence
+        totals = np.asarray(person_hub.sum(axis=1)).ravel()
+        mean = (person_hub @ hub_pos) / np.maximum(totals, 1)[:, None]
+        positions[people] = mean + _stable_jitter(labels[people], PERSON_JITTER)
+
+    anchors = np.concatenate([hubs, people])
+    return AnchorTable(type_code[anchors], labels[anchors], positions[anchors])
+
+
+def _load_or_build_anchor_table(G, cache_dir=None):
+    path = os.path.join(cache_dir or CACHE_DIR, f"anchors-{_fingerprint(G)}.npz")
+
+    if os.path.exists(path):
+        try:
+            return AnchorTable.load(path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    table = build_anchor_table(G)
+    try:
+        table.save(path)
+    except OSError as exc:
+        print(f"Aviso: layout não salvo em cache ({exc})")
+    return table
+
+
+def get_anchor_table(G):
+    """
+    Tabela de posições dos atributos: em memória por versão do grafo e em
+    disco por conteúdo (mesmo grafo => mesmo arquivo entre execuções).
+    """
+    return get_derived(G, 'anchor_layout', _load_or_build_anchor_table)
+
+
+# Layout de uma visualização
+
+def layout_nodes(G, nodes, iterations=30):
+    """
+    {nó: (x, y)} para os nós da visualização. Atributos ficam na posição
+    global; títulos começam na média dos seus atributos e só eles se movem.
+    """
+    nodes = list(nodes)
+    if not nodes:
+        return {}
+
+    with timer('layout.place'):
+        table = get_anchor_table(G)
+        features = get_features(G)
+        type_code = np.asarray(features.type_code)
+        labels = _node_labels(G, features)
+        ids = features.ids(nodes)
+
+        pos = np.zeros((len(nodes), 2))
+        fixed = np.zeros(len(nodes), dtype=bool)
+        for i, node in enumerate(ids.tolist()):
+            if type_code[node] == _TITLE:
+                continue
+            j = table.lookup(type_code[node], labels[node])
+            if j is not None:
+                pos[i] = table.positions[j]
+                fixed[i] = True
+
+        # Títulos (e atributos fora da tabela): média dos atributos vizinhos no grafo todo
+        free = np.flatnonzero(~fixed)
+        if len(free):
+            neighbor, owner = features.gather(ids[free])
+            anchor_pos = np.full((len(neighbor), 2), np.nan)
+            for r, m in enumerate(neighbor.tolist()):
+                if type_code[m] != _TITLE:
+                    j = table.lookup(type_code[m], labels[m])
+                    if j is not None:
+                        anchor_pos[r] = table.positions[j]
+            valid = ~np.isnan(anchor_pos[:, 0])
+            counts = np.bincount(owner[valid], minlength=len(free))
+            for axis in (0, 1):
+                sums = np.bincount(owner[valid], weights=anchor_pos[valid, axis], minlength=len(free))
+                pos[free, axis] = np.divide(sums, counts, out=np.zeros(len(free)), where=counts > 0)
+            pos[free] += _stable_jitter(labels[ids[free]], TITLE_JITTER)
+
+    with timer('layout.relax'):
+        if len(free) and iterations:
+            local = {node: i for i, node in enumerate(ids.tolist())}
+            src, dst = [], []
+            for i, node in enumerate(ids.tolist()):
+                for m in features.neighbors(node).tolist():
+                    j = local.get(m)
+                    if j is not None and i < j:
+                        src.append(i)
+                        dst.append(j)
+            k = TITLE_JITTER * 2 if fixed.any() else None
+            pos = force_layout(pos, src, dst, fixed=fixed if fixed.any() else None,
+                               iterations=iterations, k=k)
+
+    return {node: (float(x), float(y)) for node, (x, y) in zip(nodes, pos)}
@@ -1,43 +1,73 @@
-import networkx as nx
-from collections import defaultdict
+import numpy as np
+import scipy.sparse as sp
 
-def project_country_genre(G):
+from src.graph_state import VersionedGraph
+from src.instrumentation import timed
+
+
+def _incidence(G, nodes, title_index):
+    """
+    Matriz esparsa nós × títulos (1 onde há aresta com um título).
+    """
+    rows, cols = [], []
+    for i, node in enumerate(nodes):
+        for neighbor in G.neighbors(node):
+            j = title_index.get(neighbor)
+            if j is not None:
+                rows.append(i)
+                cols.append(j)
+
+    return sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+        shape=(len(nodes), len(title_index))
+    )
+
+
+@timed('project_country_genre')
+def project_country_genre(G, return_matrix=False):
     """
     Cria um grafo Country–Genre projetado a partir do grafo original.
     O peso da aresta representa o número de títulos compartilhados.
+
+    A projeção é o produto esparso (país × título) · (título × gênero).
+    Com return_matrix=True retorna também a matriz densa de pesos e os
+    rótulos das linhas (países) e colunas (gêneros): (H, W, countries, genres).
     """
-    H = nx.Graph()
+    titles = [n for n, d in G.nodes(data=True) if d.get("type") == "title"]
+    title_index = {n: i for i, n in enumerate(titles)}
 
-    # Mapeia filmes por país
-    country_to_titles = defaultdict(set)
-    genre_to_titles = defaultdict(set)
+    country_nodes = [n for n, d in G.nodes(data=True) if d.get("type") == "country"]
+    genre_nodes = [n for n, d in G.nodes(data=True) if d.get("type") == "genre"]
 
-    for node, data in G.nodes(data=True):
-        if data.get("type") == "country":
-            for neighbor in G.neighbors(node):
-                if G.nodes[neighbor].get("type") == "title":
-                    country_to_titles[node].add(neighbor)
+    C = _incidence(G, country_nodes, title_index)
+    T = _incidence(G, genre_nodes, title_index).T.tocsr()
 
-        elif data.get("type") == "genre":
-            for neighbor in G.neighbors(node):
-                if G.nodes[neighbor].get("type") == "title":
-                    genre_to_titles[node].add(neighbor)
+    # Mantém apenas países/gêneros com pelo menos um título
+    country_keep = np.flatnonzero(C.getnnz(axis=1))
+    genre_keep = np.flatnonzero(T.getnnz(axis=0))
+    C = C[country_keep]
+    T = T[:, genre_keep]
+    countries = [country_nodes[i] for i in country_keep]
+    genres = [genre_nodes[j] for j in genre_keep]
 
-    # Cria projeção
-    for country, titles_c in country_to_titles.items():
-        H.add_node(country, type="country", label=country)
+    W = (C @ T).tocoo()
 
-        for genre, titles_g in genre_to_titles.items():
-            intersecao = titles_c & titles_g
-            peso = len(intersecao)
+    # Cria projeção
+    H = VersionedGraph()
+    H.add_nodes_from((c, {"type": "country", "label": c}) for c in countries)
 
-            if peso > 0:
-                H.add_node(genre, type="genre", label=genre)
-                H.add_edge(country, genre, weight=peso)
+    for i, j, peso in zip(W.row.tolist(), W.col.tolist(), W.data.tolist()):
+        if peso > 0:
+            genre = genres[j]
+            H.add_node(genre, type="genre", label=genre)
+            H.add_edge(countries[i], genre, weight=peso)
 
     print(
         f"Projeção criada: {H.number_of_nodes()} nós, "
         f"{H.number_of_edges()} arestas"
     )
 
+    if return_matrix:
+        return H, W.toarray(), np.array(countries, dtype=object), np.array(genres, dtype=object)
+
     return H
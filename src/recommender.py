@@ -1,7 +1,11 @@
-import math
-import networkx as nx
-from collections import defaultdict
-from difflib import SequenceMatcher
+import numpy as np
+
+from src.features import TYPE_CODES, adamic_factors, get_features
+from src.graph_state import graph_version
+from src.instrumentation import incr, observe, timer
+from src.result_cache import ResultCache, freeze
+from src.text_similarity import ENGINES, get_text_index, text_similarity_many
+from src.title_index import get_title_index
 
 
 # Configuração de pesos para as fórmulas
@@ -10,17 +14,82 @@ WEIGHT_PERSON = 0.7
 WEIGHT_GENRE = 0.4     # Gêneros são importantes
 WEIGHT_COUNTRY = 0.05  # País influencia muito pouco
 
+# Fatores do Adamic-Adar por tipo de vizinho (demais tipos = 1.0)
+ADAMIC_PERSON = 5.0    # Pessoas em comum são o sinal mais forte
+ADAMIC_COUNTRY = 0.1
+
 # Pesos de mistura das métricas finais
 ALPHA_ADAMIC = 0.4     # Peso da Raridade das conexões
 BETA_JACCARD = 0.4     # Peso da Sobreposição de atributos
 GAMMA_TEXT = 0.2       # Peso do Nome (Bônus de Franquia)
 
+# Escalas das métricas na fórmula final e boost de franquia
+JACCARD_SCALE = 10.0
+TEXT_SCALE = 5.0
+FRANCHISE_THRESHOLD = 0.6  # similaridade de nome acima disso...
+FRANCHISE_BOOST = 8.0      # ...é multiplicada por este fator
+
+# Motor de similaridade textual: 'sequence' (difflib, calibrado com FRANCHISE_THRESHOLD)
+# ou 'ngram' (índice de bigramas, mais rápido; Dice dá outra escala de notas)
+TEXT_SIMILARITY_ENGINE = "sequence"
+
+# Poda de candidatos (None = busca exaustiva). Ver DEFAULT_PRUNING.
+PRUNING = None
+
+DEFAULT_PRUNING = {
+    "max_degree": None,                           # vizinhos com grau acima disso não geram candidatos
+    "fanout": {"country": 200, "genre": 1000},    # máx. de candidatos novos por hub de cada tipo
+    "early_stop": True,                           # para quando o limite superior não alcança o top-N
+    "block_size": 64,                             # 1ª rodada do early stop (dobra a cada rodada)
+}
+
+# Cache de resultados de recommend_titles (LRU; TTL em segundos, None = sem expiração)
+CACHE_SIZE = 1024
+CACHE_TTL = None
+
+RESULT_CACHE = ResultCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+def weights_key():
+    """
+    Configuração que afeta o ranking (pesos, motor de texto, fatores do
+    Adamic-Adar e poda padrão). Faz parte da chave do cache de resultados.
+    """
+    return (
+        WEIGHT_PERSON, WEIGHT_GENRE, WEIGHT_COUNTRY,
+        ALPHA_ADAMIC, BETA_JACCARD, GAMMA_TEXT,
+        JACCARD_SCALE, TEXT_SCALE, FRANCHISE_THRESHOLD, FRANCHISE_BOOST,
+        TEXT_SIMILARITY_ENGINE, tuple(adamic_factors()), freeze(PRUNING),
+    )
+
+def result_key(title_label, G, top_n=5, engine="networkx", pruning=None):
+    """
+    Chave do cache de resultados: muda quando o grafo ou os pesos mudam.
+    """
+    return (title_label, top_n, engine, freeze(pruning), weights_key(), graph_version(G))
+
+def cache_stats():
+    """
+    Contadores do cache de resultados (hits, misses, evictions, ...).
+    """
+    return RESULT_CACHE.stats()
+
 def get_text_similarity(a, b):
     """
     Calcula a similaridade de string (0.0 a 1.0).
     """
     if not a or not b: return 0.0
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+    return ENGINES[TEXT_SIMILARITY_ENGINE](a, b)
+
+def franchise_text_scores(G, title_label, candidate_labels, index=None):
+    """
+    Similaridade de nome já com o boost de franquia (> FRANCHISE_THRESHOLD => ×FRANCHISE_BOOST),
+    calculada de uma vez para os candidatos que passaram na trava estrutural.
+    """
+    if index is None and TEXT_SIMILARITY_ENGINE == "ngram":
+        index = get_text_index(G)
+
+    scores = text_similarity_many(TEXT_SIMILARITY_ENGINE, title_label, candidate_labels, index)
+    return [s * FRANCHISE_BOOST if s > FRANCHISE_THRESHOLD else s for s in scores.tolist()]
 
 def compute_weighted_jaccard(G, node_a, node_b):
     """
@@ -30,104 +99,366 @@ def compute_weighted_jaccard(G, node_a, node_b):
     neighbors_a = set(G.neighbors(node_a))
     neighbors_b = set(G.neighbors(node_b))
     
-    intersection = neighbors_a & neighbors_b
     union = neighbors_a | neighbors_b
     
     if not union: return 0.0
-    
-    numerator = 0.0
-    denominator = 0.0
-    
-    def get_node_weight(n):
-        tipo = G.nodes[n].get("type")
-        if tipo == "person": return WEIGHT_PERSON
-        if tipo == "genre": return WEIGHT_GENRE
-        if tipo == "country": return WEIGHT_COUNTRY
-        return 0.1
-
-    for n in intersection:
-        numerator += get_node_weight(n)
-        
-    for n in union:
-        denominator += get_node_weight(n)
-        
+
+    # Pesos por tipo vêm do feature store (sem lookup de atributos por nó)
+    features = get_features(G)
+    denominator = features.type_weight[features.ids(union)].sum()
+
     if denominator == 0: return 0.0
-    return numerator / denominator
+    if neighbors_a == neighbors_b: return 1.0
+
+    numerator = features.type_weight[features.ids(neighbors_a & neighbors_b)].sum()
+    return float(numerator / denominator)
 
 def compute_adamic_adar(G, node_a, node_b):
     """
     Score baseado na raridade dos vizinhos em comum.
     """
-    common_neighbors = list(nx.common_neighbors(G, node_a, node_b))
-    score = 0.0
-    
-    for neighbor in common_neighbors:
-        degree = G.degree(neighbor)
-        tipo = G.nodes[neighbor].get("type")
-        
-        if degree <= 1: continue
-            
-        weight_factor = 1.0
-        if tipo == "person": weight_factor = 5.0
-        elif tipo == "country": weight_factor = 0.1
-        
-        score += weight_factor * (1.0 / math.log(degree))
-        
-    return score
-
-def recommend_titles(title_label, G, top_n=5):
-    # 1. Localizar nó de origem
-    title_node = None
-    for n, d in G.nodes(data=True):
-        if d.get("type") == "title" and d.get("label") == title_label:
-            title_node = n
+    common_neighbors = set(G.neighbors(node_a)) & set(G.neighbors(node_b))
+    if not common_neighbors: return 0.0
+
+    # adamic_weight = fator do tipo × 1/log(grau), já zerado para grau <= 1
+    features = get_features(G)
+    return float(features.adamic_weight[features.ids(common_neighbors)].sum())
+
+def top_n_indices(scores, top_n):
+    """
+    Índices dos top_n maiores scores, em ordem decrescente (empates pela posição).
+    """
+    if top_n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(scores) > top_n:
+        part = np.argpartition(-scores, top_n - 1)[:top_n]
+    else:
+        part = np.arange(len(scores))
+    order = np.lexsort((part, -scores[part]))
+    return part[order]
+
+def score_candidates(G, title_node, title_label, exclude=None):
+    """
+    Calcula o score final de todos os candidatos de um título a partir do
+    feature store. Retorna (ids dos candidatos, scores).
+    exclude: vizinhos do título tratados como ausentes (avaliação leave-one-out).
+    """
+    features = get_features(G)
+    source = features.node_id[title_node]
+    w_source = features.neighbor_weight[source]
+    d_source = features.set_size[source]
+
+    # 2. Identificar Candidatos (vizinhos dos vizinhos, apenas títulos)
+    with timer('recommend.candidates'):
+        via = features.neighbors(source)
+        if exclude:
+            hidden = np.isin(via, features.ids(n for n in exclude if n in features.node_id))
+            w_source = w_source - features.type_weight[via[hidden]].sum()
+            d_source = d_source - int(hidden.sum())
+            via = via[~hidden]
+        candidates, owner = features.gather(via)
+        via = via[owner]
+
+        mask = (candidates != source) & (features.type_code[candidates] == TYPE_CODES['title'])
+        candidates, via = candidates[mask], via[mask]
+        observe('recommend.neighbors_touched', len(candidates))
+        if len(candidates) == 0:
+            observe('recommend.candidates', 0)
+            return candidates, np.zeros(0)
+
+        candidates, slot = np.unique(candidates, return_inverse=True)
+        observe('recommend.candidates', len(candidates))
+
+    # 3. Calcular Métricas
+    # A. Adamic-Adar (Estrutura Topológica)
+    with timer('recommend.adamic_adar'):
+        aa_score = np.bincount(slot, weights=features.adamic_weight[via], minlength=len(candidates))
+
+    # B. Weighted Jaccard (Similaridade de Conteúdo)
+    with timer('recommend.jaccard'):
+        intersection = np.bincount(slot, weights=features.type_weight[via], minlength=len(candidates))
+        common = np.bincount(slot, minlength=len(candidates))
+        union = w_source + features.neighbor_weight[candidates] - intersection
+        jac_score = np.divide(intersection, union, out=np.zeros(len(candidates)), where=union > 0)
+
+        # Vizinhanças idênticas => exatamente 1.0 (evita erro de arredondamento na trava)
+        same = (common == d_source) & (features.set_size[candidates] == d_source)
+        jac_score[same & (union > 0)] = 1.0
+
+    # C. Text Similarity (Semântica/Nome)
+    # Se a estrutura não bate, a semelhança de nome é ignorada (evita falsos positivos),
+    # então só calculamos o texto de quem passou na trava estrutural.
+    threshold_estrutural = 1.0  # Mínimo de 100% de sobreposição ponderada
+    text_score = np.zeros(len(candidates))
+    gated = np.flatnonzero(jac_score >= threshold_estrutural)
+    observe('recommend.text_gated', len(gated))
+    if len(gated):
+        with timer('recommend.text'):
+            nodes = features.nodes
+            text_score[gated] = franchise_text_scores(
+                G, title_label, [G.nodes[nodes[c]]["label"] for c in candidates[gated]]
+            )
+
+    # 4. Fórmula Final
+    final_score = (aa_score * ALPHA_ADAMIC) + \
+                  (jac_score * JACCARD_SCALE * BETA_JACCARD) + \
+                  (text_score * TEXT_SCALE * GAMMA_TEXT)
+
+    return candidates, final_score
+
+def _resolve_pruning(pruning):
+    if pruning is None:
+        pruning = PRUNING
+    if pruning is True:
+        return dict(DEFAULT_PRUNING)
+    if not pruning:
+        return None
+    return {**DEFAULT_PRUNING, **pruning}
+
+def exact_scores(G, features, source, title_label, candidates):
+    """
+    Score exato de um lote de candidatos, calculado pelo lado do candidato
+    (adjacência do candidato ∩ vizinhos da origem).
+    """
+    source_neighbors = features.neighbors(source)
+    adj, slot = features.gather(candidates)
+
+    shared = np.isin(adj, source_neighbors)
+    adj, slot = adj[shared], slot[shared]
+
+    aa_score = np.bincount(slot, weights=features.adamic_weight[adj], minlength=len(candidates))
+    intersection = np.bincount(slot, weights=features.type_weight[adj], minlength=len(candidates))
+    common = np.bincount(slot, minlength=len(candidates))
+
+    union = features.neighbor_weight[source] + features.neighbor_weight[candidates] - intersection
+    jac_score = np.divide(intersection, union, out=np.zeros(len(candidates)), where=union > 0)
+    same = (common == features.set_size[source]) & (features.set_size[candidates] == features.set_size[source])
+    jac_score[same & (union > 0)] = 1.0
+
+    text_score = np.zeros(len(candidates))
+    gated = np.flatnonzero(jac_score >= 1.0)
+    if len(gated):
+        nodes = features.nodes
+        text_score[gated] = franchise_text_scores(
+            G, title_label, [G.nodes[nodes[c]]["label"] for c in candidates[gated]]
+        )
+
+    return (aa_score * ALPHA_ADAMIC) + \
+           (jac_score * JACCARD_SCALE * BETA_JACCARD) + \
+           (text_score * TEXT_SCALE * GAMMA_TEXT)
+
+def score_candidates_pruned(G, title_node, title_label, top_n, pruning, stats=None):
+    """
+    Versão podada de score_candidates:
+    - vizinhos acima de max_degree não geram candidatos;
+    - hubs de um tipo com orçamento em 'fanout' geram no máximo N candidatos novos
+      (os de maior limite superior do Jaccard, min/max dos pesos das vizinhanças);
+    - com early_stop, os candidatos são avaliados em ordem de limite superior
+      e a busca para quando nenhum restante pode entrar no top-N.
+    Os scores retornados são exatos; a poda só deixa candidatos de fora.
+    """
+    features = get_features(G)
+    source = features.node_id[title_node]
+    title_code = TYPE_CODES['title']
+    type_names = {code: name for name, code in TYPE_CODES.items()}
+
+    max_degree = pruning.get("max_degree")
+    fanout = pruning.get("fanout") or {}
+
+    w_source = features.neighbor_weight[source]
+    open_neighbors, hubs, extra = [], [], []
+    for n in features.neighbors(source).tolist():
+        degree = features.degree[n]
+        budget = fanout.get(type_names.get(int(features.type_code[n])))
+
+        if max_degree is not None and degree > max_degree:
+            hubs.append(n)
+        elif budget is not None and degree > budget:
+            hubs.append(n)
+            # Só os títulos do hub com vizinhança de peso mais próximo ao da
+            # origem (maior Jaccard possível) entram como candidatos novos
+            titles = features.neighbors(n)
+            titles = titles[(titles != source) & (features.type_code[titles] == title_code)]
+            w = features.neighbor_weight[titles]
+            jac_ub = np.minimum(w, w_source) / np.maximum(np.maximum(w, w_source), 1e-300)
+            extra.append(titles[np.sort(top_n_indices(jac_ub, budget))])
+        else:
+            open_neighbors.append(n)
+
+    # Contribuições exatas dos vizinhos abertos (via = -1 marca candidatos vindos de hubs)
+    via = np.asarray(open_neighbors, dtype=np.int64)
+    cand, owner = features.gather(via)
+    via = via[owner]
+    if extra:
+        extra = np.concatenate(extra)
+        cand = np.concatenate([cand, extra])
+        via = np.concatenate([via, np.full(len(extra), -1, dtype=np.int64)])
+
+    mask = (cand != source) & (features.type_code[cand] == title_code)
+    cand, via = cand[mask], via[mask]
+
+    if stats is not None:
+        stats["pruned_neighbors"] = len(hubs)
+        stats["neighbors_touched"] = len(cand)
+    observe('recommend.neighbors_touched', len(cand))
+
+    if len(cand) == 0:
+        if stats is not None:
+            stats["candidates"] = stats["scored"] = 0
+        return cand, np.zeros(0)
+
+    candidates, slot = np.unique(cand, return_inverse=True)
+    from_open = via >= 0
+    aa_open = np.bincount(slot[from_open], weights=features.adamic_weight[via[from_open]],
+                          minlength=len(candidates))
+    inter_open = np.bincount(slot[from_open], weights=features.type_weight[via[from_open]],
+                             minlength=len(candidates))
+    common_open = np.bincount(slot[from_open], minlength=len(candidates))
+
+    if stats is not None:
+        stats["candidates"] = len(candidates)
+    observe('recommend.candidates', len(candidates))
+
+    if not pruning.get("early_stop"):
+        scores = exact_scores(G, features, source, title_label, candidates)
+        if stats is not None:
+            stats["scored"] = len(candidates)
+        return candidates, scores
+
+    # Limite superior: hubs contribuem no máximo com todo o seu peso
+    hubs = np.asarray(hubs, dtype=np.int64)
+    w_cand = features.neighbor_weight[candidates]
+
+    aa_ub = aa_open + features.adamic_weight[hubs].sum()
+    inter_ub = np.minimum(inter_open + features.type_weight[hubs].sum(), np.minimum(w_source, w_cand))
+    union_lb = w_source + w_cand - inter_ub
+    jac_ub = np.divide(inter_ub, union_lb, out=np.ones(len(candidates)), where=union_lb > 0)
+    jac_ub = np.minimum(jac_ub, 1.0)
+
+    # Bônus de texto só é possível com vizinhança idêntica
+    text_possible = (features.set_size[candidates] == features.set_size[source]) & \
+                    (common_open == len(open_neighbors))
+    upper = (aa_ub * ALPHA_ADAMIC) + (jac_ub * JACCARD_SCALE * BETA_JACCARD) + \
+            (text_possible * max(FRANCHISE_BOOST, 1.0) * TEXT_SCALE * GAMMA_TEXT)
+
+    order = np.argsort(-upper, kind="stable")
+    block = max(int(pruning.get("block_size", 64)), top_n)
+
+    # Rodadas com tamanho dobrando; para quando o melhor limite restante
+    # não supera o N-ésimo melhor score exato já calculado
+    scored_idx, scored = [], []
+    threshold = -np.inf
+    start = 0
+    while start < len(order):
+        idx = order[start:start + block]
+        if upper[idx[0]] <= threshold:
             break
+        scored_idx.append(idx)
+        scored.append(exact_scores(G, features, source, title_label, candidates[idx]))
+        start += block
+        block *= 2
+
+        all_scores = np.concatenate(scored)
+        if len(all_scores) >= top_n:
+            threshold = np.partition(all_scores, len(all_scores) - top_n)[len(all_scores) - top_n]
+
+    idx = np.concatenate(scored_idx)
+    if stats is not None:
+        stats["scored"] = len(idx)
+
+    return candidates[idx], np.concatenate(scored)
+
+def recommend_titles(title_label, G, top_n=5, engine="networkx", pruning=None, stats=None,
+                     use_cache=True, exclude_neighbors=None):
+    """
+    exclude_neighbors: nós vizinhos do título ignorados no cálculo, como se a
+    aresta não existisse (avaliação offline; motores 'networkx' e 'sparse',
+    sem poda e sem cache).
+    """
+    if exclude_neighbors:
+        if engine not in ("networkx", "sparse") or _resolve_pruning(pruning):
+            raise ValueError("exclude_neighbors requer o motor 'networkx' ou 'sparse', sem poda.")
+        with timer(f'recommend_titles.{engine}'):
+            return _recommend_titles(title_label, G, top_n, engine, False, stats, exclude_neighbors)
+
+    with timer(f'recommend_titles.{engine}'):
+        # Resultados repetidos vêm do cache. A chave inclui a versão do grafo
+        # (reconstrução ou atualização incremental invalidam) e os pesos atuais.
+        if use_cache and stats is None:
+            key = result_key(title_label, G, top_n, engine, pruning)
+            cached = RESULT_CACHE.get(key)
+            if cached is not None:
+                incr('recommend.cache_hits')
+                return list(cached)
+
+            incr('recommend.cache_misses')
+            result = _recommend_titles(title_label, G, top_n, engine, pruning)
+            RESULT_CACHE.put(key, tuple(result))
+            return result
+
+        return _recommend_titles(title_label, G, top_n, engine, pruning, stats)
+
+def _recommend_titles(title_label, G, top_n, engine, pruning, stats=None, exclude=None):
+    # Índice top-K pré-calculado (similarity_index); top_n acima de K usa o cálculo exato
+    if engine == "index":
+        from src.similarity_index import get_similarity_index
+        index = get_similarity_index(G)
+        if top_n <= index.k:
+            return index.recommend(title_label, top_n)
+
+    # Motor opcional: matriz de incidência esparsa (mesmo ranking)
+    if engine == "sparse":
+        from src.sparse_recommender import get_compiled, recommend_titles_sparse
+        return recommend_titles_sparse(title_label, get_compiled(G), top_n, exclude)
+
+    # 1. Localizar nó de origem (índice label -> nó, O(1))
+    title_node = get_title_index(G).lookup(title_label)
 
     if title_node is None:
         return []
 
-    final_scores = defaultdict(float)
-    
-    # 2. Identificar Candidatos
-    candidate_set = set()
-    source_neighbors = list(G.neighbors(title_node))
-    
-    for neighbor in source_neighbors:
-        for candidate in G.neighbors(neighbor):
-            if candidate != title_node and G.nodes[candidate].get("type") == "title":
-                candidate_set.add(candidate)
-    
-    # 3. Calcular Métricas
-    for candidate in candidate_set:
-        candidate_label = G.nodes[candidate]["label"]
-        
-        # A. Adamic-Adar (Estrutura Topológica)
-        aa_score = compute_adamic_adar(G, title_node, candidate)
-        
-        # B. Weighted Jaccard (Similaridade de Conteúdo)
-        jac_score = compute_weighted_jaccard(G, title_node, candidate)
-        
-        # C. Text Similarity (Semântica/Nome)
-        text_score = get_text_similarity(title_label, candidate_label)
-        
-        threshold_estrutural = 1.0  # Mínimo de 100% de sobreposição ponderada
-        
-        if jac_score < threshold_estrutural:
-            # Se a estrutura não bate, ignora a semelhança de nome (evita falsos positivos)
-            text_score = 0.0
-        else:
-            # Se passou na trava estrutural, aplica o boost de franquia se merecer
-            if text_score > 0.6:
-                text_score *= 8.0 
-        
-        # 4. Fórmula Final
-        final_score = (aa_score * ALPHA_ADAMIC) + \
-                      (jac_score * 10.0 * BETA_JACCARD) + \
-                      (text_score * 5.0 * GAMMA_TEXT)
-                      
-        final_scores[candidate] = final_score
+    pruning = _resolve_pruning(pruning)
+    if pruning:
+        candidates, scores = score_candidates_pruned(G, title_node, title_label, top_n, pruning, stats)
+    else:
+        candidates, scores = score_candidates(G, title_node, title_label, exclude)
+        if stats is not None:
+            stats["candidates"] = stats["scored"] = len(candidates)
 
     # 5. Ordenação
-    ranking = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-    
-    return [(G.nodes[n]["label"], round(score, 4)) for n, score in ranking[:top_n]]
\ No newline at end of file
+    with timer('recommend.ranking'):
+        nodes = get_features(G).nodes
+        best = top_n_indices(scores, top_n)
+
+    return [(G.nodes[nodes[candidates[k]]]["label"], round(float(scores[k]), 4)) for k in best]
+
+def compare_pruning(title_label, G, top_n=5, pruning=True):
+    """
+    Compara o modo podado com o exaustivo para um título: quantos candidatos
+    foram pulados e o quanto o top-N mudou.
+    """
+    exhaustive_stats, pruned_stats = {}, {}
+    exhaustive = recommend_titles(title_label, G, top_n, pruning=False, stats=exhaustive_stats)
+    pruned = recommend_titles(title_label, G, top_n, pruning=pruning, stats=pruned_stats)
+
+    rank_exh = {t: i for i, (t, _) in enumerate(exhaustive)}
+    rank_pru = {t: i for i, (t, _) in enumerate(pruned)}
+    overlap = len(rank_exh.keys() & rank_pru.keys())
+
+    # Deslocamento médio de posição (itens ausentes contam como posição top_n)
+    titles = rank_exh.keys() | rank_pru.keys()
+    displacement = sum(abs(rank_exh.get(t, top_n) - rank_pru.get(t, top_n)) for t in titles)
+
+    best = sum(s for _, s in exhaustive)
+    kept = sum(s for _, s in pruned)
+
+    return {
+        "candidates": exhaustive_stats.get("candidates", 0),
+        "candidates_pruned": pruned_stats.get("candidates", 0),
+        "skipped": exhaustive_stats.get("candidates", 0) - pruned_stats.get("candidates", 0),
+        "scored": pruned_stats.get("scored", 0),
+        "pruned_neighbors": pruned_stats.get("pruned_neighbors", 0),
+        "overlap": overlap / top_n if top_n else 1.0,
+        "rank_displacement": displacement / len(titles) if titles else 0.0,
+        "score_ratio": kept / best if best else 1.0,
+    }
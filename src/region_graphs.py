@@ -1,18 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.graph_builder import _ensure_edge_tables, region_graph_from_counts
+from src.instrumentation import timed
+from src.workers import WORKER_STATE, worker_pool
+
+# Grafos País × Gênero de várias regiões de uma vez.
+# As contagens de todas as regiões saem de uma única passada pelas tabelas
+# explodidas (país -> região via merge, depois groupby); com workers > 1 as
+# linhas são divididas em faixas contadas em processos separados e somadas.
+
+
 def filter_region_exact(df, region_countries):
     """
     Mantém apenas países pertencentes à região,
     mesmo em casos de coprodução.
     """
-    df = df.copy()
-
-    def keep_region_only(country_field):
-        countries = [c.strip() for c in country_field.split(',') if c.strip()]
-        region_only = [c for c in countries if c in region_countries]
-        return ', '.join(region_only)
+    countries = df['country'].fillna('').astype(str).str.split(',')
+    countries = countries.reset_index(drop=True).explode().str.strip()
+    countries = countries[countries.isin(set(region_countries))]
 
-    df['country'] = df['country'].apply(keep_region_only)
+    # Reagrupa por linha, na ordem original dos países
+    joined = countries.groupby(level=0, sort=True).agg(', '.join)
 
     # Remove filmes que não ficaram com países da região
-    df = df[df['country'] != '']
+    df = df.iloc[joined.index.to_numpy()].copy()
+    df['country'] = joined.to_numpy()
 
     return df
+
+
+def region_table(regions):
+    """
+    Tabela (country, region). Um país pode pertencer a mais de uma região.
+    """
+    return pd.DataFrame(
+        [(country, name) for name, countries in regions.items() for country in countries],
+        columns=['country', 'region']
+    ).drop_duplicates()
+
+
+def region_country_genre_counts(edges, regions, rows=None):
+    """
+    Contagens (region, country, genre, weight) de todas as regiões.
+    rows=(início, fim) restringe a uma faixa de linhas do catálogo.
+    """
+    title_country = edges['title_country'][['row', 'country']]
+    title_genre = edges['title_genre'][['row', 'genre']]
+    if rows is not None:
+        start, stop = rows
+        title_country = title_country[title_country['row'].between(start, stop - 1)]
+        title_genre = title_genre[title_genre['row'].between(start, stop - 1)]
+
+    # Países como object: o merge com a tabela de regiões não depende de category
+    title_country = title_country.assign(country=title_country['country'].astype(object))
+    located = title_country.merge(region_table(regions), on='country', how='inner', sort=False)
+
+    pairs = located.merge(title_genre, on='row', how='inner', sort=False)
+    counts = pairs.groupby(['region', 'country', 'genre'], sort=False, observed=True).size()
+    return counts.rename('weight').reset_index()
+
+
+def _count_rows(rows):
+    return region_country_genre_counts(WORKER_STATE['edges'], WORKER_STATE['regions'], rows)
+
+
+def _parallel_counts(edges, regions, workers):
+    n_rows = int(edges['title_country']['row'].max()) + 1 if len(edges['title_country']) else 0
+    bounds = np.linspace(0, n_rows, workers + 1).astype(int)
+    ranges = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    with worker_pool(workers, edges=edges, regions=regions) as pool:
+        # map preserva a ordem das faixas => mesma ordem de primeira ocorrência
+        parts = pool.map(_count_rows, ranges)
+
+    counts = pd.concat(parts, ignore_index=True)
+    counts = counts.groupby(['region', 'country', 'genre'], sort=False, observed=True)['weight'].sum()
+    return counts.reset_index()
+
+
+@timed('build_region_graphs')
+def build_region_graphs(df, regions, min_edge_weight=3, edges=None, workers=1):
+    """
+    Um grafo País × Gênero por região ({nome: conjunto de países}).
+    Mesma semântica de build_region_country_genre_graph: arestas com peso
+    >= min_edge_weight, normalizadas pelo maior peso da região.
+    workers > 1 divide a contagem entre processos (None = nº de CPUs).
+    """
+    edges = _ensure_edge_tables(df, edges)
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(regions) > 0:
+        counts = _parallel_counts(edges, regions, workers)
+    else:
+        counts = region_country_genre_counts(edges, regions)
+
+    by_region = {name: part for name, part in counts.groupby('region', sort=False)}
+
+    graphs = {}
+    for name, countries in regions.items():
+        region_counts = by_region.get(name, counts.iloc[:0])[['country', 'genre', 'weight']]
+        G = region_graph_from_counts(region_counts, countries, min_edge_weight)
+        print(f"Grafo Regional '{name}' ({len(countries)} países): "
+              f"{G.number_of_nodes()} nós, {G.number_of_edges()} arestas.")
+        graphs[name] = G
+
+    return graphs
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Cache de resultados (LRU com TTL opcional), usado por recommend_titles.
+# A invalidação é feita pela chave: quem usa o cache inclui nela a versão
+# do grafo e a configuração de pesos, então entradas antigas simplesmente
+# deixam de ser encontradas e saem pelo LRU.
+
+
+def freeze(value):
+    """
+    Converte dicts/listas/sets em tuplas ordenadas (para usar como chave).
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(freeze(v) for v in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class ResultCache:
+    """
+    - maxsize: nº máximo de entradas (a menos usada recentemente sai primeiro)
+    - ttl:     segundos de validade de cada entrada (None = sem expiração)
+    Contadores: hits, misses, evictions (por tamanho) e expirations (por TTL).
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires = entry
+            if expires is not None and self.clock() >= expires:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,426 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from contextlib import ExitStack
+from multiprocessing.pool import ThreadPool
+from urllib.parse import parse_qs, urlsplit
+
+from src.recommender import RESULT_CACHE, cache_stats, recommend_titles, result_key
+from src.sparse_recommender import get_compiled
+from src.title_index import get_title_index
+from src.workers import WORKER_STATE, worker_pool, worker_state
+
+# Serviço HTTP (asyncio, só biblioteca padrão) para busca e recomendação.
+# O grafo é carregado uma vez; o cálculo dos scores roda em um pool de
+# processos. Consultas idênticas em andamento são agrupadas (coalescing) e
+# o nº de cálculos pendentes é limitado (acima disso responde 503).
+#
+#   python -m src.service --port 8000 --workers 2
+#
+#   GET /search?q=<termo>&limit=20
+#   GET /recommend?title=<título>&top_n=5
+#   GET /health
+#   GET /stats
+
+# Limites do cabeçalho e do corpo de cada requisição (o serviço só aceita GET)
+MAX_LINE = 1 << 16          # bytes por linha (limite do StreamReader)
+MAX_HEADERS = 100
+MAX_BODY = 1 << 14
+LINGER_SECONDS = 1.0        # espera pelo resto de uma requisição recusada
+
+
+def _recommend(title, top_n):
+    G = WORKER_STATE['G']
+    return recommend_titles(title, G, top_n, engine=WORKER_STATE['engine'], use_cache=False)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _resolve(future, method, value):
+    # Roda no loop de eventos; o future pode já ter sido cancelado
+    if not future.done():
+        getattr(future, method)(value)
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    """
+    Requisição que não dá para ler até o fim: responde e fecha a conexão.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RecommendationService:
+    """
+    - workers:      processos do pool (src.workers; 0 = uma thread no próprio processo)
+    - max_pending:  máx. de cálculos em andamento/na fila antes de recusar (503)
+    - timeout:      segundos de espera por um cálculo antes de responder 504
+    """
+
+    def __init__(self, G, workers=None, engine="sparse", max_pending=64, timeout=10.0,
+                 search_limit=20, max_top_n=50):
+        self.G = G
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.engine = engine
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.search_limit = search_limit
+        self.max_top_n = max_top_n
+
+        self.pool = None
+        self._resources = None
+        self.inflight = {}
+        self.pending = 0
+        self.counters = {
+            'requests': 0, 'computed': 0, 'cache_hits': 0,
+            'coalesced': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0, 'bad_requests': 0,
+        }
+        self.started = time.time()
+
+    def start(self):
+        # Estruturas derivadas construídas antes do fork são compartilhadas
+        get_title_index(self.G)
+        if self.engine == "sparse":
+            get_compiled(self.G)
+        elif self.engine == "index":
+            from src.similarity_index import get_similarity_index
+            get_similarity_index(self.G)
+
+        self._resources = ExitStack()
+        if self.workers <= 0:
+            self._resources.enter_context(worker_state(G=self.G, engine=self.engine))
+            self.pool = self._resources.enter_context(ThreadPool(1))
+        else:
+            self.pool = self._resources.enter_context(
+                worker_pool(self.workers, G=self.G, engine=self.engine)
+            )
+
+        # Sobe os processos agora, antes do loop de eventos criar threads
+        self.pool.apply(_ping)
+
+    def close(self):
+        if self._resources is not None:
+            self._resources.close()
+            self._resources = None
+            self.pool = None
+
+    # Operações
+
+    def search(self, termo, limit=None):
+        return get_title_index(self.G).search(termo, limit or self.search_limit)
+
+    async def recommend(self, title, top_n=5):
+        key = result_key(title, self.G, top_n, self.engine)
+        cached = RESULT_CACHE.get(key)
+        if cached is not None:
+            self.counters['cache_hits'] += 1
+            return list(cached)
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counters['coalesced'] += 1
+        else:
+            if self.pending >= self.max_pending:
+                self.counters['rejected'] += 1
+                raise Overloaded()
+            future = self._submit(key, title, top_n)
+
+        try:
+            # shield: o timeout de um cliente não cancela o cálculo dos demais
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            raise
+        return list(result)
+
+    def _submit(self, key, title, top_n):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def deliver(method):
+            def callback(value):
+                try:
+                    loop.call_soon_threadsafe(_resolve, future, method, value)
+                except RuntimeError:
+                    pass  # loop já encerrado
+            return callback
+
+        self.pool.apply_async(
+            _recommend, (title, top_n),
+            callback=deliver('set_result'), error_callback=deliver('set_exception')
+        )
+        self.inflight[key] = future
+        self.pending += 1
+        self.counters['computed'] += 1
+
+        def done(f):
+            self.inflight.pop(key, None)
+            self.pending -= 1
+            if not f.cancelled() and f.exception() is None:
+                RESULT_CACHE.put(key, tuple(f.result()))
+
+        future.add_done_callback(done)
+        return future
+
+    def stats(self):
+        return {
+            **self.counters,
+            'pending': self.pending,
+            'inflight': len(self.inflight),
+            'workers': self.workers,
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'cache': cache_stats(),
+        }
+
+    # HTTP
+
+    async def dispatch(self, method, target):
+        if method != 'GET':
+            return 405, {'error': 'Método não suportado.'}
+
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == '/health':
+            return 200, {'status': 'ok'}
+
+        if url.path == '/stats':
+            return 200, self.stats()
+
+        if url.path == '/search':
+            try:
+                limit = int(params.get('limit', self.search_limit))
+            except ValueError:
+                return 400, {'error': "Parâmetro 'limit' inválido."}
+            termo = params.get('q', '')
+            return 200, {'query': termo, 'results': self.search(termo, max(1, limit))}
+
+        if url.path == '/recommend':
+            title = params.get('title')
+            if not title:
+                return 400, {'error': "Parâmetro 'title' obrigatório."}
+            try:
+                top_n = int(params.get('top_n', 5))
+            except ValueError:
+                return 400, {'error': "Parâmetro 'top_n' inválido."}
+            if not 1 <= top_n <= self.max_top_n:
+                return 400, {'error': f"'top_n' deve estar entre 1 e {self.max_top_n}."}
+
+            if get_title_index(self.G).lookup(title) is None:
+                return 404, {'error': 'Título não encontrado.', 'suggestions': self.search(title, 5)}
+
+            recs = await self.recommend(title, top_n)
+            return 200, {
+                'title': title,
+                'recommendations': [{'title': t, 'score': s} for t, s in recs],
+            }
+
+        return 404, {'error': 'Rota não encontrada.'}
+
+    async def handle(self, reader, writer):
+        """
+        Uma conexão HTTP/1.1 (com keep-alive).
+        """
+        try:
+            while True:
+                try:
+                    head = await _read_head(reader)
+                except BadRequest as e:
+                    # Sem saber onde a requisição termina, a conexão não é reaproveitada
+                    self.counters['bad_requests'] += 1
+                    writer.write(_http_response(e.status, {'error': e.message}, False))
+                    await writer.drain()
+                    await _linger(reader, writer)
+                    break
+                if head is None:
+                    break
+
+                parts, headers, length = head
+                if length:
+                    await reader.readexactly(length)
+
+                extra = {}
+                if len(parts) != 3:
+                    status, body = 400, {'error': 'Requisição inválida.'}
+                else:
+                    status, body, extra = await self._respond(parts[0], parts[1])
+
+                version = parts[2] if len(parts) == 3 else 'HTTP/1.0'
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                writer.write(_http_response(status, body, keep_alive, extra))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target):
+        self.counters['requests'] += 1
+        try:
+            status, body = await self.dispatch(method, target)
+            return status, body, {}
+        except Overloaded:
+            return 503, {'error': 'Serviço sobrecarregado, tente novamente.'}, {'Retry-After': '1'}
+        except asyncio.TimeoutError:
+            return 504, {'error': 'Tempo de cálculo excedido.'}, {}
+        except Exception as e:
+            self.counters['errors'] += 1
+            return 500, {'error': str(e)}, {}
+
+
+async def _discard(reader):
+    while await reader.read(MAX_LINE):
+        pass
+
+
+async def _linger(reader, writer):
+    # Fecha só a escrita e descarta o resto da requisição: fechar o socket com
+    # dados não lidos faz o kernel mandar RST, e o cliente perde a resposta
+    if writer.can_write_eof():
+        writer.write_eof()
+    try:
+        await asyncio.wait_for(_discard(reader), LINGER_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _read_line(reader, status, message):
+    # readline levanta ValueError quando a linha passa do limite do StreamReader
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise BadRequest(status, message)
+
+
+async def _read_head(reader):
+    """
+    Linha de requisição, cabeçalhos e tamanho do corpo; None no fim da conexão.
+    """
+    request_line = await _read_line(reader, 400, 'Linha de requisição muito longa.')
+    if not request_line:
+        return None
+
+    parts = request_line.decode('latin-1').split()
+    headers = {}
+    for n_lines in range(MAX_HEADERS + 1):
+        line = await _read_line(reader, 431, 'Cabeçalho muito longo.')
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if n_lines == MAX_HEADERS:
+            raise BadRequest(431, 'Cabeçalhos demais.')
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        # Sem o tamanho do corpo não dá para achar a próxima requisição
+        raise BadRequest(400, "Cabeçalho 'Content-Length' inválido.")
+    if length > MAX_BODY:
+        raise BadRequest(413, 'Corpo da requisição muito grande.')
+    return parts, headers, length
+
+
+_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Content Too Large', 431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout',
+}
+
+
+def _http_response(status, body, keep_alive, extra=None):
+    payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    headers = {
+        'Content-Type': 'application/json; charset=utf-8',
+        'Content-Length': str(len(payload)),
+        'Connection': 'keep-alive' if keep_alive else 'close',
+        **(extra or {}),
+    }
+    head = f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+    head += ''.join(f"{k}: {v}\r\n" for k, v in headers.items())
+    return head.encode('latin-1') + b'\r\n' + payload
+
+
+async def serve(service, host='127.0.0.1', port=8000, ready=None):
+    server = await asyncio.start_server(service.handle, host, port, backlog=1024, limit=MAX_LINE)
+
+    # Ctrl+C / SIGTERM encerram o servidor normalmente (e o pool junto)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    print(f"Serviço ouvindo em http://{host}:{port}")
+    if ready is not None:
+        ready.set()
+    async with server:
+        await stop.wait()
+
+
+def run_service(G, host='127.0.0.1', port=8000, ready=None, **options):
+    """
+    Sobe o serviço e bloqueia até Ctrl+C (ou SIGTERM).
+    """
+    service = RecommendationService(G, **options)
+    service.start()
+    try:
+        asyncio.run(serve(service, host, port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        print("\nServiço encerrado.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de busca e recomendação.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help="processos do pool (0 = sem pool)")
+    parser.add_argument('--engine', default='sparse', choices=['sparse', 'networkx', 'index'])
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    # Mesma configuração (e mesmo cache de grafos) do menu interativo
+    from src.config import CSV_PATH, INCLUIR_PESSOAS, MAX_ELENCO, MIN_TITULOS_PESSOA, REGIOES
+    from src.graph_store import load_or_build_graphs
+    from src.tuning import apply_configured_profile
+
+    apply_configured_profile()
+    graphs = load_or_build_graphs(
+        CSV_PATH, REGIOES,
+        include_people=INCLUIR_PESSOAS,
+        max_cast=MAX_ELENCO,
+        min_person_titles=MIN_TITULOS_PESSOA
+    )
+
+    run_service(
+        graphs['full'], args.host, args.port,
+        workers=args.workers, engine=args.engine,
+        max_pending=args.max_pending, timeout=args.timeout
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from src import recommender
+from src.features import TYPE_CODES, get_features
+from src.graph_state import get_derived, graph_fingerprint, set_derived
+from src.instrumentation import timed
+from src.string_arrays import decode_strings, encode_strings
+
+# Índice top-K pré-calculado (etapa offline).
+# Cada título é o conjunto ponderado dos seus atributos (mesmos pesos por
+# tipo do Jaccard ponderado). Uma MinHash ponderada (corrida exponencial:
+# min -log(U)/peso) tem probabilidade de colisão igual ao Jaccard ponderado;
+# bandas LSH das assinaturas (mais os títulos que compartilham atributos
+# raros) geram os candidatos, que são pontuados com o score exato do
+# recommender. A consulta vira uma leitura de K vizinhos.
+# O índice salvo em INDEX_DIR guarda a impressão digital do grafo e os pesos;
+# get_similarity_index só o reaproveita se ambos conferem.
+
+N_HASHES = 64
+BANDS = 32
+MAX_BUCKET = 2000        # baldes / atributos maiores (hubs) não geram candidatos
+MAX_CANDIDATES = 1000    # candidatos por título (maior score estimado) com score exato
+BLOCK_SIZE = 20000
+
+INDEX_FORMAT = 3
+INDEX_DIR = os.path.join('data', 'cache', 'similarity_index')
+
+
+def _weights_signature():
+    return json.dumps(recommender.weights_key())
+
+
+def minhash_signatures(features, titles, n_hashes=N_HASHES, seed=42, block_size=BLOCK_SIZE):
+    """
+    Assinatura MinHash ponderada de cada título: para cada hash, o atributo
+    com menor -log(U)/peso. Retorna int32 (n_titles × n_hashes); -1 = sem atributos.
+    """
+    rng = np.random.default_rng(seed)
+
+    attr_nodes = np.flatnonzero(features.type_code != TYPE_CODES['title'])
+    attr_pos = np.full(len(features.type_code), -1, dtype=np.int64)
+    attr_pos[attr_nodes] = np.arange(len(attr_nodes))
+
+    weight = features.type_weight[attr_nodes]
+    with np.errstate(divide='ignore'):
+        values = (-np.log(rng.random((len(attr_nodes), n_hashes))) / weight[:, None]).astype(np.float32)
+
+    signatures = np.full((len(titles), n_hashes), -1, dtype=np.int32)
+    no_attr = np.iinfo(np.int32).max
+
+    for start in range(0, len(titles), block_size):
+        block = titles[start:start + block_size]
+        adj, owner = features.gather(block)
+        keep = attr_pos[adj] >= 0
+        adj, owner = adj[keep], owner[keep]
+        if len(adj) == 0:
+            continue
+
+        # Segmentos contíguos por título (gather devolve agrupado pelo dono)
+        rows, seg_start, seg_len = np.unique(owner, return_index=True, return_counts=True)
+        v = values[attr_pos[adj]]
+        mins = np.minimum.reduceat(v, seg_start, axis=0)
+
+        is_min = v == np.repeat(mins, seg_len, axis=0)
+        ids = np.where(is_min, adj[:, None].astype(np.int32), no_attr)
+        sig = np.minimum.reduceat(ids, seg_start, axis=0)
+        sig[~np.isfinite(mins)] = -1
+
+        signatures[start + rows] = sig
+
+    return signatures
+
+
+def _band_buckets(signatures, bands):
+    """
+    Para cada banda: ordem dos títulos pela chave da banda e o intervalo
+    [início, fim) do balde de cada título nessa ordem.
+    """
+    n_titles, n_hashes = signatures.shape
+    rows = n_hashes // bands
+    rng = np.random.default_rng(0)
+    multipliers = rng.integers(1, 2**63 - 1, size=rows, dtype=np.uint64) | np.uint64(1)
+
+    result = []
+    for b in range(bands):
+        band = signatures[:, b * rows:(b + 1) * rows]
+        with np.errstate(over='ignore'):
+            key = (band.astype(np.uint64) * multipliers).sum(axis=1, dtype=np.uint64)
+        valid = (band >= 0).all(axis=1)
+        key[~valid] = np.uint64(2**64 - 1)
+
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        boundaries = np.flatnonzero(np.diff(sorted_key)) + 1
+        group_start = np.concatenate([[0], boundaries])
+        group_end = np.concatenate([boundaries, [n_titles]])
+        group_of = np.empty(n_titles, dtype=np.int64)
+        group_of[order] = np.repeat(np.arange(len(group_start)), group_end - group_start)
+
+        start = group_start[group_of]
+        end = group_end[group_of]
+        start[~valid] = end[~valid]  # títulos sem assinatura não têm balde
+        result.append((order, start, end))
+
+    return result
+
+
+class SimilarityIndex:
+    """
+    - labels:     label de cada título indexado
+    - neighbors:  int32 (n_titles × k), posição do vizinho em labels (-1 = vazio)
+    - scores:     float64 (n_titles × k), score exato do recommender
+    - weights:    configuração de pesos usada na construção
+    - graph:      impressão digital do grafo indexado (graph_state.graph_fingerprint)
+    """
+
+    def __init__(self, labels, neighbors, scores, weights, params=None, graph=None):
+        self.labels = labels
+        self.neighbors = neighbors
+        self.scores = scores
+        self.weights = weights
+        self.params = params or {}
+        self.graph = graph
+        self.k = neighbors.shape[1]
+
+        self.row_of = {}
+        for i, label in enumerate(labels):
+            self.row_of.setdefault(label, i)
+
+    def is_stale(self):
+        return self.weights != _weights_signature()
+
+    def recommend(self, title_label, top_n=5):
+        row = self.row_of.get(title_label)
+        if row is None:
+            return []
+
+        labels = self.labels
+        result = []
+        for j, s in zip(self.neighbors[row, :top_n].tolist(), self.scores[row, :top_n].tolist()):
+            if j < 0:
+                break
+            result.append((labels[j], round(s, 4)))
+        return result
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        blob, offsets = encode_strings(self.labels)
+        arrays = {
+            'labels_blob': blob, 'labels_offsets': offsets,
+            'neighbors': self.neighbors, 'scores': self.scores,
+        }
+        for key, arr in arrays.items():
+            np.save(os.path.join(path, f'{key}.npy'), arr)
+
+        meta = {
+            'format': INDEX_FORMAT, 'graph': self.graph,
+            'weights': self.weights, 'params': self.params,
+        }
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, graph=None):
+        """
+        Índice salvo em 'path', ou None se não existe, é de outro formato ou
+        (com graph = impressão digital esperada) foi construído para outro grafo.
+        """
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != INDEX_FORMAT:
+            return None
+        if graph is not None and meta.get('graph') != graph:
+            return None
+
+        def load(key):
+            return np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r')
+
+        labels = decode_strings(load('labels_blob'), load('labels_offsets'))
+        return cls(labels, load('neighbors'), load('scores'), meta['weights'], meta['params'], meta.get('graph'))
+
+
+@timed('build_similarity_index')
+def build_similarity_index(G, k=20, n_hashes=N_HASHES, bands=BANDS, max_bucket=MAX_BUCKET,
+                           max_candidates=MAX_CANDIDATES, seed=42):
+    """
+    Calcula os K vizinhos de cada título (candidatos por LSH, score exato).
+    """
+    start_time = time.perf_counter()
+    features = get_features(G)
+    titles = np.flatnonzero(features.type_code == TYPE_CODES['title'])
+    title_row = np.full(len(features.type_code), -1, dtype=np.int64)
+    title_row[titles] = np.arange(len(titles))
+    labels = [G.nodes[features.nodes[t]].get('label') for t in titles.tolist()]
+
+    signatures = minhash_signatures(features, titles, n_hashes, seed)
+    buckets = _band_buckets(signatures, bands)
+
+    neighbors = np.full((len(titles), k), -1, dtype=np.int32)
+    scores = np.zeros((len(titles), k))
+
+    # Prioridade dos candidatos ~ score estimado: colisões LSH estimam o
+    # Jaccard; atributos raros em comum somam o seu peso de Adamic-Adar
+    lsh_weight = recommender.JACCARD_SCALE * recommender.BETA_JACCARD / bands
+    alpha = recommender.ALPHA_ADAMIC
+
+    for i, source in enumerate(titles.tolist()):
+        parts = []
+        for order, b_start, b_end in buckets:
+            s, e = b_start[i], b_end[i]
+            if 1 < e - s <= max_bucket:
+                parts.append(order[s:e])
+        weights = [np.full(sum(len(p) for p in parts), lsh_weight)]
+
+        via = features.neighbors(source)
+        rare = via[features.degree[via] <= max_bucket]
+        if len(rare):
+            co, owner = features.gather(rare)
+            co_rows = title_row[co]
+            keep = co_rows >= 0
+            parts.append(co_rows[keep])
+            weights.append(features.adamic_weight[rare][owner[keep]] * alpha)
+
+        if not parts:
+            continue
+
+        rows, slot = np.unique(np.concatenate(parts), return_inverse=True)
+        priority = np.bincount(slot, weights=np.concatenate(weights), minlength=len(rows))
+        keep = rows != i
+        rows, priority = rows[keep], priority[keep]
+        if len(rows) > max_candidates:
+            best = np.argpartition(-priority, max_candidates - 1)[:max_candidates]
+            rows = np.sort(rows[best])
+        if len(rows) == 0:
+            continue
+
+        candidates = titles[rows]
+        s = recommender.exact_scores(G, features, source, labels[i], candidates)
+        best = recommender.top_n_indices(s, k)
+        neighbors[i, :len(best)] = title_row[candidates[best]]
+        scores[i, :len(best)] = s[best]
+
+    params = {
+        'k': k, 'n_hashes': n_hashes, 'bands': bands, 'max_bucket': max_bucket,
+        'max_candidates': max_candidates, 'seed': seed,
+    }
+    index = SimilarityIndex(labels, neighbors, scores, _weights_signature(), params, graph_fingerprint(G))
+    print(f"Índice top-{k} construído: {len(titles)} títulos em {time.perf_counter() - start_time:.1f}s")
+    return index
+
+
+def _rebuild(G, index):
+    return build_similarity_index(G, **{
+        key: index.params[key] for key in ('k', 'n_hashes', 'bands', 'max_bucket', 'max_candidates', 'seed')
+        if key in index.params
+    })
+
+
+def load_similarity_index(path, G):
+    """
+    Carrega o índice salvo se ele foi construído para este grafo (mesma
+    impressão digital) e com os pesos atuais; senão retorna None.
+    """
+    index = SimilarityIndex.load(path, graph=graph_fingerprint(G))
+    if index is None or index.is_stale():
+        return None
+    return index
+
+
+def _load_or_build(G, path):
+    index = load_similarity_index(path, G)
+    if index is not None:
+        print(f"Índice de similaridade carregado de '{path}'")
+        return index
+
+    index = build_similarity_index(G)
+    _save_quietly(index, path)
+    return index
+
+
+def _save_quietly(index, path):
+    try:
+        index.save(path)
+    except OSError as exc:
+        print(f"Aviso: índice não salvo em '{path}' ({exc})")
+
+
+def get_similarity_index(G, path=INDEX_DIR):
+    """
+    Índice do grafo: lido de 'path' se corresponde ao grafo e aos pesos,
+    senão construído (e salvo). Refeito se os pesos mudaram.
+    """
+    index = get_derived(G, 'similarity_index', lambda G: _load_or_build(G, path))
+    if index.is_stale():
+        index = _rebuild(G, index)
+        _save_quietly(index, path)
+        set_derived(G, 'similarity_index', index)
+    return index
+
+
+def recall_at_k(index, G, k=10, sample=200, seed=42):
+    """
+    Compara o índice com o recommender exato em uma amostra de títulos.
+    Um item do índice conta como acerto se o seu score alcança o k-ésimo
+    score exato (empates no corte valem como acerto).
+    """
+    rng = np.random.default_rng(seed)
+    labels = index.labels
+    picks = rng.choice(len(labels), size=min(sample, len(labels)), replace=False)
+
+    recalls, t_index, t_exact = [], [], []
+    for i in picks.tolist():
+        title = labels[i]
+
+        start = time.perf_counter()
+        approx = index.recommend(title, k)
+        t_index.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        exact = recommender.recommend_titles(title, G, k, use_cache=False)
+        t_exact.append(time.perf_counter() - start)
+
+        if not exact:
+            continue
+        cutoff = exact[-1][1] - 1e-4
+        hits = sum(1 for _, s in approx if s >= cutoff)
+        recalls.append(min(hits, len(exact)) / len(exact))
+
+    return {
+        'k': k,
+        'sample': len(picks),
+        'recall': float(np.mean(recalls)) if recalls else 1.0,
+        'perfect': float(np.mean(np.array(recalls) == 1.0)) if recalls else 1.0,
+        'index_ms': float(np.mean(t_index) * 1000),
+        'exact_ms': float(np.mean(t_exact) * 1000),
+    }
+
+
+def print_recall_report(index, G, ks=(5, 10, 20), sample=200):
+    print(f"\n{'K':>4} {'recall@K':>9} {'perfeito':>9} {'índice':>10} {'exato':>10}")
+    reports = []
+    for k in ks:
+        if k > index.k:
+            continue
+        r = recall_at_k(index, G, k, sample)
+        reports.append(r)
+        print(f"{k:>4} {r['recall']:>9.3f} {r['perfect']:>9.3f} "
+              f"{r['index_ms']:>8.3f}ms {r['exact_ms']:>8.3f}ms")
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Constrói e avalia o índice top-K de similaridade.")
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--out', default=INDEX_DIR)
+    parser.add_argument('--sample', type=int, default=200, help="títulos no relatório de recall")
+    args = parser.parse_args(argv)
+
+    # Mesmos grafos (e cache) do menu interativo
+    from src.config import CSV_PATH, INCLUIR_PESSOAS, MAX_ELENCO, MIN_TITULOS_PESSOA, REGIOES
+    from src.graph_store import load_or_build_graphs
+    from src.tuning import apply_configured_profile
+
+    apply_configured_profile()
+    graphs = load_or_build_graphs(
+        CSV_PATH, REGIOES,
+        include_people=INCLUIR_PESSOAS,
+        max_cast=MAX_ELENCO,
+        min_person_titles=MIN_TITULOS_PESSOA
+    )
+    G = graphs['full']
+
+    index = build_similarity_index(G, k=args.k)
+    index.save(args.out)
+    print(f"Índice salvo em '{args.out}'")
+
+    print_recall_report(index, G, sample=args.sample)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import numpy as np
+import scipy.sparse as sp
+
+from src import recommender
+from src.features import N_TYPES, OTHER_CODE, TYPE_CODES, adamic_factors, type_weights
+from src.graph_builder import PRUNED_PEOPLE
+from src.graph_state import get_derived
+from src.instrumentation import observe, timed, timer
+from src.text_similarity import TextIndex
+
+# Motor esparso: compila o grafo completo em uma matriz de incidência
+# título × atributo (CSR) e calcula Adamic-Adar e Jaccard ponderado de
+# todos os candidatos com produtos matriz–vetor.
+
+
+class CompiledGraph:
+    """
+    Representação esparsa do grafo completo para o motor de recomendação.
+
+    - matrix:          CSR títulos × atributos (0/1)
+    - matrix_t:        CSR atributos × títulos
+    - col_type:        código de tipo de cada atributo
+    - col_inv_log:     1/log(grau) de cada atributo (0 se grau <= 1)
+    - row_type_counts: nº de vizinhos de cada tipo por título (com as pessoas
+                       removidas por prune_people, que contam na união do Jaccard)
+    - row_size:        tamanho da vizinhança de cada título (idem)
+    """
+
+    def __init__(self, G):
+        titles = [n for n, d in G.nodes(data=True) if d.get('type') == 'title']
+
+        col_of = {}
+        rows, cols = [], []
+        for i, n in enumerate(titles):
+            for neighbor in G.neighbors(n):
+                j = col_of.setdefault(neighbor, len(col_of))
+                rows.append(i)
+                cols.append(j)
+
+        attrs = list(col_of)
+        n_titles, n_attrs = len(titles), len(attrs)
+
+        data = np.ones(len(rows), dtype=np.float64)
+        matrix = sp.csr_matrix(
+            (data, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=(n_titles, n_attrs)
+        )
+
+        col_type = np.array(
+            [TYPE_CODES.get(G.nodes[a].get('type'), OTHER_CODE) for a in attrs],
+            dtype=np.int8
+        )
+        degree = np.array([G.degree(a) for a in attrs], dtype=np.float64)
+        col_inv_log = np.zeros(n_attrs)
+        mask = degree > 1
+        col_inv_log[mask] = 1.0 / np.log(degree[mask])
+
+        labels = [G.nodes[n].get('label') for n in titles]
+        pruned = [G.nodes[n].get(PRUNED_PEOPLE, 0) for n in titles]
+        self._set_arrays(matrix, col_type, col_inv_log, titles, labels, attrs, pruned)
+
+    @classmethod
+    def from_compact(cls, G):
+        """
+        Compila um grafo compacto (compact_graph) direto do CSR: as linhas dos
+        títulos já são a matriz de incidência, com colunas deslocadas.
+        """
+        start, end = G.type_range('title')
+        cols = G.indices[G.indptr[start]:G.indptr[end]]
+        if start != 0 or np.any(cols < end):
+            return cls(G)
+
+        n_nodes = G.number_of_nodes()
+        degree = np.diff(G.indptr[end:]).astype(np.float64)
+        col_inv_log = np.zeros(n_nodes - end)
+        mask = degree > 1
+        col_inv_log[mask] = 1.0 / np.log(degree[mask])
+
+        return cls.from_arrays(
+            G.indptr[:end + 1], cols - end, G.node_type[end:], col_inv_log,
+            list(range(end)), G.labels[:end].tolist(), list(range(end, n_nodes)),
+            G.pruned_people[:end]
+        )
+
+    @classmethod
+    def from_arrays(cls, indptr, indices, col_type, col_inv_log, titles, labels, attrs, pruned=None,
+                    transposed=None):
+        """
+        Reconstrói a versão compilada a partir de arrays salvos (ex.: cache em
+        disco, mapeados com np.load(mmap_mode=...): a matriz usa os arrays sem
+        copiar). transposed = (indptr, indices) da transposta, se salva.
+        """
+        compiled = cls.__new__(cls)
+        matrix = sp.csr_matrix(
+            (np.ones(len(indices)), indices, indptr),
+            shape=(len(titles), len(attrs))
+        )
+        matrix_t = None
+        if transposed is not None:
+            t_indptr, t_indices = transposed
+            matrix_t = sp.csr_matrix(
+                (np.ones(len(t_indices)), t_indices, t_indptr),
+                shape=(len(attrs), len(titles))
+            )
+        compiled._set_arrays(matrix, col_type, col_inv_log, titles, labels, attrs, pruned, matrix_t)
+        return compiled
+
+    def _set_arrays(self, matrix, col_type, col_inv_log, titles, labels, attrs, pruned=None,
+                    matrix_t=None):
+        n_attrs = len(attrs)
+
+        self.matrix = matrix
+        self.matrix_t = matrix.T.tocsr() if matrix_t is None else matrix_t
+        self.col_type = col_type
+        self.col_inv_log = col_inv_log
+
+        one_hot = sp.csr_matrix(
+            (np.ones(n_attrs), (np.arange(n_attrs), np.asarray(col_type, dtype=np.int64))),
+            shape=(n_attrs, N_TYPES)
+        )
+        self.row_type_counts = np.asarray((matrix @ one_hot).todense())
+        self.row_size = np.diff(matrix.indptr)
+        if pruned is not None:
+            pruned = np.asarray(pruned, dtype=np.int64)
+            self.row_type_counts[:, TYPE_CODES['person']] += pruned
+            self.row_size = self.row_size + pruned
+
+        self.titles = titles
+        self.labels = labels
+        self.row_of = {n: i for i, n in enumerate(titles)}
+        self.attrs = attrs
+
+        self.row_of_label = {}
+        for i, label in enumerate(labels):
+            self.row_of_label.setdefault(label, i)
+        self._col_of = None
+
+    def cols_for(self, nodes):
+        """
+        Colunas (atributos) dos nós dados; nós que não são atributos são ignorados.
+        """
+        if self._col_of is None:
+            self._col_of = {a: j for j, a in enumerate(self.attrs)}
+        return np.fromiter(
+            (j for j in map(self._col_of.get, nodes) if j is not None), dtype=np.int64
+        )
+
+    def row_for_label(self, title_label):
+        return self.row_of_label.get(title_label)
+
+    def get_text_index(self):
+        """
+        Índice textual dos títulos compilados (criado na primeira consulta).
+        """
+        if recommender.TEXT_SIMILARITY_ENGINE != "ngram":
+            return None
+        if getattr(self, 'text_index', None) is None:
+            self.text_index = TextIndex(self.labels)
+        return self.text_index
+
+
+@timed('compile_graph')
+def compile_graph(G):
+    """
+    Compila o grafo completo para o motor esparso.
+    """
+    if getattr(G, 'is_compact', False):
+        compiled = CompiledGraph.from_compact(G)
+    else:
+        compiled = CompiledGraph(G)
+    print(
+        f"Grafo compilado: {len(compiled.titles)} títulos × "
+        f"{len(compiled.attrs)} atributos, {compiled.matrix.nnz} incidências."
+    )
+    return compiled
+
+
+def get_compiled(G):
+    """
+    Versão compilada do grafo, reconstruída apenas quando o grafo muda.
+    """
+    return get_derived(G, 'sparse_compiled', compile_graph)
+
+
+def score_candidates(compiled, row, title_label, exclude=None):
+    """
+    Calcula o score final de todos os candidatos de um título.
+    Retorna (índices dos candidatos, scores).
+    exclude: atributos do título tratados como ausentes (avaliação leave-one-out).
+    """
+    start, end = compiled.matrix.indptr[row], compiled.matrix.indptr[row + 1]
+    cols = compiled.matrix.indices[start:end]
+    w_type = type_weights()
+    w_source = compiled.row_type_counts[row] @ w_type
+    row_size = compiled.row_size[row]
+    if exclude:
+        hidden = np.isin(cols, compiled.cols_for(exclude))
+        w_source = w_source - w_type[compiled.col_type[cols[hidden]]].sum()
+        row_size = row_size - int(hidden.sum())
+        cols = cols[~hidden]
+
+    # Candidatos e Adamic-Adar saem do mesmo produto (fase 'candidates')
+    with timer('recommend.candidates'):
+        col_types = compiled.col_type[cols]
+        factors = adamic_factors()
+
+        # Uma única multiplicação esparsa: [vizinhos em comum, peso da interseção, Adamic-Adar]
+        weights = np.column_stack([
+            np.ones(len(cols)),
+            w_type[col_types],
+            factors[col_types] * compiled.col_inv_log[cols],
+        ])
+        sub = compiled.matrix_t[cols]
+        totals = sub.T @ weights
+
+        common = totals[:, 0]
+        candidates = np.flatnonzero(common > 0)
+        candidates = candidates[candidates != row]
+
+    observe('recommend.neighbors_touched', sub.nnz)
+    observe('recommend.candidates', len(candidates))
+    if len(candidates) == 0:
+        return candidates, np.zeros(0)
+
+    with timer('recommend.jaccard'):
+        intersection = totals[candidates, 1]
+        aa_score = totals[candidates, 2]
+
+        w_cand = compiled.row_type_counts[candidates] @ w_type
+        union = w_source + w_cand - intersection
+
+        jac_score = np.divide(
+            intersection, union, out=np.zeros(len(candidates)), where=union > 0
+        )
+
+        # Vizinhanças idênticas => Jaccard exatamente 1.0 (evita erro de arredondamento)
+        same = (common[candidates] == row_size) & (compiled.row_size[candidates] == row_size)
+        jac_score[same] = 1.0
+
+    # Texto só para quem passa na trava estrutural
+    threshold_estrutural = 1.0
+    text_score = np.zeros(len(candidates))
+    gated = np.flatnonzero(jac_score >= threshold_estrutural)
+    observe('recommend.text_gated', len(gated))
+    if len(gated):
+        with timer('recommend.text'):
+            text_score[gated] = recommender.franchise_text_scores(
+                None, title_label,
+                [compiled.labels[c] for c in candidates[gated]],
+                index=compiled.get_text_index()
+            )
+
+    final_score = (aa_score * recommender.ALPHA_ADAMIC) + \
+                  (jac_score * recommender.JACCARD_SCALE * recommender.BETA_JACCARD) + \
+                  (text_score * recommender.TEXT_SCALE * recommender.GAMMA_TEXT)
+
+    return candidates, final_score
+
+
+def recommend_titles_sparse(title_label, compiled, top_n=5, exclude=None):
+    """
+    Mesmo ranking de recommend_titles, calculado sobre a matriz compilada.
+    """
+    row = compiled.row_for_label(title_label)
+    if row is None:
+        return []
+
+    candidates, scores = score_candidates(compiled, row, title_label, exclude)
+    with timer('recommend.ranking'):
+        best = recommender.top_n_indices(scores, top_n)
+
+    return [
+        (compiled.labels[candidates[k]], round(float(scores[k]), 4))
+        for k in best
+    ]
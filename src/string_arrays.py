@@ -0,0 +1,18 @@
+import numpy as np
+
+# Listas de strings como arrays NumPy (blob UTF-8 + offsets), para .npz sem
+# pickle: usadas pelo cache de grafos, pela exportação e pelo índice de
+# similaridade.
+
+
+def encode_strings(values):
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def decode_strings(blob, offsets):
+    data = bytes(blob)
+    return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
@@ -0,0 +1,136 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.graph_state import get_derived
+from src.title_index import get_title_index
+
+# Similaridade textual entre títulos (bônus de franquia).
+# - 'sequence': difflib.SequenceMatcher (comportamento original, sem índice)
+# - 'ngram':    coeficiente de Dice sobre bigramas de caracteres do título
+#               normalizado; assinaturas pré-calculadas por título
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_title(text):
+    """
+    Minúsculas, sem acentos e com pontuação trocada por espaço.
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', text).strip()
+
+
+@lru_cache(maxsize=1 << 16)
+def title_signature(text):
+    """
+    Conjunto de bigramas de caracteres do título normalizado.
+    """
+    norm = normalize_title(text)
+    if not norm:
+        return frozenset()
+    padded = f" {norm} "
+    return frozenset(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+def sequence_similarity(a, b):
+    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+
+
+def ngram_similarity(a, b):
+    sig_a, sig_b = title_signature(a), title_signature(b)
+    total = len(sig_a) + len(sig_b)
+    if total == 0:
+        return 0.0
+    return 2.0 * len(sig_a & sig_b) / total
+
+
+ENGINES = {
+    'sequence': sequence_similarity,
+    'ngram': ngram_similarity,
+}
+
+
+class TextIndex:
+    """
+    Assinaturas de bigramas de todos os títulos em uma matriz CSR binária,
+    para calcular a similaridade de um título contra vários de uma vez.
+    """
+
+    def __init__(self, labels):
+        vocab = {}
+        indptr = [0]
+        indices = []
+
+        for label in labels:
+            for gram in title_signature(label):
+                indices.append(vocab.setdefault(gram, len(vocab)))
+            indptr.append(len(indices))
+
+        self.vocab = vocab
+        self.matrix = sp.csr_matrix(
+            (np.ones(len(indices)), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(labels), max(len(vocab), 1))
+        )
+        self.sizes = np.diff(self.matrix.indptr)
+        self.row_of_label = {}
+        for i, label in enumerate(labels):
+            self.row_of_label.setdefault(label, i)
+
+    def _vector(self, label):
+        cols = [self.vocab[g] for g in title_signature(label) if g in self.vocab]
+        vec = np.zeros(self.matrix.shape[1])
+        vec[cols] = 1.0
+        return vec, len(title_signature(label))
+
+    def similarity(self, label, others):
+        """
+        Dice entre 'label' e cada título de 'others' (vetorizado).
+        """
+        rows = np.fromiter((self.row_of_label.get(o, -1) for o in others), dtype=np.int64)
+        scores = np.zeros(len(rows))
+        known = rows >= 0
+
+        vec, size = self._vector(label)
+        if known.any():
+            idx = rows[known]
+            inter = self.matrix[idx] @ vec
+            total = self.sizes[idx] + size
+            scores[known] = np.divide(
+                2.0 * inter, total, out=np.zeros(len(idx)), where=total > 0
+            )
+
+        for k in np.flatnonzero(~known):
+            scores[k] = ngram_similarity(label, others[k])
+
+        return scores
+
+
+def build_text_index(G):
+    return TextIndex(get_title_index(G).labels)
+
+
+def get_text_index(G):
+    """
+    Índice textual do grafo, reconstruído apenas quando o grafo muda.
+    """
+    return get_derived(G, 'text_index', build_text_index)
+
+
+def text_similarity_many(engine, label, others, index=None):
+    """
+    Similaridade de 'label' contra cada título em 'others' (array de floats).
+    """
+    if not label or len(others) == 0:
+        return np.zeros(len(others))
+
+    if engine == 'ngram' and index is not None:
+        return index.similarity(label, others)
+
+    fn = ENGINES[engine]
+    return np.array([fn(label, o) if o else 0.0 for o in others])
@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+import numpy as np
+
+from src.graph_state import get_derived
+
+# Índice de títulos: busca exata O(1) por label e busca por substring
+# via índice invertido de trigramas (sem varrer todos os nós).
+
+N_GRAM = 3
+_BOUNDARY = '\x00'
+
+
+def _grams(text):
+    padded = _BOUNDARY + text + _BOUNDARY * (N_GRAM - 1)
+    return {padded[i:i + N_GRAM] for i in range(len(padded) - N_GRAM + 1)}
+
+
+def _title_items(G):
+    if getattr(G, 'is_compact', False):
+        return G.titles()
+    return (
+        (n, d.get('label', '')) for n, d in G.nodes(data=True) if d.get('type') == 'title'
+    )
+
+
+class TitleIndex:
+    """
+    - lookup(label): nó do título com aquele label (ou None)
+    - search(termo): labels que contêm o termo, ordenados por relevância
+    """
+
+    def __init__(self, G):
+        self.nodes = []
+        self.labels = []
+        self.lower = []
+        self.by_label = {}
+
+        postings = defaultdict(list)
+
+        for n, label in _title_items(G):
+            i = len(self.nodes)
+            self.nodes.append(n)
+            self.labels.append(label)
+            self.lower.append(label.lower())
+            self.by_label.setdefault(label, n)
+
+            for gram in _grams(self.lower[i]):
+                postings[gram].append(i)
+
+        self.postings = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+
+        # Termos com menos de N_GRAM letras: trigramas que começam com eles
+        self.by_prefix = defaultdict(list)
+        for gram in self.postings:
+            for k in range(1, N_GRAM):
+                self.by_prefix[gram[:k]].append(gram)
+
+    def lookup(self, title_label):
+        return self.by_label.get(title_label)
+
+    def _candidates(self, term):
+        if len(term) < N_GRAM:
+            grams = self.by_prefix.get(term, [])
+            if not grams:
+                return np.zeros(0, dtype=np.int32)
+            return np.unique(np.concatenate([self.postings[g] for g in grams]))
+
+        grams = {term[i:i + N_GRAM] for i in range(len(term) - N_GRAM + 1)}
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return np.zeros(0, dtype=np.int32)
+            lists.append(ids)
+
+        lists.sort(key=len)
+        result = lists[0]
+        for ids in lists[1:]:
+            result = np.intersect1d(result, ids, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+
+    def search(self, termo, limit=None):
+        termo = termo.lower()
+
+        if not termo:
+            return self.labels[:limit] if limit else list(self.labels)
+
+        ranked = []
+        for i in self._candidates(termo).tolist():
+            text = self.lower[i]
+            pos = text.find(termo)
+            if pos < 0:
+                continue
+
+            # 0: igual, 1: prefixo, 2: início de palavra, 3: meio do título
+            if text == termo:
+                group = 0
+            elif pos == 0:
+                group = 1
+            elif not text[pos - 1].isalnum():
+                group = 2
+            else:
+                group = 3
+
+            ranked.append((group, pos, len(text), i))
+
+        ranked.sort()
+        if limit:
+            ranked = ranked[:limit]
+
+        return [self.labels[i] for *_, i in ranked]
+
+
+def build_title_index(G):
+    return TitleIndex(G)
+
+
+def get_title_index(G):
+    """
+    Índice de títulos do grafo, reconstruído apenas quando o grafo muda.
+    """
+    return get_derived(G, 'title_index', build_title_index)
@@ -0,0 +1,469 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src import config, recommender
+from src.features import N_TYPES, TYPE_CODES, get_features
+from src.text_similarity import get_text_index, text_similarity_many
+from src.title_index import get_title_index
+
+# Ajuste dos pesos do recomendador.
+# Os componentes brutos de cada candidato (Adamic-Adar e vizinhos em comum
+# por tipo, contagens por tipo, similaridade de nome) são calculados uma vez
+# para uma amostra de consultas leave-one-out (ver evaluation/offline_eval).
+# Cada configuração de pesos vira só álgebra sobre esses arrays: milhares de
+# configurações são avaliadas por broadcasting, sem percorrer o grafo.
+# Parte das consultas fica de fora do ajuste (validação): o perfil guarda a
+# métrica da melhor configuração nessas consultas, não só a do ajuste.
+#
+#   python -m src.tuning --sample 500 --random 5000 --metric ndcg
+#   python -m src.tuning --synthetic 20000 --grid
+
+# Constantes do recommender que podem ser ajustadas (e entram no perfil)
+PARAMS = [
+    'ALPHA_ADAMIC', 'BETA_JACCARD', 'GAMMA_TEXT',
+    'WEIGHT_PERSON', 'WEIGHT_GENRE', 'WEIGHT_COUNTRY',
+    'ADAMIC_PERSON', 'ADAMIC_COUNTRY',
+    'JACCARD_SCALE', 'TEXT_SCALE', 'FRANCHISE_THRESHOLD', 'FRANCHISE_BOOST',
+]
+
+# Faixas da busca aleatória (min, max); pesos de tipo precisam ser > 0
+DEFAULT_SPACE = {
+    'ALPHA_ADAMIC': (0.0, 1.0),
+    'BETA_JACCARD': (0.0, 1.0),
+    'GAMMA_TEXT': (0.0, 1.0),
+    'WEIGHT_PERSON': (0.05, 1.5),
+    'WEIGHT_GENRE': (0.05, 1.5),
+    'WEIGHT_COUNTRY': (0.01, 0.5),
+    'ADAMIC_PERSON': (0.5, 10.0),
+    'ADAMIC_COUNTRY': (0.0, 1.0),
+    'FRANCHISE_BOOST': (1.0, 12.0),
+}
+
+DEFAULT_GRID = {
+    'ALPHA_ADAMIC': [0.2, 0.4, 0.6, 0.8],
+    'BETA_JACCARD': [0.2, 0.4, 0.6, 0.8],
+    'GAMMA_TEXT': [0.0, 0.1, 0.2, 0.4],
+    'WEIGHT_PERSON': [0.35, 0.7, 1.0],
+    'WEIGHT_GENRE': [0.2, 0.4, 0.8],
+    'ADAMIC_PERSON': [2.5, 5.0, 10.0],
+}
+
+OTHER_WEIGHT = 0.1           # peso do Jaccard dos demais tipos (como em features.type_weights)
+MAX_CELLS = 4_000_000        # candidatos × configurações por bloco de avaliação
+PROFILE_PATH = os.path.join('data', 'weights_profile.json')
+
+_TYPE_WEIGHT_PARAMS = {'WEIGHT_PERSON': 'person', 'WEIGHT_GENRE': 'genre', 'WEIGHT_COUNTRY': 'country'}
+
+
+def current_config():
+    return {name: float(getattr(recommender, name)) for name in PARAMS}
+
+
+# Componentes
+
+class Components:
+    """
+    Componentes brutos de todas as consultas, concatenados (CSR por consulta):
+    - offsets:      início de cada consulta nas linhas
+    - aa:           Σ 1/log(grau) dos vizinhos em comum, por tipo (linhas × tipos)
+    - common:       nº de vizinhos em comum por tipo
+    - pair_counts:  vizinhos por tipo do candidato + da origem
+    - same:         vizinhança idêntica (Jaccard = 1 e texto habilitado)
+    - text:         similaridade de nome (só onde same)
+    - relevant:     candidato compartilha o atributo escondido
+    - n_relevant:   nº de títulos relevantes de cada consulta
+    """
+
+    def __init__(self, offsets, aa, common, pair_counts, same, text, relevant, n_relevant):
+        self.offsets = offsets
+        self.aa = aa
+        self.common = common
+        self.pair_counts = pair_counts
+        self.same = same
+        self.text = text
+        self.relevant = relevant
+        self.n_relevant = n_relevant
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def save(self, path):
+        np.savez_compressed(path, **self.__dict__)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{k: data[k] for k in data.files})
+
+
+def _type_counts(features):
+    owner = np.repeat(np.arange(len(features.nodes)), features.degree)
+    counts = np.bincount(
+        owner * N_TYPES + features.type_code[features.indices].astype(np.int64),
+        minlength=len(features.nodes) * N_TYPES
+    ).reshape(len(features.nodes), N_TYPES)
+    # Pessoas removidas por prune_people continuam na união do Jaccard
+    counts[:, TYPE_CODES['person']] += features.pruned
+    return counts
+
+
+def compute_components(G, queries):
+    """
+    queries: [(título, nó escondido), ...] (evaluation.offline_eval.build_queries).
+    """
+    features = get_features(G)
+    type_counts = _type_counts(features)
+    title_code = TYPE_CODES['title']
+    text_index = get_text_index(G) if recommender.TEXT_SIMILARITY_ENGINE == "ngram" else None
+    lookup = get_title_index(G).lookup
+
+    parts = {k: [] for k in ('aa', 'common', 'pair_counts', 'same', 'text', 'relevant')}
+    offsets, n_relevant = [0], []
+
+    for title_label, hidden in queries:
+        source = features.node_id[lookup(title_label)]
+        h = features.node_id[hidden]
+
+        via = features.neighbors(source)
+        via = via[via != h]
+        source_counts = type_counts[source].copy()
+        source_counts[features.type_code[h]] -= 1
+        d_source = len(via) + features.pruned[source]
+
+        cand, owner = features.gather(via)
+        via = via[owner]
+        mask = (cand != source) & (features.type_code[cand] == title_code)
+        cand, via = cand[mask], via[mask]
+        candidates, slot = np.unique(cand, return_inverse=True)
+        n = len(candidates)
+
+        cells = slot * N_TYPES + features.type_code[via].astype(np.int64)
+        common = np.bincount(cells, minlength=n * N_TYPES).reshape(n, N_TYPES)
+        aa = np.bincount(cells, weights=features.inv_log_degree[via],
+                         minlength=n * N_TYPES).reshape(n, N_TYPES)
+
+        same = (common.sum(axis=1) == d_source) & (features.set_size[candidates] == d_source)
+        text = np.zeros(n)
+        if same.any():
+            nodes = features.nodes
+            labels = [G.nodes[nodes[c]]['label'] for c in candidates[same]]
+            text[same] = text_similarity_many(
+                recommender.TEXT_SIMILARITY_ENGINE, title_label, labels, text_index
+            )
+
+        hidden_titles = features.neighbors(h)
+        hidden_titles = hidden_titles[features.type_code[hidden_titles] == title_code]
+
+        parts['aa'].append(aa)
+        parts['common'].append(common.astype(np.int32))
+        parts['pair_counts'].append((type_counts[candidates] + source_counts).astype(np.int32))
+        parts['same'].append(same)
+        parts['text'].append(text)
+        parts['relevant'].append(np.isin(candidates, hidden_titles))
+        offsets.append(offsets[-1] + n)
+        n_relevant.append(int((hidden_titles != source).sum()))
+
+    arrays = {k: np.concatenate(v) if v else np.zeros(0) for k, v in parts.items()}
+    return Components(
+        np.asarray(offsets, dtype=np.int64), arrays['aa'], arrays['common'],
+        arrays['pair_counts'], arrays['same'].astype(bool), arrays['text'],
+        arrays['relevant'].astype(bool), np.asarray(n_relevant, dtype=np.int64)
+    )
+
+
+def split_queries(queries, validation=0.3):
+    """
+    (ajuste, validação): títulos disjuntos. As consultas de build_queries já
+    vêm embaralhadas, então as duas partes seguem a mesma estratificação.
+    """
+    n_validation = int(round(len(queries) * validation))
+    return queries[n_validation:], queries[:n_validation]
+
+
+# Configurações
+
+def _as_arrays(configs):
+    """
+    dict nome -> array (uma posição por configuração); ausentes = valor atual.
+    """
+    n = max((len(np.atleast_1d(v)) for v in configs.values()), default=1)
+    base = current_config()
+    out = {}
+    for name in PARAMS:
+        value = np.asarray(configs.get(name, base[name]), dtype=np.float64)
+        out[name] = np.broadcast_to(value, (n,)).copy()
+    for name in _TYPE_WEIGHT_PARAMS:
+        if np.any(out[name] <= 0):
+            raise ValueError(f"{name} precisa ser > 0 (a trava do Jaccard depende disso).")
+    return out
+
+
+def grid(space=None):
+    """
+    Produto cartesiano das listas de valores.
+    """
+    space = space or DEFAULT_GRID
+    names = list(space)
+    combos = np.array(list(itertools.product(*(space[n] for n in names))), dtype=np.float64)
+    return _as_arrays({n: combos[:, i] for i, n in enumerate(names)})
+
+
+def random_configs(n, space=None, seed=42, include_current=True):
+    """
+    n configurações uniformes nas faixas de 'space' (a primeira = pesos atuais).
+    """
+    space = space or DEFAULT_SPACE
+    rng = np.random.default_rng(seed)
+    configs = {name: rng.uniform(lo, hi, n) for name, (lo, hi) in space.items()}
+    if include_current:
+        base = current_config()
+        for name in configs:
+            configs[name][0] = base[name]
+    return _as_arrays(configs)
+
+
+def _weight_matrices(configs, block):
+    w = np.full((len(block), N_TYPES), OTHER_WEIGHT)
+    f = np.ones((len(block), N_TYPES))
+    for name, type_name in _TYPE_WEIGHT_PARAMS.items():
+        w[:, TYPE_CODES[type_name]] = configs[name][block]
+    f[:, TYPE_CODES['person']] = configs['ADAMIC_PERSON'][block]
+    f[:, TYPE_CODES['country']] = configs['ADAMIC_COUNTRY'][block]
+    return w, f
+
+
+def score_block(comp, rows, configs, block):
+    """
+    Scores (configurações × candidatos) das linhas 'rows' para as configurações
+    'block'. Mesma fórmula de recommender.score_candidates; uma configuração
+    por linha para o top-k percorrer memória contígua.
+    """
+    w, f = _weight_matrices(configs, block)
+    c = {name: values[block][:, None] for name, values in configs.items()}
+
+    inter = w @ comp.common[rows].T
+    union = w @ comp.pair_counts[rows].T
+    union -= inter
+    # Pesos de tipo > 0 => união > 0 sempre que a origem tem vizinhos
+    np.maximum(union, 1e-300, out=union)
+    jac = np.divide(inter, union, out=inter)
+
+    scores = f @ comp.aa[rows].T
+    scores *= c['ALPHA_ADAMIC']
+    scores += jac * (c['JACCARD_SCALE'] * c['BETA_JACCARD'])
+
+    # Vizinhança idêntica: Jaccard exatamente 1.0 e bônus de nome (poucas colunas)
+    same = np.flatnonzero(comp.same[rows])
+    if len(same):
+        text = comp.text[rows][same][None, :]
+        boosted = np.where(text > c['FRANCHISE_THRESHOLD'], text * c['FRANCHISE_BOOST'], text)
+        scores[:, same] += (1.0 - jac[:, same]) * (c['JACCARD_SCALE'] * c['BETA_JACCARD']) + \
+            boosted * (c['TEXT_SCALE'] * c['GAMMA_TEXT'])
+
+    return scores
+
+
+def _top_k(scores, k):
+    """
+    Índices do top-k de cada linha, em ordem decrescente (empates pela coluna),
+    como recommender.top_n_indices.
+    """
+    n = scores.shape[1]
+    if n > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        part.sort(axis=1)
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+    top = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-top, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+
+def evaluate_configs(comp, configs, k=10, metric='ndcg'):
+    """
+    Métrica média (hit, precision ou ndcg @k) de cada configuração.
+    """
+    n_configs = len(configs['ALPHA_ADAMIC'])
+    totals = np.zeros(n_configs)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+
+    for q in range(len(comp)):
+        start, stop = comp.offsets[q], comp.offsets[q + 1]
+        if stop == start:
+            continue
+        rows = np.arange(start, stop)
+        relevant = comp.relevant[rows]
+        ideal = min(k, int(comp.n_relevant[q]))
+        idcg = discounts[:ideal].sum()
+
+        step = max(1, MAX_CELLS // len(rows))
+        for b in range(0, n_configs, step):
+            block = np.arange(b, min(b + step, n_configs))
+            top = _top_k(score_block(comp, rows, configs, block), k)
+            gains = relevant[top]
+            if metric == 'hit':
+                totals[block] += gains.any(axis=1)
+            elif metric == 'precision':
+                totals[block] += gains.sum(axis=1) / k
+            elif metric == 'ndcg':
+                if idcg:
+                    totals[block] += (gains * discounts[:gains.shape[1]]).sum(axis=1) / idcg
+            else:
+                raise ValueError(f"Métrica desconhecida: {metric}")
+
+    return totals / max(len(comp), 1)
+
+
+def tune(comp, configs, k=10, metric='ndcg', validation=None):
+    """
+    Avalia todas as configurações e retorna (melhor configuração, resultado).
+    validation: Components de consultas fora do ajuste; a melhor configuração
+    e os pesos atuais são medidos nelas também (resultado['validation']).
+    """
+    start = time.perf_counter()
+    values = evaluate_configs(comp, configs, k, metric)
+    elapsed = time.perf_counter() - start
+
+    baseline = float(evaluate_configs(comp, _as_arrays({}), k, metric)[0])
+    best = int(np.argmax(values))
+    config = {name: float(configs[name][best]) for name in PARAMS}
+
+    result = {
+        'metric': f"{metric}@{k}",
+        'best': float(values[best]),
+        'baseline': baseline,
+        'configs': len(values),
+        'queries': len(comp),
+        'seconds': round(elapsed, 3),
+    }
+    if validation is not None and len(validation):
+        result['validation'] = {
+            'best': float(evaluate_configs(validation, _as_arrays(config), k, metric)[0]),
+            'baseline': float(evaluate_configs(validation, _as_arrays({}), k, metric)[0]),
+            'queries': len(validation),
+        }
+    return config, result
+
+
+# Perfis
+
+def save_profile(config, path=PROFILE_PATH, result=None):
+    profile = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'weights': {name: config[name] for name in PARAMS if name in config},
+        'result': result,
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+
+def load_profile(path=PROFILE_PATH):
+    with open(path, encoding='utf-8') as f:
+        profile = json.load(f)
+    unknown = set(profile.get('weights', {})) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Perfil com pesos desconhecidos: {sorted(unknown)}")
+    return profile
+
+
+def apply_profile(profile):
+    """
+    Aplica os pesos do perfil às constantes do recommender. Cache de
+    resultados, feature store e índice de similaridade se ajustam sozinhos
+    (a configuração de pesos faz parte das suas chaves).
+    """
+    weights = profile.get('weights', profile)
+    for name, value in weights.items():
+        if name not in PARAMS:
+            raise ValueError(f"Peso desconhecido: {name}")
+        setattr(recommender, name, float(value))
+    return weights
+
+
+def apply_configured_profile():
+    """
+    Aplica o perfil de config.PERFIL_PESOS, se houver. Chamado onde os grafos
+    são carregados com a configuração compartilhada (menu e CLIs).
+    """
+    if not config.PERFIL_PESOS:
+        return None
+    weights = apply_profile(load_profile(config.PERFIL_PESOS))
+    print(f"Pesos do recomendador carregados de '{config.PERFIL_PESOS}'")
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ajuste vetorizado dos pesos do recomendador.")
+    parser.add_argument('--sample', type=int, default=300, help="consultas leave-one-out")
+    parser.add_argument('--validation', type=float, default=0.3,
+                        help="fração das consultas fora do ajuste (validação)")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--metric', default='ndcg', choices=['ndcg', 'hit', 'precision'])
+    parser.add_argument('--random', type=int, default=2000, help="nº de configurações aleatórias")
+    parser.add_argument('--grid', action='store_true', help="usa a grade DEFAULT_GRID")
+    parser.add_argument('--held-out', default=None, choices=['person', 'genre', 'country'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--synthetic', type=int, default=None,
+                        help="usa um catálogo sintético de N linhas em vez do CSV")
+    parser.add_argument('--out', default=PROFILE_PATH, help="arquivo do perfil de pesos")
+    args = parser.parse_args(argv)
+
+    from evaluation.offline_eval import build_queries
+
+    if args.synthetic:
+        from benchmarks.synthetic import generate_catalog
+        from src.graph_builder import build_full_graph
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            G = build_full_graph(generate_catalog(args.synthetic, seed=args.seed),
+                                 include_people=True, max_cast=10)
+    else:
+        # Mesmos grafos (e cache) do menu interativo
+        from src.config import CSV_PATH, INCLUIR_PESSOAS, MAX_ELENCO, MIN_TITULOS_PESSOA, REGIOES
+        from src.graph_store import load_or_build_graphs
+
+        apply_configured_profile()
+        G = load_or_build_graphs(
+            CSV_PATH, REGIOES,
+            include_people=INCLUIR_PESSOAS,
+            max_cast=MAX_ELENCO,
+            min_person_titles=MIN_TITULOS_PESSOA
+        )['full']
+
+    start = time.perf_counter()
+    queries = build_queries(G, args.sample, args.held_out, seed=args.seed)
+    tune_queries, validation_queries = split_queries(queries, args.validation)
+    comp = compute_components(G, tune_queries)
+    validation = compute_components(G, validation_queries)
+    print(f"Componentes de {len(comp)} + {len(validation)} consultas (ajuste + validação) "
+          f"em {time.perf_counter() - start:.2f}s")
+
+    configs = grid() if args.grid else random_configs(args.random, seed=args.seed)
+    best, result = tune(comp, configs, args.k, args.metric, validation)
+
+    print(f"{result['configs']} configurações em {result['seconds']:.2f}s: "
+          f"{result['metric']} {result['baseline']:.4f} (atual) -> {result['best']:.4f}")
+    if 'validation' in result:
+        held = result['validation']
+        print(f"  validação ({held['queries']} consultas): "
+              f"{held['baseline']:.4f} (atual) -> {held['best']:.4f}")
+    for name in PARAMS:
+        print(f"  {name:<20} {getattr(recommender, name):>8.3f} -> {best[name]:.3f}")
+
+    print(f"Perfil salvo em '{save_profile(best, args.out, result)}'")
+    return best, result
+
+
+if __name__ == "__main__":
+    main()
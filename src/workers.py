@@ -0,0 +1,50 @@
+import multiprocessing as mp
+from contextlib import contextmanager
+
+# Pool de processos com estado compartilhado (grafos, jobs, parâmetros).
+# Com 'fork' os processos herdam o estado por copy-on-write; sem 'fork' ele
+# é enviado uma única vez por processo, no initializer. As funções
+# executadas no pool leem o estado de WORKER_STATE.
+
+WORKER_STATE = {}
+
+
+def _init_worker(state, initializer, initargs):
+    WORKER_STATE.update(state)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+@contextmanager
+def worker_state(**state):
+    """
+    Mesmo estado no próprio processo (caminho serial, sem pool).
+    """
+    previous = dict(WORKER_STATE)
+    WORKER_STATE.update(state)
+    try:
+        yield WORKER_STATE
+    finally:
+        WORKER_STATE.clear()
+        WORKER_STATE.update(previous)
+
+
+@contextmanager
+def worker_pool(workers, initializer=None, initargs=(), **state):
+    """
+    Pool de 'workers' processos com 'state' em WORKER_STATE.
+    initializer(*initargs) roda em cada processo. Ao sair, o pool é
+    encerrado e o estado volta ao anterior.
+    """
+    with worker_state(**state):
+        if 'fork' in mp.get_all_start_methods():
+            pool = mp.get_context('fork').Pool(workers, initializer=initializer, initargs=initargs)
+        else:
+            pool = mp.get_context().Pool(
+                workers, initializer=_init_worker, initargs=(state, initializer, initargs)
+            )
+        try:
+            yield pool
+        finally:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,61 @@
+import xml.etree.ElementTree as ET
+
+import networkx as nx
+import pytest
+
+from benchmarks.synthetic import generate_catalog
+from src.compact_graph import build_compact_graph
+from src.export import export_graph
+from src.graph_builder import build_country_genre_graph, build_full_graph
+
+# GEXF escrito em streaming: XML válido que o networkx lê de volta com os
+# mesmos nós, arestas e atributos.
+
+
+def _read(path):
+    ET.parse(path)  # XML bem formado
+    return nx.read_gexf(path)
+
+
+def _labeled_edges(G):
+    return {frozenset((G.nodes[u]['label'], G.nodes[v]['label'])) for u, v in G.edges}
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return generate_catalog(300, seed=9)
+
+
+def test_gexf_round_trip(catalog, tmp_path):
+    G = build_country_genre_graph(catalog, min_edge_weight=1)
+    path = export_graph(G, str(tmp_path / 'global.gexf'))['path']
+    H = _read(path)
+
+    assert H.number_of_nodes() == G.number_of_nodes()
+    assert _labeled_edges(H) == _labeled_edges(G)
+    for u, v, d in G.edges(data=True):
+        assert H.edges[u, v]['weight'] == pytest.approx(d['weight'])
+    assert {d['type'] for _, d in H.nodes(data=True)} == {d['type'] for _, d in G.nodes(data=True)}
+
+
+def test_gexf_people_and_compact(catalog, tmp_path):
+    params = {'include_people': True, 'max_cast': 5}
+    G = build_full_graph(catalog, **params)
+    C = build_compact_graph(catalog, **params)
+
+    H = _read(export_graph(G, str(tmp_path / 'full.gexf'))['path'])
+    HC = _read(export_graph(C, str(tmp_path / 'compact.gexf'))['path'])
+    assert H.number_of_nodes() == HC.number_of_nodes() == G.number_of_nodes()
+    assert _labeled_edges(H) == _labeled_edges(HC) == _labeled_edges(G)
+
+
+def test_gexf_escapes_text(tmp_path):
+    G = nx.Graph()
+    G.add_node('a', type='title', label='Tom & "Jerry" <3\x01')
+    G.add_node('b', type='genre', label="Kids' TV")
+    G.add_edge('a', 'b', relation='is_genre')
+
+    H = _read(export_graph(G, str(tmp_path / 'escape.gexf'))['path'])
+    assert H.nodes['a']['label'] == 'Tom & "Jerry" <3'
+    assert H.nodes['b']['label'] == "Kids' TV"
+    assert H.edges['a', 'b']['relation'] == 'is_genre'
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from benchmarks.synthetic import generate_catalog, write_catalog_csv
+from src.graph_builder import PRUNED_PEOPLE, build_full_graph
+from src.graph_store import load_graphs, load_or_build_graphs, save_graphs
+from src.recommender import recommend_titles
+from src.sparse_recommender import get_compiled
+
+# Cache de grafos em disco: a carga devolve os mesmos grafos (nós, atributos,
+# arestas e versão compilada), e o leitor em blocos constrói o mesmo que o
+# caminho com DataFrame.
+
+REGIONS = {'norte': ['Country 1', 'Country 2'], 'sul': ['Country 3', 'Country 4']}
+GRAPH_PARAMS = {'include_people': True, 'max_cast': 10, 'min_person_titles': 2}
+
+
+def _nodes(G):
+    return {n: dict(d) for n, d in G.nodes(data=True)}
+
+
+def _edges(G):
+    return {(frozenset((u, v)), tuple(sorted(d.items()))) for u, v, d in G.edges(data=True)}
+
+
+def _labeled(G):
+    # Comparação por (tipo, label): ids de pessoas dependem da ordem de leitura
+    def key(n):
+        return G.nodes[n]['type'], G.nodes[n]['label']
+    nodes = {key(n) + (d.get(PRUNED_PEOPLE, 0),) for n, d in G.nodes(data=True)}
+    edges = {
+        (frozenset((key(u), key(v))), d.get('relation'), round(d.get('weight', 0.0), 12))
+        for u, v, d in G.edges(data=True)
+    }
+    return nodes, edges
+
+
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory):
+    return write_catalog_csv(str(tmp_path_factory.mktemp('csv') / 'catalog.csv'), 800, seed=4)
+
+
+def test_save_load_round_trip(tmp_path):
+    G = build_full_graph(generate_catalog(500, seed=4), **GRAPH_PARAMS)
+    assert any(PRUNED_PEOPLE in d for _, d in G.nodes(data=True))
+
+    save_graphs({'full': G}, str(tmp_path / 'entry'), 'key')
+    loaded = load_graphs(str(tmp_path / 'entry'))['full']
+
+    assert list(loaded.nodes) == list(G.nodes)
+    assert _nodes(loaded) == _nodes(G)
+    assert _edges(loaded) == _edges(G)
+
+    compiled, expected = get_compiled(loaded), get_compiled(G)
+    assert (compiled.matrix != expected.matrix).nnz == 0
+    assert (compiled.row_size == expected.row_size).all()
+    titles = sorted(d['label'] for _, d in G.nodes(data=True) if d['type'] == 'title')[:25]
+    for title in titles:
+        assert recommend_titles(title, loaded, 5, engine='sparse', use_cache=False) == \
+            recommend_titles(title, G, 5, engine='sparse', use_cache=False)
+
+
+def test_cache_hit_and_invalidation(csv_path, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    built = load_or_build_graphs(csv_path, REGIONS, cache_dir=cache_dir, **GRAPH_PARAMS)
+    entries = [d for d in os.listdir(cache_dir) if os.path.isdir(os.path.join(cache_dir, d))]
+    assert len(entries) == 1
+
+    cached = load_or_build_graphs(csv_path, REGIONS, cache_dir=cache_dir, **GRAPH_PARAMS)
+    assert set(cached) == set(built)
+    for name in built:
+        assert _labeled(cached[name]) == _labeled(built[name])
+
+    # Outros parâmetros => outra entrada
+    load_or_build_graphs(csv_path, REGIONS, cache_dir=cache_dir, min_edge_weight=2, **GRAPH_PARAMS)
+    entries = [d for d in os.listdir(cache_dir) if os.path.isdir(os.path.join(cache_dir, d))]
+    assert len(entries) == 2
+
+
+def test_streaming_loader_matches_dataframe(csv_path):
+    streamed = load_or_build_graphs(csv_path, REGIONS, use_cache=False, streaming=True, **GRAPH_PARAMS)
+    loaded = load_or_build_graphs(csv_path, REGIONS, use_cache=False, **GRAPH_PARAMS)
+    assert set(streamed) == set(loaded)
+    for name in loaded:
+        assert _labeled(streamed[name]) == _labeled(loaded[name])
+
+
+def test_missing_csv(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_or_build_graphs(str(tmp_path / 'nope.csv'), REGIONS, cache_dir=str(tmp_path))
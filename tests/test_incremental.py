@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_catalog
+from src.graph_builder import (
+    PRUNED_PEOPLE,
+    build_country_genre_graph,
+    build_full_graph,
+    build_region_country_genre_graph
+)
+from src.incremental import IncrementalCatalog
+
+# Depois de deltas de inclusão e remoção, os grafos do catálogo incremental
+# devem ser iguais aos reconstruídos do zero com as linhas restantes.
+
+REGIONS = {'norte': {'Country 1', 'Country 2', 'Country 17'}, 'sul': {'Country 21', 'Country 5'}}
+GRAPH_PARAMS = {'include_people': True, 'max_cast': 10, 'min_person_titles': 2}
+
+
+def _nodes(G):
+    return {(d['type'], d['label'], d.get(PRUNED_PEOPLE, 0)) for _, d in G.nodes(data=True)}
+
+
+def _edges(G):
+    def key(n):
+        return G.nodes[n]['type'], G.nodes[n]['label']
+    return {
+        (frozenset((key(u), key(v))), d.get('relation'), round(d.get('weight', 0.0), 12))
+        for u, v, d in G.edges(data=True)
+    }
+
+
+def _assert_same(G, expected):
+    assert _nodes(G) == _nodes(expected)
+    assert _edges(G) == _edges(expected)
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return generate_catalog(3000, seed=5)
+
+
+@pytest.fixture(scope='module')
+def updated(catalog):
+    inc = IncrementalCatalog(catalog.iloc[:2500], regions=REGIONS, **GRAPH_PARAMS)
+    inc.apply_delta(added_rows=catalog.iloc[2500:])
+    inc.apply_delta(removed_rows=catalog.iloc[:300])
+    return inc, catalog.iloc[300:]
+
+
+def test_full_graph_matches_rebuild(updated):
+    inc, rows = updated
+    _assert_same(inc.graph('full'), build_full_graph(rows, **GRAPH_PARAMS))
+
+
+def test_country_genre_matches_rebuild(updated):
+    inc, rows = updated
+    _assert_same(inc.graph('country_genre'), build_country_genre_graph(rows))
+
+
+def test_regions_match_rebuild(updated):
+    inc, rows = updated
+    for name, countries in REGIONS.items():
+        _assert_same(inc.graph(name), build_region_country_genre_graph(rows, countries))
+
+
+def test_records_with_people(catalog):
+    inc = IncrementalCatalog(catalog.iloc[:200], **GRAPH_PARAMS)
+    row = catalog.iloc[0]
+    added = [{'title': 'Novo', 'country': row['country'], 'listed_in': row['listed_in'],
+              'director': row['director'], 'cast': None}]
+    inc.apply_delta(added_rows=added)
+
+    expected = pd.concat([catalog.iloc[:200], pd.DataFrame(added)], ignore_index=True)
+    _assert_same(inc.graph('full'), build_full_graph(expected, **GRAPH_PARAMS))
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_catalog
+from evaluation.offline_eval import build_queries, evaluate_query
+from src.compact_graph import build_compact_graph
+from src.graph_builder import build_full_graph
+from src.recommender import recommend_titles
+from src.tuning import _as_arrays, compute_components, evaluate_configs
+
+# Os caminhos de recomendação (networkx, sparse, grafo compacto e a álgebra
+# do ajuste de pesos) devem dar o mesmo ranking num catálogo sintético.
+
+N_ROWS = 600
+SEED = 11
+TOP_N = 10
+GRAPH_PARAMS = {'include_people': True, 'max_cast': 10, 'min_person_titles': 2}
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return generate_catalog(N_ROWS, seed=SEED)
+
+
+@pytest.fixture(scope='module')
+def G(catalog):
+    return build_full_graph(catalog, **GRAPH_PARAMS)
+
+
+@pytest.fixture(scope='module')
+def sample_titles(G):
+    titles = sorted(d['label'] for _, d in G.nodes(data=True) if d['type'] == 'title')
+    rng = np.random.default_rng(SEED)
+    return [titles[i] for i in rng.choice(len(titles), 40, replace=False)]
+
+
+def _comparable(recs):
+    """
+    Scores em ordem e, para cada score, o conjunto de títulos (empates podem
+    sair em ordem diferente quando a ordem dos nós muda).
+    """
+    groups = {}
+    for title, score in recs:
+        groups.setdefault(score, set()).add(title)
+    last = recs[-1][1] if recs else None
+    # No último score o corte do top-N pode escolher títulos empatados diferentes
+    return [score for _, score in recs], {s: t for s, t in groups.items() if s != last}
+
+
+def test_sparse_matches_networkx(G, sample_titles):
+    for title in sample_titles:
+        expected = recommend_titles(title, G, TOP_N, engine='networkx', use_cache=False)
+        assert recommend_titles(title, G, TOP_N, engine='sparse', use_cache=False) == expected
+
+
+def test_compact_matches_networkx(catalog, G, sample_titles):
+    C = build_compact_graph(catalog, **GRAPH_PARAMS)
+    for title in sample_titles:
+        expected = _comparable(recommend_titles(title, G, TOP_N, use_cache=False))
+        for engine in ('networkx', 'sparse'):
+            recs = recommend_titles(title, C, TOP_N, engine=engine, use_cache=False)
+            assert _comparable(recs) == expected
+
+
+def test_tuning_matches_recommender(G):
+    queries = build_queries(G, 30, seed=SEED)
+    assert queries
+    current = _as_arrays({})
+    for title, hidden in queries:
+        expected = evaluate_query(G, title, hidden, TOP_N)
+        comp = compute_components(G, [(title, hidden)])
+        assert evaluate_configs(comp, current, TOP_N, 'ndcg')[0] == pytest.approx(expected['ndcg'])
+        assert evaluate_configs(comp, current, TOP_N, 'hit')[0] == expected['hit']
+
+
+@pytest.mark.parametrize('engine', ['networkx', 'sparse'])
+def test_added_edges_invalidate_cached_rankings(catalog, engine):
+    G = build_full_graph(catalog, **GRAPH_PARAMS)
+    titles = sorted(n for n, d in G.nodes(data=True) if d['type'] == 'title')
+    source = titles[0]
+
+    before = recommend_titles(source, G, TOP_N, engine=engine)
+    assert recommend_titles(source, G, TOP_N, engine=engine) == before
+
+    # Um título fora do top-N passa a ter exatamente os vizinhos da origem
+    ranked = {t for t, _ in before}
+    target = next(t for t in reversed(titles) if t != source and t not in ranked)
+    G.remove_edges_from(list(G.edges(target)))
+    G.add_edges_from((target, n) for n in list(G.neighbors(source)))
+
+    after = recommend_titles(source, G, TOP_N, engine=engine)
+    assert after != before
+    assert after[0][0] == target
+
+
+def test_pruned_people_keep_scores(catalog, G, sample_titles):
+    # Sem poda (min_person_titles=1) os scores são os de referência
+    unpruned = build_full_graph(catalog, **{**GRAPH_PARAMS, 'min_person_titles': 1})
+    C = build_compact_graph(catalog, **GRAPH_PARAMS)
+    for title in sample_titles:
+        expected = _comparable(recommend_titles(title, unpruned, TOP_N, use_cache=False))
+        for graph in (G, C):
+            for engine in ('networkx', 'sparse'):
+                recs = recommend_titles(title, graph, TOP_N, engine=engine, use_cache=False)
+                assert _comparable(recs) == expected
+
+
+def test_tuning_pruned_matches_unpruned(catalog, G):
+    unpruned = build_full_graph(catalog, **{**GRAPH_PARAMS, 'min_person_titles': 1})
+    queries = build_queries(G, 30, seed=SEED)
+    current = _as_arrays({})
+    for metric in ('ndcg', 'hit'):
+        assert evaluate_configs(compute_components(G, queries), current, TOP_N, metric) == \
+            pytest.approx(evaluate_configs(compute_components(unpruned, queries), current, TOP_N, metric))
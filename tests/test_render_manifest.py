@@ -0,0 +1,18 @@
+from benchmarks.synthetic import generate_catalog
+from evaluation.evaluation_plots import job_fingerprint, plot_genero_regiao
+from src.graph_builder import build_country_genre_graph
+from src.graph_state import bump_version
+
+# A impressão digital dos jobs de figura só muda quando o conteúdo do grafo muda.
+
+
+def test_job_fingerprint_tracks_graph_content():
+    catalog = generate_catalog(400, seed=3)
+    G = build_country_genre_graph(catalog)
+    before = job_fingerprint(plot_genero_regiao, (G, 'Norte'), {})
+    assert job_fingerprint(plot_genero_regiao, (build_country_genre_graph(catalog), 'Norte'), {}) == before
+
+    u, v = next(iter(G.edges))
+    G.edges[u, v]['weight'] += 1
+    bump_version(G)
+    assert job_fingerprint(plot_genero_regiao, (G, 'Norte'), {}) != before
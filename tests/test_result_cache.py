@@ -0,0 +1,49 @@
+from src.result_cache import ResultCache, freeze
+
+# Cache de resultados: LRU por tamanho e expiração por TTL (relógio simulado).
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction():
+    cache = ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'a' passa a ser a mais recente
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiration():
+    clock = FakeClock()
+    cache = ResultCache(maxsize=10, ttl=5, clock=clock)
+    cache.put('a', 1)
+    clock.now = 4.9
+    assert cache.get('a') == 1
+    clock.now = 5.0
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 1, 1)
+
+
+def test_disabled():
+    cache = ResultCache(maxsize=0)
+    cache.put('a', 1)
+    assert cache.get('a', 'miss') == 'miss'
+
+
+def test_freeze():
+    assert freeze({'b': [1, {2}], 'a': None}) == (('a', None), ('b', (1, (2,))))
+    assert hash(freeze({'fanout': {'genre': 10}}))
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from urllib.parse import quote
+
+import pytest
+
+from benchmarks.synthetic import generate_catalog
+from src.graph_builder import build_full_graph
+from src.recommender import recommend_titles
+from src.service import MAX_BODY, MAX_HEADERS, RecommendationService
+
+# Serviço HTTP: rotas, erros e limites da requisição, com o cálculo numa
+# thread (workers=0) e num pool de processos.
+
+
+@pytest.fixture(scope='module')
+def G():
+    return build_full_graph(generate_catalog(300, seed=8))
+
+
+def _title(G):
+    return sorted(d['label'] for _, d in G.nodes(data=True) if d['type'] == 'title')[0]
+
+
+async def _request(port, raw):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(raw)
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), 10)
+    writer.close()
+    head, _, body = data.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def _run(G, workers, requests):
+    async def main():
+        service = RecommendationService(G, workers=workers)
+        service.start()
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return [await _request(port, raw) for raw in requests], service.stats()
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+    return asyncio.run(main())
+
+
+def _get(target):
+    return f'GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n'.encode()
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_routes(G, workers):
+    title = _title(G)
+    (recommend, again, search, missing, health), stats = _run(G, workers, [
+        _get(f'/recommend?title={quote(title)}&top_n=3'),
+        _get(f'/recommend?title={quote(title)}&top_n=3'),
+        _get('/search?q=title%201&limit=5'),
+        _get('/recommend?title=Nada'),
+        _get('/health'),
+    ])
+
+    expected = recommend_titles(title, G, 3, engine='sparse', use_cache=False)
+    assert recommend[0] == 200
+    assert [(r['title'], r['score']) for r in recommend[1]['recommendations']] == expected
+    assert again == recommend
+    assert search[0] == 200 and len(search[1]['results']) == 5
+    assert missing[0] == 404
+    assert health == (200, {'status': 'ok'})
+    assert stats['computed'] <= 1
+
+
+def test_bad_parameters(G):
+    statuses = [status for status, _ in _run(G, 0, [
+        _get('/recommend'),
+        _get('/recommend?title=x&top_n=abc'),
+        _get('/recommend?title=x&top_n=0'),
+        _get('/nada'),
+        b'POST /health HTTP/1.1\r\nConnection: close\r\n\r\n',
+    ])[0]]
+    assert statuses == [400, 400, 400, 404, 405]
+
+
+def test_request_limits(G):
+    long_line = b'a' * (1 << 17)
+    responses, stats = _run(G, 0, [
+        b'GET /' + long_line + b' HTTP/1.1\r\n\r\n',
+        b'GET /health HTTP/1.1\r\nX-Long: ' + long_line + b'\r\n\r\n',
+        b'GET /health HTTP/1.1\r\n' + b'X: y\r\n' * (MAX_HEADERS + 1) + b'\r\n',
+        f'GET /health HTTP/1.1\r\nContent-Length: {MAX_BODY + 1}\r\n\r\n'.encode(),
+        b'GET /health HTTP/1.1\r\nContent-Length: -1\r\n\r\n',
+        b'GET /health HTTP/1.1\r\n' + b'X: y\r\n' * MAX_HEADERS + b'Connection: close\r\n\r\n',
+    ])
+    assert [status for status, _ in responses] == [400, 431, 431, 413, 400, 431]
+    assert stats['bad_requests'] == 6
+
+
+def test_headers_at_limit(G):
+    responses, _ = _run(G, 0, [
+        b'GET /health HTTP/1.1\r\n' + b'X: y\r\n' * (MAX_HEADERS - 1) + b'Connection: close\r\n\r\n',
+    ])
+    assert responses[0][0] == 200
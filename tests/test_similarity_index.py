@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_catalog
+from src.graph_builder import build_full_graph
+from src.graph_state import graph_fingerprint
+from src.recommender import recommend_titles
+from src.similarity_index import SimilarityIndex, build_similarity_index, load_similarity_index
+
+# Índice top-K: os scores guardados são os scores exatos do recommender e o
+# índice salvo só é reaproveitado para o mesmo grafo.
+
+K = 10
+
+
+@pytest.fixture(scope='module')
+def G():
+    return build_full_graph(generate_catalog(600, seed=6), include_people=True, max_cast=10)
+
+
+@pytest.fixture(scope='module')
+def index(G):
+    return build_similarity_index(G, k=K)
+
+
+def test_scores_are_exact(G, index):
+    assert index.scores.dtype == np.float64
+    for title in index.labels[:60]:
+        exact = recommend_titles(title, G, K, use_cache=False)
+        approx = index.recommend(title, K)
+        # Os vizinhos achados têm o score exato; o k-ésimo score pode ficar
+        # abaixo do exato se o LSH perder um candidato
+        exact_scores = dict(exact)
+        for label, score in approx:
+            if label in exact_scores:
+                assert score == exact_scores[label]
+        assert [s for _, s in approx] == sorted((s for _, s in approx), reverse=True)
+        assert approx[0][1] == exact[0][1]
+
+
+def test_save_load(G, index, tmp_path):
+    path = str(tmp_path / 'index')
+    index.save(path)
+
+    loaded = load_similarity_index(path, G)
+    assert loaded is not None
+    assert loaded.labels == index.labels
+    assert (loaded.neighbors == index.neighbors).all()
+    assert (loaded.scores == index.scores).all()
+    assert loaded.recommend(index.labels[0], 5) == index.recommend(index.labels[0], 5)
+
+
+def test_load_rejects_other_graph(G, index, tmp_path):
+    path = str(tmp_path / 'index')
+    index.save(path)
+    other = build_full_graph(generate_catalog(300, seed=7))
+    assert load_similarity_index(path, other) is None
+    assert SimilarityIndex.load(path, graph=graph_fingerprint(G)) is not None
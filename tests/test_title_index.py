@@ -0,0 +1,48 @@
+import networkx as nx
+
+from src.title_index import get_title_index
+
+# Busca de títulos pelo índice de trigramas: mesmos resultados de uma
+# varredura por substring, na ordem de relevância.
+
+TITLES = [
+    'Star Wars', 'Star Trek', 'The Star', 'Lonestar', 'Stargate', 'Wars of the Roses',
+    'Ó Pai, Ó', 'Up', 'Upside Down', 'A Bug\'s Life', 'star',
+]
+
+
+def _graph():
+    G = nx.Graph()
+    for i, title in enumerate(TITLES):
+        G.add_node(f"t{i}", type='title', label=title)
+    G.add_node('Star', type='genre', label='Star')
+    return G
+
+
+def test_lookup():
+    index = get_title_index(_graph())
+    assert index.lookup('Star Trek') == 't1'
+    assert index.lookup('Star') is None  # gênero, não título
+    assert index.lookup('star trek') is None
+
+
+def test_search_matches_scan():
+    index = get_title_index(_graph())
+    for term in ('star', 'wars', 'up', 'u', 'ó', 'bug\'s', 'xyz', 'ar'):
+        expected = {t for t in TITLES if term in t.lower()}
+        assert set(index.search(term)) == expected
+
+
+def test_search_ranking():
+    index = get_title_index(_graph())
+    # igual, prefixo, início de palavra, meio do título
+    # (empates: posição do termo, títulos mais curtos, ordem do grafo)
+    assert index.search('star') == ['star', 'Stargate', 'Star Wars', 'Star Trek', 'The Star', 'Lonestar']
+    assert index.search('star', limit=2) == ['star', 'Stargate']
+
+
+def test_rebuilt_after_change():
+    G = _graph()
+    assert get_title_index(G).lookup('Novo') is None
+    G.add_node('novo', type='title', label='Novo')
+    assert get_title_index(G).lookup('Novo') == 'novo'